@@ -1,13 +1,28 @@
-from fastapi import APIRouter
-from app.db.repositories.conversation import ChatConversationRepository
-from app.models.conversation import ChatConversation
-from app.services.openai import OpenAIService
+import asyncio
+import json
+from fastapi import APIRouter, Query, Request
+from fastapi.responses import StreamingResponse
+from app.core.config import settings
+from app.core.executors import run_io
+from app.core.metrics import CHAT_STREAMS_ABANDONED, CHAT_STREAMS_COMPLETED
+from app.db.repositories.conversation import ChatConversationRepository, ChatMessageRepository
+from app.db.repositories.index import IndexRepository
+from app.models.conversation import ChatConversation, ChatMessage, ChatMessageSearchHit, SearchPage
+from app.models.index import DocumentRecallRequest
+from app.schemas.request.chat import ChatCompletionRequest
+from app.services.embedding import get_embedding_service
+from app.services.openai import get_openai_service
+from app.services.rag import build_messages, document_source, pack_context, trim_history
+from app.services.retrieval import recall_documents
 from app.models.response import ApiResponse, success
 from app.core.exceptions import NotFoundException
-from typing import List
+from typing import List, Optional
 
 router = APIRouter()
-openai_service = OpenAIService()
+openai_service = get_openai_service()
+
+# 流式输出时检查客户端是否断开的间隔（秒）
+DISCONNECT_CHECK_INTERVAL = 0.5
 
 @router.post("/chat-conversations", response_model=ApiResponse[ChatConversation])
 async def create_chat_conversation(conversation: ChatConversation):
@@ -36,3 +51,156 @@ async def update_chat_conversation_title(conversation_id: int, title: str):
     if not conversation:
         raise NotFoundException(message="对话不存在")
     return success(data=conversation)
+
+@router.get("/chat-messages/search", response_model=ApiResponse[SearchPage[ChatMessageSearchHit]])
+async def search_chat_messages(
+    q: str = Query(..., min_length=1, description="查询词，多个词以空格分隔"),
+    conversation_id: Optional[int] = Query(None, description="只检索指定对话"),
+    limit: int = Query(20, ge=1, le=100, description="每页数量"),
+    offset: int = Query(0, ge=0, description="偏移量")
+):
+    """全文检索聊天记录，按相关度排序并返回摘要"""
+    return success(data=await run_io(ChatConversationRepository.search_messages, q, conversation_id, limit, offset))
+
+@router.get("/chat-conversations/{conversation_id}/messages", response_model=ApiResponse[List[ChatMessage]])
+async def list_chat_messages(conversation_id: int):
+    if not await run_io(ChatConversationRepository.get, conversation_id):
+        raise NotFoundException(message="对话不存在")
+    return success(data=await run_io(ChatMessageRepository.list, conversation_id))
+
+def _sse(data: dict) -> str:
+    return f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+async def _wait_disconnected(http_request: Request):
+    """轮询客户端连接状态，客户端断开时返回"""
+    while not await http_request.is_disconnected():
+        await asyncio.sleep(DISCONNECT_CHECK_INTERVAL)
+
+async def _close_stream(completion, next_chunk: Optional[asyncio.Task], conversation_id: int, partial_content: Optional[str]):
+    """关闭上游流；客户端提前断开时保存已生成的部分回复"""
+    if next_chunk is not None and not next_chunk.done():
+        # 生成器仍在等待上游时无法关闭，先取消这次读取
+        next_chunk.cancel()
+        await asyncio.wait({next_chunk})
+    if next_chunk is not None and not next_chunk.cancelled():
+        next_chunk.exception()
+    await completion.aclose()
+    if partial_content:
+        await run_io(ChatMessageRepository.create, conversation_id, "assistant", partial_content)
+
+@router.post("/chat-conversations/{conversation_id}/complete")
+async def complete_chat(conversation_id: int, request: ChatCompletionRequest, http_request: Request):
+    """
+    检索增强的流式聊天补全
+    
+    向量检索在请求开始时立即启动，与读取历史消息、保存用户消息并发执行；
+    检索结果按来源去重后装入上下文 token 预算，历史消息也按预算从最新的开始保留。
+    
+    SSE 事件依次为：sources（使用的文档块）、若干 content、done（保存的助手消息ID）或 error。
+    客户端中途断开时立即关闭上游流，已生成的部分作为助手消息保存
+    """
+    retrieval = None
+    if request.index_id is not None:
+        retrieval = asyncio.create_task(recall_documents(
+            DocumentRecallRequest(
+                index_id=request.index_id,
+                query=request.content,
+                top_k=request.top_k or settings.RAG_TOP_K,
+                mode=request.mode,
+                filters=request.filters,
+                include_content=True,
+                include_metadata=True
+            ),
+            get_embedding_service()
+        ))
+    
+    try:
+        if not await run_io(ChatConversationRepository.get, conversation_id):
+            raise NotFoundException(message="对话不存在")
+        if request.index_id is not None and not await run_io(IndexRepository.get, request.index_id):
+            raise NotFoundException(message="索引不存在")
+        
+        history = await run_io(ChatMessageRepository.recent, conversation_id, settings.RAG_HISTORY_MAX_MESSAGES)
+        user_message = await run_io(ChatMessageRepository.create, conversation_id, "user", request.content)
+        documents = await retrieval if retrieval is not None else []
+    except BaseException:
+        if retrieval is not None:
+            retrieval.cancel()
+        raise
+    
+    context_budget = request.context_token_budget
+    if context_budget is None:
+        context_budget = settings.RAG_CONTEXT_TOKEN_BUDGET
+    history_budget = request.history_token_budget
+    if history_budget is None:
+        history_budget = settings.RAG_HISTORY_TOKEN_BUDGET
+    
+    # 分词属于 CPU 操作，放到线程池中执行
+    selected, context, context_tokens = await run_io(
+        pack_context, documents, context_budget, settings.RAG_MAX_CHUNKS_PER_SOURCE
+    )
+    history = await run_io(trim_history, history, history_budget)
+    messages = build_messages(request.system_prompt, context, history, request.content)
+    
+    async def event_generator():
+        yield _sse({
+            "user_message_id": user_message.id,
+            "context_tokens": context_tokens,
+            "sources": [
+                {"document_id": doc.id, "source": document_source(doc), "similarity": doc.similarity}
+                for doc in selected
+            ]
+        })
+        
+        parts = []
+        completion = openai_service.stream_chat_completion(
+            messages,
+            temperature=request.temperature,
+            max_tokens=request.max_tokens or settings.RAG_MAX_TOKENS,
+            model=request.model
+        )
+        abandoned = False
+        next_chunk = None
+        disconnected = asyncio.create_task(_wait_disconnected(http_request))
+        try:
+            while True:
+                # 同时等待下一块内容和客户端断开，上游停滞时客户端关闭页面也能立即停止生成，避免空耗 token
+                next_chunk = asyncio.ensure_future(completion.__anext__())
+                await asyncio.wait({next_chunk, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+                if not next_chunk.done():
+                    abandoned = True
+                    break
+                try:
+                    content = next_chunk.result()
+                except StopAsyncIteration:
+                    break
+                parts.append(content)
+                yield _sse({"content": content})
+        except (asyncio.CancelledError, GeneratorExit):
+            # 连接断开时框架会取消或关闭生成器
+            abandoned = True
+            raise
+        except Exception as e:
+            yield _sse({"error": str(e)})
+            return
+        finally:
+            disconnected.cancel()
+            if abandoned:
+                CHAT_STREAMS_ABANDONED.inc()
+            # 被取消后再次 await 仍可能被取消，关闭上游和保存部分回复放到独立任务中完成
+            await asyncio.shield(_close_stream(completion, next_chunk, conversation_id, "".join(parts) if abandoned else None))
+        
+        if abandoned:
+            return
+        CHAT_STREAMS_COMPLETED.inc()
+        assistant_message = await run_io(ChatMessageRepository.create, conversation_id, "assistant", "".join(parts))
+        yield _sse({"done": True, "message_id": assistant_message.id})
+    
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+        }
+    )
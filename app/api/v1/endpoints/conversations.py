@@ -1,27 +1,312 @@
-from fastapi import APIRouter
-from typing import List
-from app.core.exceptions import NotFoundException
-from app.models.conversation import Conversation, ChatConversation
+from fastapi import APIRouter, Query, Request
+from fastapi.responses import StreamingResponse
+from starlette.datastructures import UploadFile
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple, Union
+from datetime import datetime
+import json
+import time
+import zlib
+from app.core.config import settings
+from app.core.exceptions import APIException, NotFoundException
+from app.core.executors import run_io
+from app.models.conversation import Conversation, ChatConversation, ConversationPage, ConversationSearchHit, ConversationView, ImportLineError, ImportResult, SearchPage, TokenStats
 from app.db.repositories.conversation import ConversationRepository
-from app.models.response import ApiResponse, success
+from app.models.response import ApiResponse, ResponseStatus, success
 from app.schemas.request.chat import CreateChatRequest
-from app.schemas.response.conversation import ConversationResponse
-from app.services.openai import OpenAIService
+from app.utils.fts import check_message_count
 
 router = APIRouter()
-openai_service = OpenAIService()
+
+# 对话列表分页大小
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# 导出时每次输出的数据块大小
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+# 导入时每次读取的数据块大小
+IMPORT_READ_BYTES = 64 * 1024
+# 导入结果中最多返回的失败行数
+MAX_IMPORT_ERRORS = 100
+
+def _export_chunks(rows: Iterator, compress: bool) -> Iterator[bytes]:
+    """
+    将对话逐行编码为 JSONL，按块输出，可选 gzip 压缩
+    
+    消息字段直接拼接数据库中保存的 JSON，不再解析
+    """
+    compressor = zlib.compressobj(wbits=31) if compress else None
+    buffer = []
+    size = 0
+    
+    for _, title, messages_json in rows:
+        line = f'{{"title": {json.dumps(title, ensure_ascii=False)}, "messages": {messages_json}}}\n'.encode("utf-8")
+        buffer.append(line)
+        size += len(line)
+        if size >= EXPORT_CHUNK_BYTES:
+            data = b"".join(buffer)
+            buffer, size = [], 0
+            if compressor is not None:
+                data = compressor.compress(data)
+            if data:
+                yield data
+    
+    data = b"".join(buffer)
+    if compressor is not None:
+        data = compressor.compress(data) + compressor.flush()
+    if data:
+        yield data
+
+async def _iter_upload_chunks(file: UploadFile) -> AsyncIterator[bytes]:
+    while True:
+        data = await file.read(IMPORT_READ_BYTES)
+        if not data:
+            return
+        yield data
+
+class ImportLineTooLong(Exception):
+    """导入的单行超过 IMPORT_MAX_LINE_BYTES"""
+
+def _decompress_bounded(decompressor, data: bytes) -> Iterator[bytes]:
+    """
+    分段解压，每段输出不超过 IMPORT_READ_BYTES，避免高压缩比数据一次性展开
+    
+    未处理的输入保存在 unconsumed_tail 中，直到输入耗尽且解压器内没有剩余输出
+    """
+    while True:
+        out = decompressor.decompress(data, IMPORT_READ_BYTES)
+        data = decompressor.unconsumed_tail
+        if out:
+            yield out
+        if not data and len(out) < IMPORT_READ_BYTES:
+            return
+
+async def _iter_lines(chunks: AsyncIterator[bytes], compressed: bool, max_line_bytes: int) -> AsyncIterator[bytes]:
+    """
+    将数据块流切分为行，可选 gzip 解压；只缓存未结束的半行
+    
+    行长度超过 max_line_bytes 时抛出 ImportLineTooLong，缓存的半行不会无限增长
+    """
+    decompressor = zlib.decompressobj(wbits=47) if compressed else None
+    pending = bytearray()
+    
+    def split(data: bytes) -> Iterator[bytes]:
+        start = 0
+        while True:
+            end = data.find(b"\n", start)
+            segment = data[start:] if end < 0 else data[start:end]
+            if len(pending) + len(segment) > max_line_bytes:
+                raise ImportLineTooLong()
+            pending.extend(segment)
+            if end < 0:
+                return
+            yield bytes(pending)
+            pending.clear()
+            start = end + 1
+    
+    async for data in chunks:
+        pieces = _decompress_bounded(decompressor, data) if decompressor is not None else [data]
+        for piece in pieces:
+            for line in split(piece):
+                yield line
+    
+    if decompressor is not None:
+        for line in split(decompressor.flush()):
+            yield line
+    yield bytes(pending)
+
+def _parse_import_line(line: bytes) -> Tuple[Optional[str], List[Dict[str, str]]]:
+    """
+    解析导入的一行，支持消息数组或导出格式的 {"title", "messages"} 对象
+    
+    Returns:
+        (标题, 消息列表)，格式错误时抛出 ValueError
+    """
+    record = json.loads(line)
+    title = None
+    if isinstance(record, dict):
+        title = record.get("title")
+        record = record.get("messages")
+        if title is not None and not isinstance(title, str):
+            raise ValueError("title 必须是字符串")
+    if not isinstance(record, list) or not record:
+        raise ValueError("必须是非空的消息数组，或包含 messages 字段的对象")
+    check_message_count(len(record))
+    
+    messages = []
+    for i, message in enumerate(record, 1):
+        if (
+            not isinstance(message, dict)
+            or not isinstance(message.get("role"), str)
+            or not isinstance(message.get("content"), str)
+        ):
+            raise ValueError(f"第 {i} 条消息格式错误：缺少 role 或 content 字段")
+        messages.append({"role": message["role"], "content": message["content"]})
+    return title, messages
+
+def _check_message_counts(*message_lists: list):
+    """消息数超过全文检索 rowid 编码上限时返回参数错误"""
+    try:
+        for messages in message_lists:
+            check_message_count(len(messages))
+    except ValueError as e:
+        raise APIException(message=str(e), code=ResponseStatus.PARAM_ERROR)
 
 @router.post("/conversations", response_model=ApiResponse[Conversation])
 async def create_conversation(conversation: Conversation):
+    _check_message_counts(conversation.messages)
     return success(data=ConversationRepository.create(conversation.messages))
 
-@router.post("/conversations_batch", response_model=ApiResponse[ConversationResponse])
+@router.post("/conversations_batch", response_model=ApiResponse[List[Conversation]])
 async def batch_create_conversations(items: CreateChatRequest):
+    _check_message_counts(*items.messages)
     return success(data=ConversationRepository.batch_create(items))
 
-@router.get("/conversations", response_model=ApiResponse[List[Conversation]])
-async def list_conversations():
-    return success(data=ConversationRepository.list())
+@router.post("/conversations/import", response_model=ApiResponse[ImportResult])
+async def import_conversations(request: Request):
+    """
+    流式导入 JSONL 对话
+    
+    支持 multipart 上传（字段名 file）或直接以 NDJSON 作为请求体；文件名以 .gz 结尾
+    或 Content-Encoding 为 gzip 时先解压。每行为消息数组或 {"title", "messages"} 对象，
+    逐行解析校验，通过的行每 IMPORT_BATCH_SIZE 条写入一次，每批一个事务。
+    """
+    file = None
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("multipart/form-data"):
+        form = await request.form()
+        file = form.get("file")
+        if not isinstance(file, UploadFile):
+            raise APIException(message="缺少上传文件 file", code=ResponseStatus.PARAM_ERROR)
+        chunks = _iter_upload_chunks(file)
+        compressed = (file.filename or "").endswith(".gz")
+    else:
+        chunks = request.stream()
+        compressed = request.headers.get("content-encoding", "").lower() == "gzip"
+    
+    started_at = time.monotonic()
+    total_lines = imported = failed = 0
+    errors: List[ImportLineError] = []
+    batch = []
+    
+    try:
+        line_no = 0
+        async for line in _iter_lines(chunks, compressed, settings.IMPORT_MAX_LINE_BYTES):
+            line_no += 1
+            if not line.strip():
+                continue
+            total_lines += 1
+            
+            try:
+                batch.append(_parse_import_line(line))
+            except ValueError as e:
+                failed += 1
+                if len(errors) < MAX_IMPORT_ERRORS:
+                    errors.append(ImportLineError(line=line_no, error=str(e)))
+                continue
+            
+            if len(batch) >= settings.IMPORT_BATCH_SIZE:
+                imported += await run_io(ConversationRepository.bulk_import, batch)
+                batch = []
+        
+        imported += await run_io(ConversationRepository.bulk_import, batch)
+    except zlib.error:
+        raise APIException(message=f"gzip 数据损坏，已导入 {imported} 条对话", code=ResponseStatus.PARAM_ERROR)
+    except ImportLineTooLong:
+        raise APIException(
+            message=f"第 {line_no + 1} 行超过 {settings.IMPORT_MAX_LINE_BYTES} 字节，已导入 {imported} 条对话",
+            code=ResponseStatus.PARAM_ERROR
+        )
+    finally:
+        if file is not None:
+            await file.close()
+    
+    return success(data=ImportResult(
+        total_lines=total_lines,
+        imported=imported,
+        failed=failed,
+        errors=errors,
+        elapsed_seconds=round(time.monotonic() - started_at, 3)
+    ))
+
+@router.get("/conversations", response_model=ApiResponse[Union[List[Conversation], ConversationPage]])
+async def list_conversations(
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="每页数量"),
+    cursor: Optional[str] = Query(None, description="上一页返回的 next_cursor"),
+    view: Optional[ConversationView] = Query(None, description="summary 只返回摘要，full 包含消息")
+):
+    """
+    获取对话列表
+    
+    不带参数时返回全部完整对话（兼容旧版前端）；
+    指定任一参数时按 (updated_at, id) 游标分页，默认返回摘要视图
+    """
+    if limit is None and cursor is None and view is None:
+        return success(data=await run_io(ConversationRepository.list))
+    
+    try:
+        page = await run_io(
+            ConversationRepository.list_page,
+            limit or DEFAULT_PAGE_SIZE,
+            cursor,
+            view or ConversationView.SUMMARY
+        )
+    except ValueError as e:
+        raise APIException(message=str(e), code=ResponseStatus.PARAM_ERROR)
+    return success(data=page)
+
+@router.get("/conversations/export")
+async def export_conversations(
+    start_id: Optional[int] = Query(None, ge=1, description="起始对话ID（含）"),
+    end_id: Optional[int] = Query(None, ge=1, description="结束对话ID（含）"),
+    start_date: Optional[datetime] = Query(None, description="创建时间下限"),
+    end_date: Optional[datetime] = Query(None, description="创建时间上限"),
+    max_tokens: Optional[int] = Query(None, ge=1, description="跳过 token 数超过该值的对话"),
+    gzip: bool = Query(False, description="是否 gzip 压缩")
+):
+    """
+    以 JSONL 格式流式导出对话，每行一个对话
+    
+    数据按 id 分批读取并边读边输出，内存占用与数据集大小无关
+    """
+    rows = ConversationRepository.iter_export_rows(
+        start_id=start_id,
+        end_id=end_id,
+        start_date=start_date,
+        end_date=end_date,
+        max_tokens=max_tokens
+    )
+    filename = f"conversations_{datetime.now().strftime('%Y%m%d%H%M%S')}.jsonl"
+    if gzip:
+        filename += ".gz"
+    
+    # 同步生成器由 Starlette 在线程池中迭代，不阻塞事件循环
+    return StreamingResponse(
+        _export_chunks(rows, gzip),
+        media_type="application/gzip" if gzip else "application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@router.get("/conversations/search", response_model=ApiResponse[SearchPage[ConversationSearchHit]])
+async def search_conversations(
+    q: str = Query(..., min_length=1, description="查询词，多个词以空格分隔"),
+    role: Optional[str] = Query(None, description="只检索指定角色的消息"),
+    limit: int = Query(20, ge=1, le=100, description="每页数量"),
+    offset: int = Query(0, ge=0, description="偏移量")
+):
+    """全文检索训练对话中的消息，按相关度排序并返回摘要"""
+    return success(data=await run_io(ConversationRepository.search, q, role, limit, offset))
+
+@router.get("/conversations/token-stats", response_model=ApiResponse[TokenStats])
+async def get_token_stats(
+    encoding: Optional[str] = Query(None, description="编码名（如 cl100k_base、o200k_base）或模型名，为空时使用已保存的计数")
+):
+    """统计训练数据集的 token 数"""
+    try:
+        stats = await run_io(ConversationRepository.token_stats, encoding)
+    except ValueError as e:
+        raise APIException(message=str(e), code=ResponseStatus.PARAM_ERROR)
+    return success(data=stats)
 
 @router.get("/conversations/{conversation_id}", response_model=ApiResponse[Conversation])
 async def get_conversation(conversation_id: int):
@@ -39,6 +324,7 @@ async def copy_conversation(conversation_id: int):
 
 @router.put("/conversations/{conversation_id}", response_model=ApiResponse[Conversation])
 async def update_conversation(conversation_id: int, conversation: Conversation):
+    _check_message_counts(conversation.messages)
     updated_conversation = ConversationRepository.update(conversation_id, conversation)
     if not updated_conversation:
         raise NotFoundException(message="对话不存在")
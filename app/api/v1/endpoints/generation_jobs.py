@@ -0,0 +1,78 @@
+from fastapi import APIRouter, Query
+from typing import List, Optional
+
+from app.core.config import settings
+from app.core.exceptions import APIException, NotFoundException
+from app.core.executors import run_io
+from app.db.repositories.generation_job import GenerationJobRepository
+from app.models.generation_job import FINISHED_GENERATION_STATUSES, GenerationItemStatus, GenerationJob, GenerationJobCreate, GenerationJobItem
+from app.models.response import ApiResponse, ResponseStatus, success
+from app.services.generation_jobs import generation_job_runner
+
+router = APIRouter()
+
+async def _get_job(job_id: int) -> GenerationJob:
+    job = await run_io(GenerationJobRepository.get, job_id)
+    if not job:
+        raise NotFoundException(message="任务不存在")
+    return job
+
+@router.post("/generation-jobs", response_model=ApiResponse[GenerationJob])
+async def submit_generation_job(request: GenerationJobCreate):
+    """
+    提交批量生成对话的后台任务
+
+    每组模板变量生成 samples_per_item 条对话，生成的对话写入对话列表
+    """
+    # 展开条目前先检查总数，避免超大的 samples_per_item 占满内存
+    if len(request.item_variables()) * request.samples_per_item > settings.GENERATION_MAX_ITEMS:
+        raise APIException(
+            message=f"单个任务最多生成 {settings.GENERATION_MAX_ITEMS} 条对话",
+            code=ResponseStatus.PARAM_ERROR
+        )
+    item_variables = [
+        variables
+        for variables in request.item_variables()
+        for _ in range(request.samples_per_item)
+    ]
+
+    job = await run_io(GenerationJobRepository.create, request.dict(), item_variables)
+    generation_job_runner.submit(job.id)
+    return success(data=job)
+
+@router.get("/generation-jobs", response_model=ApiResponse[List[GenerationJob]])
+async def list_generation_jobs():
+    return success(data=await run_io(GenerationJobRepository.list))
+
+@router.get("/generation-jobs/{job_id}", response_model=ApiResponse[GenerationJob])
+async def get_generation_job(job_id: int):
+    return success(data=await _get_job(job_id))
+
+@router.get("/generation-jobs/{job_id}/items", response_model=ApiResponse[List[GenerationJobItem]])
+async def list_generation_job_items(
+    job_id: int,
+    status: Optional[GenerationItemStatus] = Query(None, description="按条目状态过滤"),
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0)
+):
+    """获取任务中每条对话的生成状态，失败的条目包含错误信息"""
+    await _get_job(job_id)
+    return success(data=await run_io(GenerationJobRepository.list_items, job_id, status, limit, offset))
+
+@router.post("/generation-jobs/{job_id}/cancel")
+async def cancel_generation_job(job_id: int):
+    await _get_job(job_id)
+    if not await generation_job_runner.cancel(job_id):
+        raise APIException(message="任务已结束，无法取消")
+    return success(message="任务已取消")
+
+@router.post("/generation-jobs/{job_id}/retry", response_model=ApiResponse[GenerationJob])
+async def retry_generation_job(job_id: int):
+    """重新生成已结束任务中失败的条目"""
+    job = await _get_job(job_id)
+    if job.status not in FINISHED_GENERATION_STATUSES:
+        raise APIException(message="任务未结束，无法重试")
+    if not await run_io(GenerationJobRepository.retry_failed, job_id):
+        raise APIException(message="没有失败的条目")
+    generation_job_runner.submit(job_id)
+    return success(data=await _get_job(job_id))
@@ -1,4 +1,5 @@
 from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Depends, BackgroundTasks
+from fastapi.responses import StreamingResponse
 from typing import List, Dict, Any, Optional
 import json
 import os
@@ -9,15 +10,19 @@ import subprocess
 import git
 from pydantic import parse_obj_as, BaseModel, HttpUrl
 
-from app.core.exceptions import NotFoundException
-from app.models.index import DocumentRecallRequest, Index, IndexCreate, Document, DocumentCreate, FileUploadRequest, ChunkingConfig, ProcessedFileInfo
-from app.models.response import ApiResponse, success
+from app.core.config import settings
+from app.core.exceptions import APIException, NotFoundException
+from app.core.executors import run_io, run_search
+from app.models.index import BatchRecallRequest, BatchRecallResult, DocumentRecallRequest, Index, IndexCreate, Document, DocumentCreate, FileUploadRequest, ChunkingConfig, ProcessedFileInfo, IngestionResult, GitRepoIndexRequest
+from app.models.response import ApiResponse, ResponseStatus, success
 from app.db.repositories.index import IndexRepository, DocumentRepository
-from app.services.embedding import EmbeddingService
+from app.services.embedding import get_embedding_service
 from app.services.document_processor import DocumentProcessor
+from app.services.ingestion import IngestionPipeline, SourceFile, build_git_metadata
+from app.services.retrieval import batch_recall, recall_documents
 
 router = APIRouter()
-embedding_service = EmbeddingService()
+embedding_service = get_embedding_service()
 
 # 临时文件存储目录
 TEMP_UPLOAD_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__)))), "temp_uploads")
@@ -27,94 +32,106 @@ os.makedirs(TEMP_UPLOAD_DIR, exist_ok=True)
 GIT_CLONE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__)))), "git_repos")
 os.makedirs(GIT_CLONE_DIR, exist_ok=True)
 
-# Git仓库索引请求模型
-class GitRepoIndexRequest(BaseModel):
-    git_url: HttpUrl
-    branch: Optional[str] = "main"
-    chunking_config: ChunkingConfig
-    recursive: bool = True
-    metadata: Optional[Dict[str, Any]] = None
-
-# 代码仓库索引结果
-class RepoIndexResult(BaseModel):
-    total_files: int
-    total_chunks: int
-    total_characters: int
-    processed_files: List[ProcessedFileInfo]
-
 @router.post("/indices", response_model=ApiResponse[Index])
 async def create_index(index: IndexCreate):
-    return success(data=IndexRepository.create(index))
+    return success(data=await run_io(IndexRepository.create, index))
 
 @router.get("/indices", response_model=ApiResponse[List[Index]])
 async def list_indices():
-    return success(data=IndexRepository.list())
+    return success(data=await run_io(IndexRepository.list))
 
 @router.get("/indices/{index_id}", response_model=ApiResponse[Index])
 async def get_index(index_id: int):
-    index = IndexRepository.get(index_id)
+    index = await run_io(IndexRepository.get, index_id)
     if not index:
         raise NotFoundException(message="索引不存在")
     return success(data=index)
 
 @router.delete("/indices/{index_id}")
 async def delete_index(index_id: int):
-    if not IndexRepository.delete(index_id):
+    if not await run_io(IndexRepository.delete, index_id):
         raise NotFoundException(message="索引不存在")
     return success(message="索引删除成功")
 
 @router.post("/indices/{index_id}/documents", response_model=ApiResponse[Document])
 async def add_document(index_id: int, document: DocumentCreate):
     # 检查索引是否存在
-    index = IndexRepository.get(index_id)
+    index = await run_io(IndexRepository.get, index_id)
     if not index:
         raise NotFoundException(message="索引不存在")
     
     # 获取文档向量
-    embedding = embedding_service.get_embedding(document.content)
+    embedding = await embedding_service.aget_embedding(document.content)
     
     # 创建文档
-    return success(data=DocumentRepository.create(index_id, document, embedding))
+    return success(data=await run_io(DocumentRepository.create, index_id, document, embedding))
 
 @router.get("/indices/{index_id}/documents", response_model=ApiResponse[List[Document]])
 async def list_documents(index_id: int):
     # 检查索引是否存在
-    index = IndexRepository.get(index_id)
+    index = await run_io(IndexRepository.get, index_id)
     if not index:
         raise NotFoundException(message="索引不存在")
     
-    return success(data=DocumentRepository.list(index_id))
+    return success(data=await run_io(DocumentRepository.list, index_id))
 
 @router.delete("/indices/{index_id}/documents/{document_id}")
 async def delete_document(index_id: int, document_id: int):
-    if not DocumentRepository.delete(index_id, document_id):
+    if not await run_search(DocumentRepository.delete, index_id, document_id):
         raise NotFoundException(message="文档不存在")
     return success(message="文档删除成功")
 
 @router.post("/indices/{index_id}/rebuild", response_model=ApiResponse)
 async def rebuild_index(index_id: int):
     # 检查索引是否存在
-    index = IndexRepository.get(index_id)
+    index = await run_io(IndexRepository.get, index_id)
     if not index:
         raise NotFoundException(message="索引不存在")
     
     # 重建索引
-    IndexRepository.rebuild_faiss_index(index_id)
+    await run_search(IndexRepository.rebuild_faiss_index, index_id)
     return success(message="索引重建成功")
 
 @router.post("/indices/{index_id}/recall-test", response_model=ApiResponse[List[Document]])
 async def recall_test(request: DocumentRecallRequest):
     # 检查索引是否存在
-    index = IndexRepository.get(request.index_id)
+    index = await run_io(IndexRepository.get, request.index_id)
+    if not index:
+        raise NotFoundException(message="索引不存在")
+    
+    # 按请求的方式召回（向量 / 关键词 / 混合），可选交叉编码器重排序
+    try:
+        documents = await recall_documents(request, embedding_service)
+    except ValueError as e:
+        raise APIException(message=str(e), code=ResponseStatus.PARAM_ERROR)
+    return success(data=documents)
+
+@router.post("/indices/{index_id}/recall-batch", response_model=ApiResponse[List[BatchRecallResult]])
+async def recall_batch(index_id: int, request: BatchRecallRequest):
+    """
+    批量召回，用于离线评估索引的 recall@k
+    
+    所有查询合并计算向量并对查询矩阵执行一次 FAISS 检索，结果与查询顺序一致；
+    stream 为 true 时以 NDJSON 每行返回一个查询的结果
+    """
+    if len(request.queries) > settings.BATCH_RECALL_MAX_QUERIES:
+        raise APIException(
+            message=f"单次最多 {settings.BATCH_RECALL_MAX_QUERIES} 个查询",
+            code=ResponseStatus.PARAM_ERROR
+        )
+    
+    index = await run_io(IndexRepository.get, index_id)
     if not index:
         raise NotFoundException(message="索引不存在")
     
-    print("开发获取查询文本向量")
-    # 获取查询向量
-    query_embedding = embedding_service.get_embedding(request.query)
-    print("开发获取查询文本向量完成")
-    # 搜索相似文档
-    return success(data=DocumentRepository.search_similar(request.index_id, query_embedding, request.top_k))
+    results = batch_recall(index_id, request, embedding_service)
+    if request.stream:
+        async def ndjson_lines():
+            async for result in results:
+                yield result.json() + "\n"
+        return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+    
+    return success(data=[result async for result in results])
 
 @router.post("/indices/{index_id}/upload-file", response_model=ApiResponse[ProcessedFileInfo])
 async def upload_file(
@@ -137,7 +154,7 @@ async def upload_file(
         background_tasks: 后台任务
     """
     # 检查索引是否存在
-    index = IndexRepository.get(index_id)
+    index = await run_io(IndexRepository.get, index_id)
     if not index:
         raise NotFoundException(message="索引不存在")
     
@@ -150,7 +167,7 @@ async def upload_file(
     # 保存上传的文件
     file_path = os.path.join(TEMP_UPLOAD_DIR, f"{datetime.now().strftime('%Y%m%d%H%M%S')}_{file.filename}")
     with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+        await run_io(shutil.copyfileobj, file.file, buffer)
     
     try:
         # 处理文件
@@ -159,12 +176,11 @@ async def upload_file(
         # 将文本块转换为文档
         documents = DocumentProcessor.chunks_to_documents(chunks, metadata, file_path)
         
-        # 添加文档到索引
-        for doc in documents:
-            # 获取文档向量
-            embedding = embedding_service.get_embedding(doc.content)
-            # 创建文档
-            DocumentRepository.create(index_id, doc, embedding)
+        # 批量获取文档向量
+        embeddings = await embedding_service.aget_embeddings([doc.content for doc in documents])
+        
+        # 批量添加文档到索引
+        await run_io(DocumentRepository.batch_create, index_id, documents, embeddings)
         
         # 创建处理结果
         result = ProcessedFileInfo(
@@ -200,7 +216,7 @@ async def batch_upload(
         background_tasks: 后台任务
     """
     # 检查索引是否存在
-    index = IndexRepository.get(index_id)
+    index = await run_io(IndexRepository.get, index_id)
     if not index:
         raise NotFoundException(message="索引不存在")
     
@@ -216,7 +232,7 @@ async def batch_upload(
         # 保存上传的文件
         file_path = os.path.join(TEMP_UPLOAD_DIR, f"{datetime.now().strftime('%Y%m%d%H%M%S')}_{file.filename}")
         with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+            await run_io(shutil.copyfileobj, file.file, buffer)
         
         try:
             # 处理文件
@@ -225,12 +241,11 @@ async def batch_upload(
             # 将文本块转换为文档
             documents = DocumentProcessor.chunks_to_documents(chunks, metadata, file_path)
             
-            # 添加文档到索引
-            for doc in documents:
-                # 获取文档向量
-                embedding = embedding_service.get_embedding(doc.content)
-                # 创建文档
-                DocumentRepository.create(index_id, doc, embedding)
+            # 批量获取文档向量
+            embeddings = await embedding_service.aget_embeddings([doc.content for doc in documents])
+            
+            # 批量添加文档到索引
+            await run_io(DocumentRepository.batch_create, index_id, documents, embeddings)
             
             # 创建处理结果
             result = ProcessedFileInfo(
@@ -247,80 +262,46 @@ async def batch_upload(
     
     return success(data=results)
 
-@router.post("/indices/{index_id}/index-git-repository", response_model=ApiResponse[RepoIndexResult])
+@router.post("/indices/{index_id}/index-git-repository", response_model=ApiResponse[IngestionResult])
 async def index_git_repository(
     index_id: int,
     request: GitRepoIndexRequest
 ):
     # 检查索引是否存在
-    index = IndexRepository.get(index_id)
+    index = await run_io(IndexRepository.get, index_id)
     if not index:
         raise NotFoundException(message="索引不存在")
     
     # 创建唯一的临时目录
-    repo_name = request.git_url.split('/')[-1].replace('.git', '')
+    repo_name = str(request.git_url).rstrip('/').split('/')[-1].replace('.git', '')
     timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
     clone_dir = os.path.join(GIT_CLONE_DIR, f"{repo_name}_{timestamp}")
     
     try:
         # 克隆Git仓库
-        repo = git.Repo.clone_from(
+        await run_io(
+            git.Repo.clone_from,
             str(request.git_url),
             clone_dir,
             depth=1,
             branch=request.branch
         )
         
-        # 克隆成功后处理目录
-        results = await DocumentProcessor.process_directory(
-            clone_dir, 
-            request.chunking_config, 
-            request.recursive
-        )
-        
-        # 添加到索引
-        total_chunks = 0
-        processed_files = []
+        # 为每个文件生成元数据
+        processed_at = datetime.now().isoformat()
+        def file_metadata(source: SourceFile) -> Dict[str, Any]:
+            return build_git_metadata(str(request.git_url), request.branch, request.metadata, source, processed_at)
         
-        for file_result in results:
-            # 为每个文件添加元数据
-            file_metadata = {
-                **(request.metadata or {}),
-                'git_repo': str(request.git_url),
-                'git_branch': request.branch,
-                'file_path': file_result['path'],
-                'file_name': file_result['filename'],
-                'processed_at': datetime.now().isoformat()
-            }
-            
-            # 创建文档对象
-            documents = DocumentProcessor.chunks_to_documents(
-                file_result['chunks'],
-                file_metadata,
-                os.path.join(clone_dir, file_result['path'])
-            )
-            
-            # 添加到数据库
-            document_ids = DocumentRepository.batch_create(index_id, documents)
-            
-            # 记录处理信息
-            total_chunks += len(documents)
-            processed_files.append(
-                ProcessedFileInfo(
-                    filename=file_result['filename'],
-                    path=file_result['path'],
-                    chunks=len(documents),
-                    characters=file_result['total_characters']
-                )
-            )
+        # 克隆成功后通过流水线处理目录：读取、切片、向量化与入库并行进行
+        pipeline = IngestionPipeline(
+            index_id,
+            request.chunking_config,
+            embedding_service,
+            metadata_factory=file_metadata
+        )
+        result = await pipeline.run_directory(clone_dir, request.recursive)
         
-        # 返回结果
-        return success(data=RepoIndexResult(
-            total_files=len(results),
-            total_chunks=total_chunks,
-            total_characters=sum(f['total_characters'] for f in results),
-            processed_files=processed_files
-        ))
+        return success(data=result)
     
     except Exception as e:
         raise HTTPException(
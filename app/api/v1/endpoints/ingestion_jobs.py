@@ -0,0 +1,163 @@
+from fastapi import APIRouter, File, Form, Request, UploadFile
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
+import asyncio
+import json
+import os
+import shutil
+import uuid
+from datetime import datetime
+from pydantic import parse_obj_as
+
+from app.api.v1.endpoints.indices import GIT_CLONE_DIR, TEMP_UPLOAD_DIR
+from app.core.exceptions import APIException, NotFoundException
+from app.core.executors import run_io
+from app.db.repositories.index import IndexRepository
+from app.db.repositories.ingestion_job import IngestionJobRepository
+from app.models.index import ChunkingConfig, GitRepoIndexRequest
+from app.models.ingestion_job import FINISHED_JOB_STATUSES, IngestionJob, IngestionJobType
+from app.models.response import ApiResponse, success
+from app.services.ingestion_jobs import ingestion_job_runner
+
+router = APIRouter()
+
+# SSE 心跳间隔（秒）
+KEEP_ALIVE_INTERVAL = 15
+
+async def _ensure_index(index_id: int):
+    index = await run_io(IndexRepository.get, index_id)
+    if not index:
+        raise NotFoundException(message="索引不存在")
+
+@router.post("/indices/{index_id}/ingestion-jobs/git", response_model=ApiResponse[IngestionJob])
+async def submit_git_ingestion_job(index_id: int, request: GitRepoIndexRequest):
+    """提交索引 Git 仓库的后台任务"""
+    await _ensure_index(index_id)
+    
+    git_url = str(request.git_url)
+    repo_name = git_url.rstrip('/').split('/')[-1].replace('.git', '')
+    work_dir = os.path.join(GIT_CLONE_DIR, f"{repo_name}_{uuid.uuid4().hex}")
+    
+    job = await run_io(
+        IngestionJobRepository.create,
+        index_id,
+        IngestionJobType.GIT,
+        {
+            "git_url": git_url,
+            "branch": request.branch,
+            "recursive": request.recursive,
+            "chunking_config": request.chunking_config.dict(),
+            "metadata": request.metadata
+        },
+        work_dir=work_dir
+    )
+    ingestion_job_runner.submit(job.id)
+    return success(data=job)
+
+@router.post("/indices/{index_id}/ingestion-jobs/files", response_model=ApiResponse[IngestionJob])
+async def submit_files_ingestion_job(
+    index_id: int,
+    files: List[UploadFile] = File(...),
+    config_json: str = Form(...),
+    metadata_json: Optional[str] = Form(None)
+):
+    """
+    提交处理上传文件的后台任务
+    
+    文件先保存到任务的临时目录，任务结束后删除
+    
+    Args:
+        index_id: 索引ID
+        files: 要上传的文件列表
+        config_json: 切片配置的JSON字符串
+        metadata_json: 要添加到所有文档的元数据的JSON字符串
+    """
+    await _ensure_index(index_id)
+    
+    chunking_config = parse_obj_as(ChunkingConfig, json.loads(config_json))
+    metadata = json.loads(metadata_json) if metadata_json else {}
+    
+    work_dir = os.path.join(TEMP_UPLOAD_DIR, f"job_{datetime.now().strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex}")
+    os.makedirs(work_dir, exist_ok=True)
+    
+    saved_files = []
+    for i, file in enumerate(files):
+        # 加序号前缀，避免同名文件互相覆盖
+        filename = os.path.basename(file.filename or f"file_{i}")
+        relative_path = f"{i}_{filename}"
+        with open(os.path.join(work_dir, relative_path), "wb") as buffer:
+            await run_io(shutil.copyfileobj, file.file, buffer)
+        saved_files.append({"path": relative_path, "filename": filename})
+    
+    job = await run_io(
+        IngestionJobRepository.create,
+        index_id,
+        IngestionJobType.FILES,
+        {
+            "chunking_config": chunking_config.dict(),
+            "metadata": metadata,
+            "files": saved_files
+        },
+        len(saved_files),
+        work_dir
+    )
+    ingestion_job_runner.submit(job.id)
+    return success(data=job)
+
+@router.get("/indices/{index_id}/ingestion-jobs", response_model=ApiResponse[List[IngestionJob]])
+async def list_ingestion_jobs(index_id: int):
+    await _ensure_index(index_id)
+    return success(data=await run_io(IngestionJobRepository.list, index_id))
+
+@router.get("/ingestion-jobs/{job_id}", response_model=ApiResponse[IngestionJob])
+async def get_ingestion_job(job_id: int):
+    job = await run_io(IngestionJobRepository.get, job_id)
+    if not job:
+        raise NotFoundException(message="任务不存在")
+    return success(data=job)
+
+@router.post("/ingestion-jobs/{job_id}/cancel")
+async def cancel_ingestion_job(job_id: int):
+    job = await run_io(IngestionJobRepository.get, job_id)
+    if not job:
+        raise NotFoundException(message="任务不存在")
+    if not await ingestion_job_runner.cancel(job_id):
+        raise APIException(message="任务已结束，无法取消")
+    return success(message="任务已取消")
+
+@router.get("/ingestion-jobs/{job_id}/events")
+async def stream_ingestion_job_events(job_id: int, request: Request):
+    """通过 SSE 推送任务进度，任务结束后关闭连接"""
+    job = await run_io(IngestionJobRepository.get, job_id)
+    if not job:
+        raise NotFoundException(message="任务不存在")
+    
+    async def event_generator():
+        # 先订阅再读取当前进度，避免错过中间的事件
+        queue = ingestion_job_runner.subscribe(job_id)
+        try:
+            progress = await ingestion_job_runner.progress(job_id)
+            while progress is not None:
+                yield f"data: {progress.json()}\n\n"
+                if progress.job.status in FINISHED_JOB_STATUSES:
+                    return
+                
+                progress = None
+                while progress is None:
+                    try:
+                        progress = await asyncio.wait_for(queue.get(), timeout=KEEP_ALIVE_INTERVAL)
+                    except asyncio.TimeoutError:
+                        if await request.is_disconnected():
+                            return
+                        yield ": keep-alive\n\n"
+        finally:
+            ingestion_job_runner.unsubscribe(job_id, queue)
+    
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+        }
+    )
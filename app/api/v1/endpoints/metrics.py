@@ -0,0 +1,12 @@
+from fastapi import APIRouter
+from typing import Dict
+
+from app.core.metrics import snapshot
+from app.models.response import ApiResponse, success
+
+router = APIRouter()
+
+@router.get("/metrics", response_model=ApiResponse[Dict[str, int]])
+async def get_metrics():
+    """获取进程内计数指标"""
+    return success(data=snapshot())
@@ -17,10 +17,91 @@ class Settings(BaseSettings):
     # OpenAI配置
     OPENAI_API_KEY: Optional[str] = os.getenv("OPENAI_API_KEY")
     OPENAI_API_HOST: Optional[str] = os.getenv("OPENAI_API_HOST")
+    OPENAI_MODEL: str = os.getenv("OPENAI_MODEL", "deepseek-chat")
+    OPENAI_MAX_CONNECTIONS: int = 200
+    OPENAI_MAX_KEEPALIVE_CONNECTIONS: int = 50
+    OPENAI_KEEPALIVE_EXPIRY: float = 30.0
+    OPENAI_CONNECT_TIMEOUT: float = 10.0
+    OPENAI_READ_TIMEOUT: float = 120.0
+    OPENAI_POOL_TIMEOUT: float = 30.0
+    OPENAI_MAX_RETRIES: int = 2
     
     # 向量模型配置
     VECTOR_DIM: int = 384
     SENTENCE_TRANSFORMER_MODEL: str = "all-MiniLM-L6-v2"
+    EMBEDDING_BATCH_SIZE: int = 64
+    EMBEDDING_MAX_WAIT_MS: float = 5.0
+    TORCH_NUM_THREADS: Optional[int] = None
+    
+    # 向量缓存配置
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_FILE: str = "embedding_cache.db"
+    EMBEDDING_CACHE_MAX_ENTRIES: int = 1000000
+    
+    # 入库流水线配置
+    INGESTION_QUEUE_SIZE: int = 16
+    INGESTION_EXTRACT_WORKERS: int = 4
+    INGESTION_CHUNK_WORKERS: int = 2
+    INGESTION_EMBED_WORKERS: int = 1
+    INGESTION_PERSIST_WORKERS: int = 1
+    INGESTION_EMBED_BATCH_SIZE: int = 256
+    INGESTION_MAX_CONCURRENT_JOBS: int = 2
+    
+    # 线程池配置
+    EMBEDDING_WORKERS: int = 1
+    SEARCH_WORKERS: int = 4
+    IO_WORKERS: int = 8
+    
+    # 向量索引缓存配置
+    INDEX_CACHE_MAX_INDICES: int = 16
+    INDEX_CACHE_MAX_MEMORY_MB: int = 2048
+    INDEX_FLUSH_INTERVAL: float = 30.0
+    
+    # 近似最近邻索引配置
+    ANN_PROMOTION_THRESHOLD: int = 50000
+    ANN_TRAINING_SAMPLE_SIZE: int = 100000
+    
+    # 混合召回配置
+    HYBRID_CANDIDATE_MULTIPLIER: int = 4
+    
+    # 重排序配置
+    RERANKER_MODELS: list = ["cross-encoder/ms-marco-MiniLM-L-6-v2", "BAAI/bge-reranker-base"]
+    RERANKER_DEFAULT_MODEL: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+    RERANKER_BATCH_SIZE: int = 32
+    RERANKER_WORKERS: int = 1
+    RERANKER_CACHE_SIZE: int = 100000
+    RERANK_DEFAULT_DEPTH: int = 50
+    RERANK_MAX_DEPTH: int = 200
+    
+    # 对话生成任务配置
+    GENERATION_MAX_CONCURRENT_JOBS: int = 1
+    GENERATION_MAX_ITEMS: int = 10000
+    GENERATION_CONCURRENCY: int = 8
+    GENERATION_MAX_CONCURRENCY: int = 64
+    GENERATION_REQUESTS_PER_SECOND: float = 5.0
+    GENERATION_BURST: int = 10
+    GENERATION_WRITE_BATCH_SIZE: int = 50
+    
+    # 检索增强对话配置
+    RAG_TOP_K: int = 8
+    RAG_CONTEXT_TOKEN_BUDGET: int = 2000
+    RAG_HISTORY_TOKEN_BUDGET: int = 4000
+    RAG_HISTORY_MAX_MESSAGES: int = 50
+    RAG_MAX_CHUNKS_PER_SOURCE: int = 2
+    RAG_MAX_TOKENS: int = 2000
+    
+    # 批量召回配置
+    BATCH_RECALL_MAX_QUERIES: int = 10000
+    BATCH_RECALL_CHUNK_SIZE: int = 256
+    
+    # 对话导入配置
+    IMPORT_BATCH_SIZE: int = 1000
+    # 单行（解压后）最大字节数，超出时拒绝导入
+    IMPORT_MAX_LINE_BYTES: int = 16 * 1024 * 1024
+    
+    # 分词器配置
+    TOKENIZER_ENCODING: str = "cl100k_base"
+    TOKENIZER_THREADS: int = 8
     
     # CORS配置
     BACKEND_CORS_ORIGINS: list = ["*"]
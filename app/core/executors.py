@@ -0,0 +1,75 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from typing import Any, Callable, Dict
+
+from app.core.config import settings
+
+# 线程池名称
+EMBEDDING_POOL = "embedding"  # 向量模型推理
+RERANK_POOL = "rerank"  # 交叉编码器重排序
+SEARCH_POOL = "search"  # FAISS 检索及索引维护
+IO_POOL = "io"  # SQLite 读写、文件解析等阻塞操作
+
+# 使用线程池而不是进程池：torch 和 FAISS 在计算时会释放 GIL，
+# 且模型与内存中的索引无法在进程间共享
+_pool_sizes = {
+    EMBEDDING_POOL: lambda: settings.EMBEDDING_WORKERS,
+    RERANK_POOL: lambda: settings.RERANKER_WORKERS,
+    SEARCH_POOL: lambda: settings.SEARCH_WORKERS,
+    IO_POOL: lambda: settings.IO_WORKERS,
+}
+
+_executors: Dict[str, ThreadPoolExecutor] = {}
+_executors_lock = Lock()
+
+
+def get_executor(name: str) -> ThreadPoolExecutor:
+    """获取（必要时创建）指定名称的线程池"""
+    with _executors_lock:
+        executor = _executors.get(name)
+        if executor is None:
+            if name not in _pool_sizes:
+                raise ValueError(f"未知的线程池: {name}")
+            executor = ThreadPoolExecutor(
+                max_workers=_pool_sizes[name](),
+                thread_name_prefix=f"{name}-worker"
+            )
+            _executors[name] = executor
+        return executor
+
+
+async def run_in_pool(name: str, func: Callable, *args, **kwargs) -> Any:
+    """在指定线程池中执行阻塞函数，不阻塞事件循环"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(name), functools.partial(func, *args, **kwargs))
+
+
+async def run_embedding(func: Callable, *args, **kwargs) -> Any:
+    """在向量模型线程池中执行"""
+    return await run_in_pool(EMBEDDING_POOL, func, *args, **kwargs)
+
+
+async def run_rerank(func: Callable, *args, **kwargs) -> Any:
+    """在重排序线程池中执行"""
+    return await run_in_pool(RERANK_POOL, func, *args, **kwargs)
+
+
+async def run_search(func: Callable, *args, **kwargs) -> Any:
+    """在检索线程池中执行"""
+    return await run_in_pool(SEARCH_POOL, func, *args, **kwargs)
+
+
+async def run_io(func: Callable, *args, **kwargs) -> Any:
+    """在 IO 线程池中执行"""
+    return await run_in_pool(IO_POOL, func, *args, **kwargs)
+
+
+def shutdown_executors(wait: bool = True):
+    """关闭所有线程池"""
+    with _executors_lock:
+        executors = list(_executors.values())
+        _executors.clear()
+    for executor in executors:
+        executor.shutdown(wait=wait)
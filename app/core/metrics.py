@@ -0,0 +1,40 @@
+from threading import Lock
+from typing import Dict
+
+
+class Counter:
+    """进程内的单调递增计数器，可在线程池中安全累加"""
+
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+        self._value = 0
+        self._lock = Lock()
+
+    def inc(self, amount: int = 1):
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> int:
+        return self._value
+
+
+_counters: Dict[str, Counter] = {}
+
+
+def counter(name: str, description: str) -> Counter:
+    """获取或注册计数器"""
+    if name not in _counters:
+        _counters[name] = Counter(name, description)
+    return _counters[name]
+
+
+def snapshot() -> Dict[str, int]:
+    """所有计数器的当前值"""
+    return {name: c.value for name, c in _counters.items()}
+
+
+# 流式聊天
+CHAT_STREAMS_COMPLETED = counter("chat_streams_completed_total", "正常结束的流式聊天数")
+CHAT_STREAMS_ABANDONED = counter("chat_streams_abandoned_total", "客户端断开后提前终止的流式聊天数")
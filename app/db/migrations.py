@@ -1,5 +1,260 @@
+import json
+import logging
+import os
 import sqlite3
+import faiss
 from app.core.config import settings
+from app.utils.fts import (
+    CHAT_MESSAGES_BIGRAM_TABLE, CONVERSATION_MESSAGES_BIGRAM_TABLE, DOCUMENTS_BIGRAM_TABLE, MAX_CONVERSATION_MESSAGES,
+    index_bigrams, index_conversation_bigrams
+)
+from app.utils.token import count_tokens_batch
+
+logger = logging.getLogger(__name__)
+
+def _add_column_if_missing(cursor: sqlite3.Cursor, table: str, column: str, definition: str) -> bool:
+    """为已存在的表补充新列，返回是否新增"""
+    cursor.execute(f"PRAGMA table_info({table})")
+    if any(row[1] == column for row in cursor.fetchall()):
+        return False
+    cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+    return True
+
+def _table_exists(cursor: sqlite3.Cursor, name: str) -> bool:
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (name,))
+    return cursor.fetchone() is not None
+
+def create_search_tables(cursor: sqlite3.Cursor):
+    """
+    创建全文检索表及同步触发器
+    
+    使用 trigram 分词器以支持中文等不以空格分词的文本。
+    训练对话的消息保存在 JSON 中，按消息拆分写入 conversation_messages_fts，
+    rowid 编码为 (conversation_id << 20) | 消息序号，便于按对话范围删除，
+    因此单个对话最多 MAX_CONVERSATION_MESSAGES 条消息，由仓储层在写入时检查。
+    
+    trigram 无法匹配少于 3 个字符的词，每张表另有一张 bigram 表，保存经 bigram_text()
+    展开的文本，供两字中文词等短查询使用。展开在 Python 中完成，由仓储层在写入原表的
+    同一事务中写入；触发器只按 rowid 删除，不依赖应用注册的 SQL 函数，其他连接也能正常
+    写原表，但其插入和更新的行不会进入 bigram 表，可删除 bigram 表后重启，由本函数重建。
+    """
+    # 训练对话消息
+    if not _table_exists(cursor, "conversation_messages_fts"):
+        cursor.execute("""
+        CREATE VIRTUAL TABLE conversation_messages_fts USING fts5(
+            content, role UNINDEXED, tokenize = 'trigram'
+        )
+        """)
+        cursor.execute("""
+        INSERT INTO conversation_messages_fts (rowid, content, role)
+        SELECT (c.id << 20) | m.key, json_extract(m.value, '$.content'), json_extract(m.value, '$.role')
+        FROM conversations c, json_each(c.messages) m
+        """)
+    cursor.execute("""
+    CREATE TRIGGER IF NOT EXISTS conversations_fts_ai AFTER INSERT ON conversations BEGIN
+        INSERT INTO conversation_messages_fts (rowid, content, role)
+        SELECT (new.id << 20) | m.key, json_extract(m.value, '$.content'), json_extract(m.value, '$.role')
+        FROM json_each(new.messages) m;
+    END
+    """)
+    cursor.execute("""
+    CREATE TRIGGER IF NOT EXISTS conversations_fts_ad AFTER DELETE ON conversations BEGIN
+        DELETE FROM conversation_messages_fts
+        WHERE rowid BETWEEN (old.id << 20) AND ((old.id << 20) | 1048575);
+    END
+    """)
+    cursor.execute("""
+    CREATE TRIGGER IF NOT EXISTS conversations_fts_au AFTER UPDATE OF messages ON conversations BEGIN
+        DELETE FROM conversation_messages_fts
+        WHERE rowid BETWEEN (old.id << 20) AND ((old.id << 20) | 1048575);
+        INSERT INTO conversation_messages_fts (rowid, content, role)
+        SELECT (new.id << 20) | m.key, json_extract(m.value, '$.content'), json_extract(m.value, '$.role')
+        FROM json_each(new.messages) m;
+    END
+    """)
+    rebuild = _create_bigram_table(cursor, CONVERSATION_MESSAGES_BIGRAM_TABLE)
+    cursor.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS conversations_bigram_fts_ad AFTER DELETE ON conversations BEGIN
+        DELETE FROM {CONVERSATION_MESSAGES_BIGRAM_TABLE}
+        WHERE rowid BETWEEN (old.id << 20) AND ((old.id << 20) | {MAX_CONVERSATION_MESSAGES - 1});
+    END
+    """)
+    # 新消息由仓储层在同一事务中写入
+    cursor.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS conversations_bigram_fts_au AFTER UPDATE OF messages ON conversations BEGIN
+        DELETE FROM {CONVERSATION_MESSAGES_BIGRAM_TABLE}
+        WHERE rowid BETWEEN (old.id << 20) AND ((old.id << 20) | {MAX_CONVERSATION_MESSAGES - 1});
+    END
+    """)
+    
+    # 聊天消息，外部内容表，不重复保存原文
+    if not _table_exists(cursor, "chat_messages_fts"):
+        cursor.execute("""
+        CREATE VIRTUAL TABLE chat_messages_fts USING fts5(
+            content, content = 'chat_messages', content_rowid = 'id', tokenize = 'trigram'
+        )
+        """)
+        cursor.execute("INSERT INTO chat_messages_fts (chat_messages_fts) VALUES ('rebuild')")
+    cursor.execute("""
+    CREATE TRIGGER IF NOT EXISTS chat_messages_fts_ai AFTER INSERT ON chat_messages BEGIN
+        INSERT INTO chat_messages_fts (rowid, content) VALUES (new.id, new.content);
+    END
+    """)
+    cursor.execute("""
+    CREATE TRIGGER IF NOT EXISTS chat_messages_fts_ad AFTER DELETE ON chat_messages BEGIN
+        INSERT INTO chat_messages_fts (chat_messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+    END
+    """)
+    cursor.execute("""
+    CREATE TRIGGER IF NOT EXISTS chat_messages_fts_au AFTER UPDATE OF content ON chat_messages BEGIN
+        INSERT INTO chat_messages_fts (chat_messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+        INSERT INTO chat_messages_fts (rowid, content) VALUES (new.id, new.content);
+    END
+    """)
+    rebuild |= _create_bigram_table(cursor, CHAT_MESSAGES_BIGRAM_TABLE)
+    cursor.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS chat_messages_bigram_fts_ad AFTER DELETE ON chat_messages BEGIN
+        DELETE FROM {CHAT_MESSAGES_BIGRAM_TABLE} WHERE rowid = old.id;
+    END
+    """)
+    cursor.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS chat_messages_bigram_fts_au AFTER UPDATE OF content ON chat_messages BEGIN
+        DELETE FROM {CHAT_MESSAGES_BIGRAM_TABLE} WHERE rowid = old.id;
+    END
+    """)
+    
+    # 索引文档，外部内容表，用于关键词召回
+    if not _table_exists(cursor, "documents_fts"):
+        cursor.execute("""
+        CREATE VIRTUAL TABLE documents_fts USING fts5(
+            content, content = 'documents', content_rowid = 'id', tokenize = 'trigram'
+        )
+        """)
+        cursor.execute("INSERT INTO documents_fts (documents_fts) VALUES ('rebuild')")
+    cursor.execute("""
+    CREATE TRIGGER IF NOT EXISTS documents_fts_ai AFTER INSERT ON documents BEGIN
+        INSERT INTO documents_fts (rowid, content) VALUES (new.id, new.content);
+    END
+    """)
+    cursor.execute("""
+    CREATE TRIGGER IF NOT EXISTS documents_fts_ad AFTER DELETE ON documents BEGIN
+        INSERT INTO documents_fts (documents_fts, rowid, content) VALUES ('delete', old.id, old.content);
+    END
+    """)
+    cursor.execute("""
+    CREATE TRIGGER IF NOT EXISTS documents_fts_au AFTER UPDATE OF content ON documents BEGIN
+        INSERT INTO documents_fts (documents_fts, rowid, content) VALUES ('delete', old.id, old.content);
+        INSERT INTO documents_fts (rowid, content) VALUES (new.id, new.content);
+    END
+    """)
+    rebuild |= _create_bigram_table(cursor, DOCUMENTS_BIGRAM_TABLE)
+    cursor.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS documents_bigram_fts_ad AFTER DELETE ON documents BEGIN
+        DELETE FROM {DOCUMENTS_BIGRAM_TABLE} WHERE rowid = old.id;
+    END
+    """)
+    cursor.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS documents_bigram_fts_au AFTER UPDATE OF content ON documents BEGIN
+        DELETE FROM {DOCUMENTS_BIGRAM_TABLE} WHERE rowid = old.id;
+    END
+    """)
+    
+    if rebuild:
+        rebuild_bigram_tables(cursor)
+
+def _create_bigram_table(cursor: sqlite3.Cursor, table: str) -> bool:
+    """
+    创建 bigram 表，返回是否新建
+    
+    早期版本的 bigram 表为无原文表，由调用 fts_bigrams() 的触发器写入，
+    遇到时连同触发器一起删除后重建
+    """
+    cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,))
+    row = cursor.fetchone()
+    if row is not None and "content = ''" not in row[0]:
+        return False
+    
+    if row is not None:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND sql LIKE '%fts_bigrams(%'")
+        for (trigger,) in cursor.fetchall():
+            cursor.execute(f"DROP TRIGGER {trigger}")
+        cursor.execute(f"DROP TABLE {table}")
+    cursor.execute(f"CREATE VIRTUAL TABLE {table} USING fts5(content, tokenize = 'unicode61')")
+    return True
+
+def rebuild_bigram_tables(cursor: sqlite3.Cursor):
+    """从原表重新生成全部 bigram 表"""
+    for table in (CONVERSATION_MESSAGES_BIGRAM_TABLE, CHAT_MESSAGES_BIGRAM_TABLE, DOCUMENTS_BIGRAM_TABLE):
+        cursor.execute(f"DELETE FROM {table}")
+    
+    # 边读边写，另用一个游标写入
+    writer = cursor.connection.cursor()
+    cursor.execute("SELECT id, messages FROM conversations")
+    while True:
+        rows = cursor.fetchmany(1000)
+        if not rows:
+            break
+        index_conversation_bigrams(writer, [(row[0], json.loads(row[1]) if row[1] else []) for row in rows])
+    
+    for table, source in ((CHAT_MESSAGES_BIGRAM_TABLE, "chat_messages"), (DOCUMENTS_BIGRAM_TABLE, "documents")):
+        cursor.execute(f"SELECT id, content FROM {source}")
+        while True:
+            rows = cursor.fetchmany(1000)
+            if not rows:
+                break
+            index_bigrams(writer, table, rows)
+
+def create_metadata_tables(cursor: sqlite3.Cursor):
+    """
+    创建文档元数据侧表及同步触发器
+    
+    documents.metadata 中的标量字段按 (key, value) 拆分保存，
+    召回时通过索引将元数据过滤条件解析为文档ID集合
+    """
+    created = not _table_exists(cursor, "document_metadata")
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS document_metadata (
+        document_id INTEGER NOT NULL,
+        index_id INTEGER NOT NULL,
+        key TEXT NOT NULL,
+        value,
+        PRIMARY KEY (document_id, key)
+    ) WITHOUT ROWID
+    """)
+    cursor.execute("""
+    CREATE INDEX IF NOT EXISTS idx_document_metadata_key_value 
+    ON document_metadata (index_id, key, value)
+    """)
+    if created:
+        cursor.execute("""
+        INSERT OR IGNORE INTO document_metadata (document_id, index_id, key, value)
+        SELECT d.id, d.index_id, m.key, m.value
+        FROM documents d, json_each(d.metadata) m
+        WHERE json_valid(d.metadata) AND m.key IS NOT NULL
+          AND m.type IN ('text', 'integer', 'real', 'true', 'false')
+        """)
+    cursor.execute("""
+    CREATE TRIGGER IF NOT EXISTS documents_metadata_ai AFTER INSERT ON documents BEGIN
+        INSERT OR IGNORE INTO document_metadata (document_id, index_id, key, value)
+        SELECT new.id, new.index_id, m.key, m.value FROM json_each(new.metadata) m
+        WHERE json_valid(new.metadata) AND m.key IS NOT NULL
+          AND m.type IN ('text', 'integer', 'real', 'true', 'false');
+    END
+    """)
+    cursor.execute("""
+    CREATE TRIGGER IF NOT EXISTS documents_metadata_ad AFTER DELETE ON documents BEGIN
+        DELETE FROM document_metadata WHERE document_id = old.id;
+    END
+    """)
+    cursor.execute("""
+    CREATE TRIGGER IF NOT EXISTS documents_metadata_au AFTER UPDATE OF metadata ON documents BEGIN
+        DELETE FROM document_metadata WHERE document_id = old.id;
+        INSERT OR IGNORE INTO document_metadata (document_id, index_id, key, value)
+        SELECT new.id, new.index_id, m.key, m.value FROM json_each(new.metadata) m
+        WHERE json_valid(new.metadata) AND m.key IS NOT NULL
+          AND m.type IN ('text', 'integer', 'real', 'true', 'false');
+    END
+    """)
 
 def init_db():
     with sqlite3.connect(settings.DB_FILE) as conn:
@@ -16,6 +271,16 @@ def init_db():
         )
         """)
         
+        # 对话的 token 数和消息数在写入时计算，读取时不再分词
+        _add_column_if_missing(cursor, "conversations", "token_count", "INTEGER")
+        _add_column_if_missing(cursor, "conversations", "message_count", "INTEGER")
+        
+        # 对话列表按 (updated_at, id) 游标分页
+        cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_conversations_updated_at 
+        ON conversations (updated_at, id)
+        """)
+        
         # 创建聊天对话表
         cursor.execute("""
         CREATE TABLE IF NOT EXISTS chat_conversations (
@@ -83,4 +348,176 @@ def init_db():
         )
         ''')
         
+        # 向量索引类型及参数
+        _add_column_if_missing(cursor, "vector_indices", "index_type", "TEXT NOT NULL DEFAULT 'flat'")
+        _add_column_if_missing(cursor, "vector_indices", "params", "TEXT")
+        # 向量索引是否已转换为以 documents.id 为向量ID，已转换的启动时不再读取
+        _add_column_if_missing(cursor, "vector_indices", "id_mapped", "INTEGER NOT NULL DEFAULT 0")
+        
+        cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_documents_index_id 
+        ON documents (index_id)
+        """)
+        
+        # 文档元数据侧表，用于按元数据过滤召回
+        create_metadata_tables(cursor)
+        
+        # 创建入库任务表
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS ingestion_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            index_id INTEGER NOT NULL,
+            job_type TEXT NOT NULL,
+            status TEXT NOT NULL,
+            params TEXT NOT NULL,
+            total_files INTEGER,
+            processed_files INTEGER NOT NULL DEFAULT 0,
+            failed_files INTEGER NOT NULL DEFAULT 0,
+            total_chunks INTEGER NOT NULL DEFAULT 0,
+            total_characters INTEGER NOT NULL DEFAULT 0,
+            error TEXT,
+            created_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL,
+            started_at TEXT,
+            finished_at TEXT,
+            FOREIGN KEY (index_id) REFERENCES indices (id) ON DELETE CASCADE
+        )
+        ''')
+        cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_ingestion_jobs_index_id 
+        ON ingestion_jobs (index_id)
+        """)
+        cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_ingestion_jobs_status 
+        ON ingestion_jobs (status)
+        """)
+        # 服务端工作目录不放在 params 中，避免通过任务接口暴露
+        if _add_column_if_missing(cursor, "ingestion_jobs", "work_dir", "TEXT"):
+            cursor.execute("""
+            UPDATE ingestion_jobs
+            SET work_dir = json_extract(params, '$.work_dir'), params = json_remove(params, '$.work_dir')
+            WHERE json_valid(params) AND json_extract(params, '$.work_dir') IS NOT NULL
+            """)
+        
+        # 创建入库任务检查点表，记录已写入数据库或处理失败的文件
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS ingestion_job_files (
+            job_id INTEGER NOT NULL,
+            path TEXT NOT NULL,
+            chunk_count INTEGER NOT NULL,
+            total_characters INTEGER NOT NULL,
+            created_at TEXT NOT NULL,
+            PRIMARY KEY (job_id, path),
+            FOREIGN KEY (job_id) REFERENCES ingestion_jobs (id) ON DELETE CASCADE
+        )
+        ''')
+        # 处理失败的文件同样记录，恢复任务时不再重试
+        _add_column_if_missing(cursor, "ingestion_job_files", "status", "TEXT NOT NULL DEFAULT 'completed'")
+        _add_column_if_missing(cursor, "ingestion_job_files", "error", "TEXT")
+        
+        # 创建对话生成任务表
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS generation_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            status TEXT NOT NULL,
+            params TEXT NOT NULL,
+            total_items INTEGER NOT NULL DEFAULT 0,
+            completed_items INTEGER NOT NULL DEFAULT 0,
+            failed_items INTEGER NOT NULL DEFAULT 0,
+            error TEXT,
+            created_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL,
+            started_at TEXT,
+            finished_at TEXT
+        )
+        ''')
+        cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_generation_jobs_status 
+        ON generation_jobs (status)
+        """)
+        
+        # 创建生成任务条目表，记录每条对话的生成状态
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS generation_job_items (
+            job_id INTEGER NOT NULL,
+            item_index INTEGER NOT NULL,
+            variables TEXT NOT NULL,
+            status TEXT NOT NULL,
+            conversation_id INTEGER,
+            error TEXT,
+            updated_at TEXT NOT NULL,
+            PRIMARY KEY (job_id, item_index),
+            FOREIGN KEY (job_id) REFERENCES generation_jobs (id) ON DELETE CASCADE
+        )
+        ''')
+        cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_generation_job_items_status 
+        ON generation_job_items (job_id, status)
+        """)
+        
+        # 全文检索
+        create_search_tables(cursor)
+        
         conn.commit()
+        
+        backfill_conversation_counts(conn)
+    
+    # 转换旧版向量索引文件
+    migrate_vector_indices()
+
+def backfill_conversation_counts(conn: sqlite3.Connection, batch_size: int = 1000):
+    """为尚未计算计数的对话补充 token_count 和 message_count"""
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            "SELECT id, messages FROM conversations "
+            "WHERE id > ? AND (token_count IS NULL OR message_count IS NULL) "
+            "ORDER BY id LIMIT ?",
+            (last_id, batch_size)
+        ).fetchall()
+        if not rows:
+            break
+        
+        messages_list = [json.loads(row[1]) for row in rows]
+        token_counts = count_tokens_batch(messages_list)
+        updates = [
+            (token_count, len(messages), row[0])
+            for row, messages, token_count in zip(rows, messages_list, token_counts)
+        ]
+        conn.executemany(
+            "UPDATE conversations SET token_count = ?, message_count = ? WHERE id = ?",
+            updates
+        )
+        conn.commit()
+        last_id = rows[-1][0]
+
+def migrate_vector_indices():
+    """
+    将旧版按位置序号存储的 FAISS 索引转换为以 documents.id 为向量ID的索引
+    
+    旧版索引无法可靠地映射回文档，因此直接用数据库中保存的向量重建。
+    检查过的索引在 vector_indices.id_mapped 中记录，之后启动时跳过。
+    """
+    from app.db.repositories.index import IndexRepository, get_index_file_path
+    from app.services.vector_index import is_id_mapped
+    
+    with sqlite3.connect(settings.DB_FILE) as conn:
+        index_ids = [
+            row[0] for row in conn.execute(
+                "SELECT i.id FROM indices i LEFT JOIN vector_indices v ON v.index_id = i.id "
+                "WHERE v.id_mapped IS NULL OR v.id_mapped = 0"
+            )
+        ]
+    
+    for index_id in index_ids:
+        index_file = get_index_file_path(index_id)
+        if os.path.exists(index_file) and not is_id_mapped(faiss.read_index(index_file)):
+            logger.info("转换旧版向量索引: %s", index_file)
+            faiss.write_index(IndexRepository.build_faiss_index(index_id), index_file)
+        
+        with sqlite3.connect(settings.DB_FILE) as conn:
+            conn.execute(
+                "INSERT INTO vector_indices (index_id, id_mapped) VALUES (?, 1) "
+                "ON CONFLICT (index_id) DO UPDATE SET id_mapped = 1",
+                (index_id,)
+            )
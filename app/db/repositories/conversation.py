@@ -1,82 +1,163 @@
+import base64
 import json
 import random
 from datetime import datetime
-from typing import List, Optional
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 from app.db.session import get_db_cursor
-from app.models.conversation import Conversation, Message, ChatConversation, ChatMessage
+from app.models.conversation import Conversation, ConversationPage, ConversationSearchHit, ConversationSummary, ConversationView, Message, SearchPage, TokenStats, ChatConversation, ChatMessage, ChatMessageSearchHit
 from app.schemas.request.chat import CreateChatRequest
-from app.schemas.response.conversation import ConversationResponse
-from app.utils.token import count_tokens
+from app.utils.fts import CHAT_MESSAGES_BIGRAM_TABLE, SNIPPET_CLOSE, SNIPPET_ELLIPSIS, SNIPPET_OPEN, SNIPPET_TOKENS, build_match_queries, check_message_count, index_bigrams, index_conversation_bigrams, make_snippet
+from app.utils.token import count_tokens, count_tokens_batch, resolve_encoding_name
+
+def encode_cursor(updated_at: str, conversation_id: int) -> str:
+    """将分页位置编码为不透明的游标"""
+    raw = json.dumps([updated_at, conversation_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    """解析分页游标，格式错误时抛出 ValueError"""
+    try:
+        updated_at, conversation_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except Exception:
+        raise ValueError("无效的分页游标")
+    if not isinstance(updated_at, str) or not isinstance(conversation_id, int):
+        raise ValueError("无效的分页游标")
+    return updated_at, conversation_id
+
+# 未提供标题时随机选用
+DEFAULT_TITLES = ["创意对话", "头脑风暴", "思维碰撞", "灵感火花", "智慧交流"]
+
+def message_counts(messages: List[Message]) -> Tuple[int, int]:
+    """计算消息列表的 token 数和消息数，写入对话时调用"""
+    return count_tokens([msg.dict() for msg in messages]), len(messages)
+
+def _insert_conversations(cursor, rows: List[Tuple[str, str, int, int, str, str]]) -> List[int]:
+    """
+    通过 executemany 插入对话，返回新对话的ID
+    
+    Args:
+        cursor: 数据库游标，由调用方提交事务
+        rows: (标题, 消息JSON, token数, 消息数, 创建时间, 更新时间) 的列表
+    """
+    if not rows:
+        return []
+    for row in rows:
+        check_message_count(row[3])
+    cursor.executemany(
+        "INSERT INTO conversations (title, messages, token_count, message_count, created_at, updated_at) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        rows
+    )
+    # executemany 不返回 lastrowid；同一写事务内 AUTOINCREMENT 分配的ID是连续的
+    cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'conversations'")
+    last_id = cursor.fetchone()[0]
+    conversation_ids = list(range(last_id - len(rows) + 1, last_id + 1))
+    index_conversation_bigrams(cursor, [
+        (conversation_id, json.loads(row[1])) for conversation_id, row in zip(conversation_ids, rows)
+    ])
+    return conversation_ids
 
 class ConversationRepository:
     @staticmethod
     def create(messages: List[Message]) -> Conversation:
         now = datetime.now().isoformat()
         messages_json = json.dumps([msg.dict() for msg in messages])
+        token_count, message_count = message_counts(messages)
+        check_message_count(message_count)
         
         with get_db_cursor() as cursor:
             cursor.execute(
-                "INSERT INTO conversations (messages, created_at, updated_at) VALUES (?, ?, ?)",
-                (messages_json, now, now)
+                "INSERT INTO conversations (title, messages, token_count, message_count, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (random.choice(DEFAULT_TITLES), messages_json, token_count, message_count, now, now)
             )
             conversation_id = cursor.lastrowid
+            index_conversation_bigrams(cursor, [(conversation_id, [msg.dict() for msg in messages])])
             
             return Conversation(
                 id=conversation_id,
                 messages=messages,
-                token_count=count_tokens(messages_json),
+                token_count=token_count,
+                message_count=message_count,
                 created_at=now,
                 updated_at=now
             )
     @staticmethod
-    def batch_create(conversations: CreateChatRequest) -> ConversationResponse:
+    def batch_create(conversations: CreateChatRequest) -> List[Conversation]:
+        """批量创建对话，在同一事务中插入，返回所有新对话"""
         now = datetime.now().isoformat()
-        created_conversations = []
+        messages_list = [[msg.dict() for msg in conversation] for conversation in conversations.messages]
+        titles = [conversations.title or random.choice(DEFAULT_TITLES) for _ in messages_list]
+        token_counts = count_tokens_batch(messages_list)
         
         with get_db_cursor() as cursor:
-            for conversation in conversations.messages:
-                conversation_id = random.randint(1000000000000000000, 9999999999999999999)
-                messages_json = json.dumps([msg.dict() for msg in conversation])
-                # 如果没有提供标题，生成一个随机标题
-                titles = ["创意对话", "头脑风暴", "思维碰撞", "灵感火花", "智慧交流"]
-                title = f"{random.choice(titles)} {conversation_id}"
-
-                cursor.execute(
-                    "INSERT INTO conversations (messages, title, created_at, updated_at) VALUES (?, ?, ?, ?)",
-                    (messages_json, title, now, now)
-                )
-                conversation_id = cursor.lastrowid
-                
-                created_conversations.append(
-                    Conversation(
-                        title=f"对话 {conversation_id}",
-                        id=conversation_id,
-                        messages=conversation,
-                        created_at=now,
-                        updated_at=now,
-                        message_count=len(conversation)
-                    )
-                )
-            
-            return ConversationResponse(
+            conversation_ids = _insert_conversations(cursor, [
+                (title, json.dumps(messages), token_count, len(messages), now, now)
+                for title, messages, token_count in zip(titles, messages_list, token_counts)
+            ])
+        
+        return [
+            Conversation(
                 id=conversation_id,
-                message_count=len(conversation),
-                messages=conversation
+                title=title,
+                messages=conversation,
+                created_at=now,
+                updated_at=now,
+                token_count=token_count,
+                message_count=len(conversation)
             )
+            for conversation_id, title, conversation, token_count
+            in zip(conversation_ids, titles, conversations.messages, token_counts)
+        ]
+    
+    @staticmethod
+    def bulk_import(items: List[Tuple[Optional[str], List[Dict[str, str]]]]) -> int:
+        """
+        批量导入已校验的对话，所有行在一个事务中通过 executemany 插入
+        
+        Args:
+            items: (标题, 消息列表) 的列表，标题为空时随机生成
+            
+        Returns:
+            int: 插入的对话数量
+        """
+        if not items:
+            return 0
+        
+        with get_db_cursor() as cursor:
+            ConversationRepository.insert_many(cursor, items)
+        return len(items)
+    
+    @staticmethod
+    def insert_many(cursor, items: List[Tuple[Optional[str], List[Dict[str, str]]]]) -> List[int]:
+        """
+        在调用方的事务中批量插入对话，便于与其他表的更新一起提交
+        
+        Args:
+            cursor: 数据库游标，由调用方提交事务
+            items: (标题, 消息列表) 的列表，标题为空时随机生成
+            
+        Returns:
+            List[int]: 新对话的ID，与 items 顺序一致
+        """
+        now = datetime.now().isoformat()
+        token_counts = count_tokens_batch([messages for _, messages in items])
+        return _insert_conversations(cursor, [
+            (title or random.choice(DEFAULT_TITLES), json.dumps(messages), token_count, len(messages), now, now)
+            for (title, messages), token_count in zip(items, token_counts)
+        ])
     
     @staticmethod
     def get(conversation_id: int) -> Optional[Conversation]:
         with get_db_cursor() as cursor:
             cursor.execute(
-                "SELECT id, title, messages, created_at, updated_at FROM conversations WHERE id = ?",
+                "SELECT id, title, messages, created_at, updated_at, token_count, message_count FROM conversations WHERE id = ?",
                 (conversation_id,)
             )
             row = cursor.fetchone()
             if not row:
                 return None
             
-            messages_data = json.loads(row[2])
-            messages = [Message(**msg) for msg in messages_data]
+            messages = [Message(**msg) for msg in json.loads(row[2])]
             
             return Conversation(
                 id=row[0],
@@ -84,24 +165,22 @@ class ConversationRepository:
                 messages=messages,
                 created_at=row[3],
                 updated_at=row[4],
-                token_count=count_tokens(messages_data),
-                message_count=len(messages)
+                token_count=row[5],
+                message_count=row[6]
             )
     
     @staticmethod
     def list() -> List[Conversation]:
         with get_db_cursor() as cursor:
             cursor.execute(
-                "SELECT id, title, messages, created_at, updated_at FROM conversations ORDER BY updated_at DESC"
+                "SELECT id, title, messages, created_at, updated_at, token_count, message_count "
+                "FROM conversations ORDER BY updated_at DESC, id DESC"
             )
             rows = cursor.fetchall()
             
             conversations = []
             for row in rows:
-                messages_data = json.loads(row[2])
-                messages = [Message(**msg) for msg in messages_data]
-                token_count = count_tokens(messages_data)
-                message_count = len(messages)
+                messages = [Message(**msg) for msg in json.loads(row[2])]
                 
                 conversations.append(
                     Conversation(
@@ -110,12 +189,253 @@ class ConversationRepository:
                         messages=messages,
                         created_at=row[3],
                         updated_at=row[4],
-                        token_count=token_count,
-                        message_count=message_count
+                        token_count=row[5],
+                        message_count=row[6]
                     )
                 )
             return conversations
     
+    @staticmethod
+    def list_page(limit: int, cursor: Optional[str] = None, view: ConversationView = ConversationView.SUMMARY) -> ConversationPage:
+        """
+        按 (updated_at, id) 倒序分页获取对话
+        
+        使用游标而非 OFFSET，翻页开销与页码无关；摘要视图不读取和解析消息内容
+        
+        Args:
+            limit: 每页数量
+            cursor: 上一页返回的游标，为空时从第一页开始
+            view: 返回摘要还是完整对话
+            
+        Returns:
+            当前页的对话及下一页游标
+        """
+        # 摘要视图不读取消息内容
+        columns = "id, title, created_at, updated_at, token_count, message_count"
+        if view == ConversationView.FULL:
+            columns += ", messages"
+        
+        sql = f"SELECT {columns} FROM conversations"
+        params: list = []
+        if cursor:
+            sql += " WHERE (updated_at, id) < (?, ?)"
+            params.extend(decode_cursor(cursor))
+        # 多取一条用于判断是否还有下一页
+        sql += " ORDER BY updated_at DESC, id DESC LIMIT ?"
+        params.append(limit + 1)
+        
+        with get_db_cursor() as db_cursor:
+            db_cursor.execute(sql, params)
+            rows = db_cursor.fetchall()
+        
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        
+        if view == ConversationView.SUMMARY:
+            items = [
+                ConversationSummary(
+                    id=row[0],
+                    title=row[1],
+                    created_at=row[2],
+                    updated_at=row[3],
+                    token_count=row[4],
+                    message_count=row[5]
+                )
+                for row in rows
+            ]
+        else:
+            items = [
+                Conversation(
+                    id=row[0],
+                    title=row[1],
+                    created_at=row[2],
+                    updated_at=row[3],
+                    token_count=row[4],
+                    message_count=row[5],
+                    messages=[Message(**msg) for msg in json.loads(row[6])]
+                )
+                for row in rows
+            ]
+        
+        next_cursor = encode_cursor(rows[-1][3], rows[-1][0]) if has_more else None
+        return ConversationPage(items=items, next_cursor=next_cursor)
+    
+    @staticmethod
+    def search(query: str, role: Optional[str] = None, limit: int = 20, offset: int = 0) -> SearchPage[ConversationSearchHit]:
+        """
+        全文检索训练对话中的消息，按 BM25 相关度排序
+        
+        少于 3 个字符的词通过 bigram 表匹配；全部为短词时按 bigram 表的 BM25 排序，
+        摘要在 Python 中生成
+        
+        Args:
+            query: 查询字符串，多个词之间为 AND 关系
+            role: 只检索指定角色的消息
+            limit: 每页数量
+            offset: 偏移量
+            
+        Returns:
+            匹配的消息
+        """
+        match_query, bigram_query = build_match_queries(query)
+        if match_query is None and bigram_query is None:
+            return SearchPage(items=[], offset=offset, has_more=False)
+        
+        with get_db_cursor() as cursor:
+            if match_query is not None:
+                sql = (
+                    "SELECT f.rowid >> 20, c.title, f.rowid & 1048575, f.role, "
+                    "snippet(conversation_messages_fts, 0, ?, ?, ?, ?), f.rank "
+                    "FROM conversation_messages_fts f "
+                    "JOIN conversations c ON c.id = f.rowid >> 20 "
+                    "WHERE conversation_messages_fts MATCH ?"
+                )
+                params: list = [SNIPPET_OPEN, SNIPPET_CLOSE, SNIPPET_ELLIPSIS, SNIPPET_TOKENS, match_query]
+                if bigram_query is not None:
+                    sql += (
+                        " AND f.rowid IN (SELECT rowid FROM conversation_messages_bigram_fts "
+                        "WHERE conversation_messages_bigram_fts MATCH ?)"
+                    )
+                    params.append(bigram_query)
+                order_by = "f.rank"
+            else:
+                sql = (
+                    "SELECT b.rowid >> 20, c.title, b.rowid & 1048575, f.role, f.content, b.rank "
+                    "FROM conversation_messages_bigram_fts b "
+                    "JOIN conversation_messages_fts f ON f.rowid = b.rowid "
+                    "JOIN conversations c ON c.id = b.rowid >> 20 "
+                    "WHERE conversation_messages_bigram_fts MATCH ?"
+                )
+                params = [bigram_query]
+                order_by = "b.rank"
+            if role:
+                sql += " AND f.role = ?"
+                params.append(role)
+            # 多取一条用于判断是否还有下一页
+            sql += f" ORDER BY {order_by} LIMIT ? OFFSET ?"
+            params.extend([limit + 1, offset])
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+        
+        items = [
+            ConversationSearchHit(
+                conversation_id=row[0],
+                title=row[1],
+                message_index=row[2],
+                role=row[3],
+                snippet=row[4] if match_query is not None else make_snippet(row[4], query),
+                score=-row[5]
+            )
+            for row in rows[:limit]
+        ]
+        return SearchPage(items=items, offset=offset, has_more=len(rows) > limit)
+    
+    @staticmethod
+    def iter_messages(batch_size: int = 1000) -> Iterator[List[Tuple[int, List[Dict[str, Any]]]]]:
+        """按 id 分批遍历所有对话的消息，每批为 (id, 消息列表) 的列表"""
+        last_id = 0
+        while True:
+            with get_db_cursor() as cursor:
+                cursor.execute(
+                    "SELECT id, messages FROM conversations WHERE id > ? ORDER BY id LIMIT ?",
+                    (last_id, batch_size)
+                )
+                rows = cursor.fetchall()
+            if not rows:
+                return
+            yield [(row[0], json.loads(row[1])) for row in rows]
+            last_id = rows[-1][0]
+    
+    @staticmethod
+    def iter_export_rows(
+        start_id: Optional[int] = None,
+        end_id: Optional[int] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        max_tokens: Optional[int] = None,
+        batch_size: int = 500
+    ) -> Iterator[Tuple[int, str, str]]:
+        """
+        按 id 顺序逐条返回待导出的对话 (id, 标题, 消息JSON)
+        
+        每批单独查询并立即归还连接，内存占用与数据量无关
+        
+        Args:
+            start_id: 起始 id（含）
+            end_id: 结束 id（含）
+            start_date: 创建时间下限（含）
+            end_date: 创建时间上限（含）
+            max_tokens: 跳过 token 数超过该值的对话
+            batch_size: 每批读取的行数
+        """
+        conditions = ["id > ?"]
+        params: list = []
+        if end_id is not None:
+            conditions.append("id <= ?")
+            params.append(end_id)
+        if start_date is not None:
+            conditions.append("created_at >= ?")
+            params.append(start_date.isoformat())
+        if end_date is not None:
+            conditions.append("created_at <= ?")
+            params.append(end_date.isoformat())
+        if max_tokens is not None:
+            conditions.append("token_count <= ?")
+            params.append(max_tokens)
+        sql = (
+            f"SELECT id, title, messages FROM conversations WHERE {' AND '.join(conditions)} "
+            "ORDER BY id LIMIT ?"
+        )
+        
+        last_id = (start_id - 1) if start_id is not None else 0
+        while True:
+            with get_db_cursor() as cursor:
+                cursor.execute(sql, [last_id, *params, batch_size])
+                rows = cursor.fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield row[0], row[1], row[2]
+            last_id = rows[-1][0]
+    
+    @staticmethod
+    def token_stats(encoding: Optional[str] = None) -> TokenStats:
+        """
+        统计整个数据集的 token 数
+        
+        Args:
+            encoding: 编码名或模型名，为空时直接汇总写入时保存的 token_count
+            
+        Returns:
+            token 统计
+        """
+        if encoding is None:
+            with get_db_cursor() as cursor:
+                cursor.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(message_count), 0), "
+                    "COALESCE(SUM(token_count), 0), COALESCE(MAX(token_count), 0) FROM conversations"
+                )
+                conversation_count, message_count, total_tokens, max_tokens = cursor.fetchone()
+            encoding_name = resolve_encoding_name()
+        else:
+            encoding_name = resolve_encoding_name(encoding)
+            conversation_count = message_count = total_tokens = max_tokens = 0
+            for batch in ConversationRepository.iter_messages():
+                token_counts = count_tokens_batch([messages for _, messages in batch], encoding_name)
+                conversation_count += len(batch)
+                message_count += sum(len(messages) for _, messages in batch)
+                total_tokens += sum(token_counts)
+                max_tokens = max(max_tokens, max(token_counts))
+        
+        return TokenStats(
+            encoding=encoding_name,
+            conversation_count=conversation_count,
+            message_count=message_count,
+            total_tokens=total_tokens,
+            max_tokens=max_tokens,
+            avg_tokens=round(total_tokens / conversation_count, 2) if conversation_count else 0.0
+        )
+    
     @staticmethod
     def delete(conversation_id: int) -> bool:
         with get_db_cursor() as cursor:
@@ -127,7 +447,7 @@ class ConversationRepository:
         with get_db_cursor() as cursor:
             # 获取原始对话
             cursor.execute(
-                "SELECT title, messages FROM conversations WHERE id = ?", 
+                "SELECT title, messages, token_count, message_count FROM conversations WHERE id = ?", 
                 (conversation_id,)
             )
             row = cursor.fetchone()
@@ -141,14 +461,15 @@ class ConversationRepository:
             # 插入新对话
             now = datetime.now().isoformat()
             cursor.execute(
-                "INSERT INTO conversations (title, messages, created_at, updated_at) VALUES (?, ?, ?, ?)",
-                (new_title, row[1], now, now)
+                "INSERT INTO conversations (title, messages, token_count, message_count, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (new_title, row[1], row[2], row[3], now, now)
             )
             new_id = cursor.lastrowid
+            index_conversation_bigrams(cursor, [(new_id, json.loads(row[1]))])
             
             # 获取新对话的完整信息
             cursor.execute(
-                "SELECT id, title, messages, created_at, updated_at FROM conversations WHERE id = ?", 
+                "SELECT id, title, messages, created_at, updated_at, token_count, message_count FROM conversations WHERE id = ?", 
                 (new_id,)
             )
             new_row = cursor.fetchone()
@@ -159,26 +480,34 @@ class ConversationRepository:
                 title=new_row[1],
                 messages=messages,
                 created_at=new_row[3],
-                updated_at=new_row[4]
+                updated_at=new_row[4],
+                token_count=new_row[5],
+                message_count=new_row[6]
             )
     @staticmethod
     def update(conversation_id: int, conversation: Conversation) -> Optional[Conversation]:
         with get_db_cursor() as cursor:
             now = datetime.now().isoformat()
             messages_json = json.dumps([msg.dict() for msg in conversation.messages])
+            token_count, message_count = message_counts(conversation.messages)
+            check_message_count(message_count)
             
             cursor.execute(
-                "UPDATE conversations SET title = ?, messages = ?, updated_at = ? WHERE id = ?",
-                (conversation.title, messages_json, now, conversation_id)
+                "UPDATE conversations SET title = ?, messages = ?, token_count = ?, message_count = ?, updated_at = ? WHERE id = ?",
+                (conversation.title, messages_json, token_count, message_count, now, conversation_id)
             )
             
             if cursor.rowcount == 0:
                 return None
+            # 触发器已删除旧消息的 bigram
+            index_conversation_bigrams(cursor, [(conversation_id, [msg.dict() for msg in conversation.messages])])
                 
             return Conversation(
                 id=conversation_id,
                 title=conversation.title,
                 messages=conversation.messages,
+                token_count=token_count,
+                message_count=message_count,
                 updated_at=now
             )
 
@@ -265,4 +594,126 @@ class ChatConversationRepository:
             if cursor.rowcount == 0:
                 return None
             
-            return ChatConversationRepository.get(conversation_id) 
\ No newline at end of file
+            return ChatConversationRepository.get(conversation_id)
+
+    @staticmethod
+    def search_messages(query: str, conversation_id: Optional[int] = None, limit: int = 20, offset: int = 0) -> SearchPage[ChatMessageSearchHit]:
+        """
+        全文检索聊天消息，按 BM25 相关度排序
+        
+        少于 3 个字符的词通过 bigram 表匹配；全部为短词时按 bigram 表的 BM25 排序，
+        摘要在 Python 中生成
+        
+        Args:
+            query: 查询字符串，多个词之间为 AND 关系
+            conversation_id: 只检索指定对话
+            limit: 每页数量
+            offset: 偏移量
+            
+        Returns:
+            匹配的消息
+        """
+        match_query, bigram_query = build_match_queries(query)
+        if match_query is None and bigram_query is None:
+            return SearchPage(items=[], offset=offset, has_more=False)
+        
+        with get_db_cursor() as cursor:
+            if match_query is not None:
+                sql = (
+                    "SELECT m.id, m.conversation_id, c.title, m.role, "
+                    "snippet(chat_messages_fts, 0, ?, ?, ?, ?), f.rank, m.created_at "
+                    "FROM chat_messages_fts f "
+                    "JOIN chat_messages m ON m.id = f.rowid "
+                    "JOIN chat_conversations c ON c.id = m.conversation_id "
+                    "WHERE chat_messages_fts MATCH ?"
+                )
+                params: list = [SNIPPET_OPEN, SNIPPET_CLOSE, SNIPPET_ELLIPSIS, SNIPPET_TOKENS, match_query]
+                if bigram_query is not None:
+                    sql += " AND f.rowid IN (SELECT rowid FROM chat_messages_bigram_fts WHERE chat_messages_bigram_fts MATCH ?)"
+                    params.append(bigram_query)
+                order_by = "f.rank"
+            else:
+                sql = (
+                    "SELECT m.id, m.conversation_id, c.title, m.role, m.content, b.rank, m.created_at "
+                    "FROM chat_messages_bigram_fts b "
+                    "JOIN chat_messages m ON m.id = b.rowid "
+                    "JOIN chat_conversations c ON c.id = m.conversation_id "
+                    "WHERE chat_messages_bigram_fts MATCH ?"
+                )
+                params = [bigram_query]
+                order_by = "b.rank"
+            if conversation_id is not None:
+                sql += " AND m.conversation_id = ?"
+                params.append(conversation_id)
+            # 多取一条用于判断是否还有下一页
+            sql += f" ORDER BY {order_by} LIMIT ? OFFSET ?"
+            params.extend([limit + 1, offset])
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+        
+        items = [
+            ChatMessageSearchHit(
+                message_id=row[0],
+                conversation_id=row[1],
+                conversation_title=row[2],
+                role=row[3],
+                snippet=row[4] if match_query is not None else make_snippet(row[4], query),
+                score=-row[5],
+                created_at=row[6]
+            )
+            for row in rows[:limit]
+        ]
+        return SearchPage(items=items, offset=offset, has_more=len(rows) > limit)
+
+class ChatMessageRepository:
+    @staticmethod
+    def create(conversation_id: int, role: str, content: str) -> ChatMessage:
+        """保存一条聊天消息，并更新对话的修改时间"""
+        now = datetime.now().isoformat()
+        
+        with get_db_cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO chat_messages (conversation_id, role, content, created_at) VALUES (?, ?, ?, ?)",
+                (conversation_id, role, content, now)
+            )
+            message_id = cursor.lastrowid
+            index_bigrams(cursor, CHAT_MESSAGES_BIGRAM_TABLE, [(message_id, content)])
+            cursor.execute(
+                "UPDATE chat_conversations SET updated_at = ? WHERE id = ?",
+                (now, conversation_id)
+            )
+            
+            return ChatMessage(
+                id=message_id,
+                conversation_id=conversation_id,
+                role=role,
+                content=content,
+                created_at=now
+            )
+    
+    @staticmethod
+    def list(conversation_id: int) -> List[ChatMessage]:
+        with get_db_cursor() as cursor:
+            cursor.execute(
+                "SELECT id, conversation_id, role, content, created_at FROM chat_messages "
+                "WHERE conversation_id = ? ORDER BY id",
+                (conversation_id,)
+            )
+            return [
+                ChatMessage(id=row[0], conversation_id=row[1], role=row[2], content=row[3], created_at=row[4])
+                for row in cursor.fetchall()
+            ]
+    
+    @staticmethod
+    def recent(conversation_id: int, limit: int) -> List[ChatMessage]:
+        """获取对话最近的 limit 条消息，按时间正序返回"""
+        with get_db_cursor() as cursor:
+            cursor.execute(
+                "SELECT id, conversation_id, role, content, created_at FROM chat_messages "
+                "WHERE conversation_id = ? ORDER BY id DESC LIMIT ?",
+                (conversation_id, limit)
+            )
+            return [
+                ChatMessage(id=row[0], conversation_id=row[1], role=row[2], content=row[3], created_at=row[4])
+                for row in reversed(cursor.fetchall())
+            ]
@@ -0,0 +1,213 @@
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from app.db.session import get_db_cursor
+from app.db.repositories.conversation import ConversationRepository
+from app.models.generation_job import GenerationItemStatus, GenerationJob, GenerationJobItem, GenerationJobStatus
+
+_JOB_COLUMNS = (
+    "id, status, params, total_items, completed_items, failed_items, "
+    "error, created_at, updated_at, started_at, finished_at"
+)
+
+def _row_to_job(row) -> GenerationJob:
+    return GenerationJob(
+        id=row[0],
+        status=row[1],
+        params=json.loads(row[2]) if row[2] else {},
+        total_items=row[3],
+        completed_items=row[4],
+        failed_items=row[5],
+        error=row[6],
+        created_at=row[7],
+        updated_at=row[8],
+        started_at=row[9],
+        finished_at=row[10]
+    )
+
+class GenerationJobRepository:
+    @staticmethod
+    def create(params: Dict[str, Any], item_variables: List[Dict[str, Any]]) -> GenerationJob:
+        """创建任务及其全部条目"""
+        now = datetime.now().isoformat()
+
+        with get_db_cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO generation_jobs (status, params, total_items, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (GenerationJobStatus.PENDING.value, json.dumps(params), len(item_variables), now, now)
+            )
+            job_id = cursor.lastrowid
+            cursor.executemany(
+                "INSERT INTO generation_job_items (job_id, item_index, variables, status, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [
+                    (job_id, i, json.dumps(variables), GenerationItemStatus.PENDING.value, now)
+                    for i, variables in enumerate(item_variables)
+                ]
+            )
+
+        return GenerationJobRepository.get(job_id)
+
+    @staticmethod
+    def get(job_id: int) -> Optional[GenerationJob]:
+        with get_db_cursor() as cursor:
+            cursor.execute(f"SELECT {_JOB_COLUMNS} FROM generation_jobs WHERE id = ?", (job_id,))
+            row = cursor.fetchone()
+            return _row_to_job(row) if row else None
+
+    @staticmethod
+    def list() -> List[GenerationJob]:
+        with get_db_cursor() as cursor:
+            cursor.execute(f"SELECT {_JOB_COLUMNS} FROM generation_jobs ORDER BY id DESC")
+            return [_row_to_job(row) for row in cursor.fetchall()]
+
+    @staticmethod
+    def list_unfinished() -> List[GenerationJob]:
+        """获取未结束的任务，用于服务重启后恢复"""
+        with get_db_cursor() as cursor:
+            cursor.execute(
+                f"SELECT {_JOB_COLUMNS} FROM generation_jobs WHERE status IN (?, ?) ORDER BY id",
+                (GenerationJobStatus.PENDING.value, GenerationJobStatus.RUNNING.value)
+            )
+            return [_row_to_job(row) for row in cursor.fetchall()]
+
+    @staticmethod
+    def list_items(job_id: int, status: Optional[GenerationItemStatus] = None, limit: int = 100, offset: int = 0) -> List[GenerationJobItem]:
+        query = (
+            "SELECT job_id, item_index, variables, status, conversation_id, error, updated_at "
+            "FROM generation_job_items WHERE job_id = ?"
+        )
+        params: List[Any] = [job_id]
+        if status is not None:
+            query += " AND status = ?"
+            params.append(status.value)
+        query += " ORDER BY item_index LIMIT ? OFFSET ?"
+        params.extend([limit, offset])
+
+        with get_db_cursor() as cursor:
+            cursor.execute(query, params)
+            return [
+                GenerationJobItem(
+                    job_id=row[0],
+                    item_index=row[1],
+                    variables=json.loads(row[2]),
+                    status=row[3],
+                    conversation_id=row[4],
+                    error=row[5],
+                    updated_at=row[6]
+                )
+                for row in cursor.fetchall()
+            ]
+
+    @staticmethod
+    def pending_items(job_id: int) -> List[Tuple[int, Dict[str, Any]]]:
+        """获取尚未生成的条目，返回 (序号, 模板变量) 列表"""
+        with get_db_cursor() as cursor:
+            cursor.execute(
+                "SELECT item_index, variables FROM generation_job_items "
+                "WHERE job_id = ? AND status = ? ORDER BY item_index",
+                (job_id, GenerationItemStatus.PENDING.value)
+            )
+            return [(row[0], json.loads(row[1])) for row in cursor.fetchall()]
+
+    @staticmethod
+    def mark_running(job_id: int) -> bool:
+        """将未结束的任务标记为运行中，任务已被取消时返回 False"""
+        now = datetime.now().isoformat()
+        with get_db_cursor() as cursor:
+            cursor.execute(
+                "UPDATE generation_jobs SET status = ?, started_at = COALESCE(started_at, ?), updated_at = ? "
+                "WHERE id = ? AND status IN (?, ?)",
+                (GenerationJobStatus.RUNNING.value, now, now, job_id,
+                 GenerationJobStatus.PENDING.value, GenerationJobStatus.RUNNING.value)
+            )
+            return cursor.rowcount > 0
+
+    @staticmethod
+    def finish(job_id: int, status: GenerationJobStatus, error: Optional[str] = None) -> bool:
+        """将运行中的任务标记为结束状态，任务已被取消时保持不变并返回 False"""
+        now = datetime.now().isoformat()
+        with get_db_cursor() as cursor:
+            cursor.execute(
+                "UPDATE generation_jobs SET status = ?, error = ?, finished_at = ?, updated_at = ? "
+                "WHERE id = ? AND status = ?",
+                (status.value, error, now, now, job_id, GenerationJobStatus.RUNNING.value)
+            )
+            return cursor.rowcount > 0
+
+    @staticmethod
+    def cancel(job_id: int) -> bool:
+        """取消未结束的任务"""
+        now = datetime.now().isoformat()
+        with get_db_cursor() as cursor:
+            cursor.execute(
+                "UPDATE generation_jobs SET status = ?, finished_at = ?, updated_at = ? "
+                "WHERE id = ? AND status IN (?, ?)",
+                (GenerationJobStatus.CANCELLED.value, now, now, job_id,
+                 GenerationJobStatus.PENDING.value, GenerationJobStatus.RUNNING.value)
+            )
+            return cursor.rowcount > 0
+
+    @staticmethod
+    def retry_failed(job_id: int) -> int:
+        """将失败的条目重置为待生成，并将已结束的任务重新置为待执行，返回重置的条目数"""
+        now = datetime.now().isoformat()
+        with get_db_cursor() as cursor:
+            cursor.execute(
+                "UPDATE generation_job_items SET status = ?, error = NULL, updated_at = ? "
+                "WHERE job_id = ? AND status = ?",
+                (GenerationItemStatus.PENDING.value, now, job_id, GenerationItemStatus.FAILED.value)
+            )
+            count = cursor.rowcount
+            if count:
+                cursor.execute(
+                    "UPDATE generation_jobs SET status = ?, failed_items = failed_items - ?, error = NULL, "
+                    "finished_at = NULL, updated_at = ? WHERE id = ?",
+                    (GenerationJobStatus.PENDING.value, count, now, job_id)
+                )
+            return count
+
+    @staticmethod
+    def record_results(
+        job_id: int,
+        completed: List[Tuple[int, Optional[str], List[Dict[str, str]]]],
+        failed: List[Tuple[int, str]]
+    ) -> None:
+        """
+        批量写入生成结果，对话与条目状态在同一事务中提交
+
+        Args:
+            job_id: 任务ID
+            completed: (条目序号, 标题, 消息列表) 的列表，通过 ConversationRepository 写入对话表
+            failed: (条目序号, 错误信息) 的列表
+        """
+        if not completed and not failed:
+            return
+
+        now = datetime.now().isoformat()
+        with get_db_cursor() as cursor:
+            conversation_ids = ConversationRepository.insert_many(
+                cursor, [(title, messages) for _, title, messages in completed]
+            ) if completed else []
+            cursor.executemany(
+                "UPDATE generation_job_items SET status = ?, conversation_id = ?, error = NULL, updated_at = ? "
+                "WHERE job_id = ? AND item_index = ?",
+                [
+                    (GenerationItemStatus.COMPLETED.value, conversation_id, now, job_id, item_index)
+                    for (item_index, _, _), conversation_id in zip(completed, conversation_ids)
+                ]
+            )
+            cursor.executemany(
+                "UPDATE generation_job_items SET status = ?, error = ?, updated_at = ? "
+                "WHERE job_id = ? AND item_index = ?",
+                [
+                    (GenerationItemStatus.FAILED.value, error, now, job_id, item_index)
+                    for item_index, error in failed
+                ]
+            )
+            cursor.execute(
+                "UPDATE generation_jobs SET completed_items = completed_items + ?, failed_items = failed_items + ?, "
+                "updated_at = ? WHERE id = ?",
+                (len(completed), len(failed), now, job_id)
+            )
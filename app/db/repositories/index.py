@@ -1,13 +1,30 @@
 import json
+import logging
 import numpy as np
 import faiss
-import pickle
 import os
+import sqlite3
+import threading
 from datetime import datetime
-from typing import List, Optional
+from typing import Callable, Dict, List, Optional, Set, Tuple
 from app.db.session import get_db_cursor
-from app.models.index import Index, IndexCreate, Document, DocumentCreate
+from app.models.index import Index, IndexCreate, IndexType, IndexParams, Document, DocumentCreate, FilterOperator, MetadataFilter
 from app.core.config import settings
+from app.services.index_manager import IndexManager
+from app.utils.fts import DOCUMENTS_BIGRAM_TABLE, build_match_queries, index_bigrams
+from app.services.vector_index import (
+    build_ann_index,
+    create_flat_index,
+    export_flat_vectors,
+    is_flat_index,
+    is_id_mapped,
+    mapped_ids,
+    needs_training,
+    remove_ids,
+    search as search_vectors,
+)
+
+logger = logging.getLogger(__name__)
 
 # 创建索引文件目录
 INDICES_DIR = os.path.join(os.path.dirname(settings.DB_FILE), "vector_indices")
@@ -17,6 +34,44 @@ def get_index_file_path(index_id: int) -> str:
     """获取索引文件路径"""
     return os.path.join(INDICES_DIR, f"index_{index_id}.faiss")
 
+# 进程级索引缓存，所有 FAISS 读写都通过它进行
+index_manager = IndexManager(
+    max_indices=settings.INDEX_CACHE_MAX_INDICES,
+    max_memory_bytes=settings.INDEX_CACHE_MAX_MEMORY_MB * 1024 * 1024,
+    flush_interval=settings.INDEX_FLUSH_INTERVAL,
+    path_factory=get_index_file_path,
+)
+
+# 正在后台升级索引类型的索引ID
+_promoting_indices: Set[int] = set()
+_promoting_lock = threading.Lock()
+
+# HNSW 等不支持删除的索引中，已删除文档的向量ID（墓碑），检索时排除，由后台重建清除
+_tombstones: Dict[int, Set[int]] = {}
+_rebuilding_indices: Set[int] = set()
+_tombstone_lock = threading.Lock()
+
+def get_tombstones(index_id: int) -> Set[int]:
+    """索引当前的墓碑ID"""
+    with _tombstone_lock:
+        return set(_tombstones.get(index_id, ()))
+
+def _discard_tombstones(index_id: int):
+    """清除已删除索引的墓碑"""
+    with _tombstone_lock:
+        _tombstones.pop(index_id, None)
+
+def _row_to_index(row) -> Index:
+    return Index(
+        id=row[0],
+        name=row[1],
+        description=row[2],
+        created_at=row[3],
+        document_count=row[4],
+        index_type=row[5] or IndexType.FLAT,
+        index_params=IndexParams(**json.loads(row[6])) if row[6] else None
+    )
+
 class IndexRepository:
     @staticmethod
     def create(index: IndexCreate) -> Index:
@@ -27,32 +82,41 @@ class IndexRepository:
             )
             index_id = cursor.lastrowid
             
-            # 创建空的 FAISS 索引
-            faiss_index = faiss.IndexFlatL2(384)  # 使用配置中的维度
-            
-            # 保存到文件系统
-            faiss.write_index(faiss_index, get_index_file_path(index_id))
-            
             # 记录索引元数据
             cursor.execute(
-                "INSERT INTO vector_indices (index_id) VALUES (?)",
-                (index_id,)
-            )
-            
-            return Index(
-                id=index_id,
-                name=index.name,
-                description=index.description,
-                created_at=datetime.now(),
-                document_count=0
+                "INSERT INTO vector_indices (index_id, index_type, params, id_mapped) VALUES (?, ?, ?, 1)",
+                (index_id, index.index_type.value, index.index_params.json())
             )
+        
+        # 创建空的 FAISS 索引，文档数达到阈值后再升级为所选类型；
+        # 放入缓存可能触发淘汰落盘，在事务提交后进行，不占用连接等待其他索引的锁
+        try:
+            index_manager.put(index_id, create_flat_index())
+            index_manager.flush(index_id)
+        except Exception:
+            index_manager.drop(index_id, delete_file=True)
+            with get_db_cursor() as cursor:
+                cursor.execute("DELETE FROM indices WHERE id = ?", (index_id,))
+            raise
+        
+        return Index(
+            id=index_id,
+            name=index.name,
+            description=index.description,
+            created_at=datetime.now(),
+            document_count=0,
+            index_type=index.index_type,
+            index_params=index.index_params
+        )
     
     @staticmethod
     def get(index_id: int) -> Optional[Index]:
         with get_db_cursor() as cursor:
             cursor.execute(
-                "SELECT i.id, i.name, i.description, i.created_at, COUNT(d.id) as document_count "
+                "SELECT i.id, i.name, i.description, i.created_at, COUNT(d.id) as document_count, "
+                "v.index_type, v.params "
                 "FROM indices i "
+                "LEFT JOIN vector_indices v ON i.id = v.index_id "
                 "LEFT JOIN documents d ON i.id = d.index_id "
                 "WHERE i.id = ? "
                 "GROUP BY i.id",
@@ -62,110 +126,412 @@ class IndexRepository:
             if not row:
                 return None
             
-            return Index(
-                id=row[0],
-                name=row[1],
-                description=row[2],
-                created_at=row[3],
-                document_count=row[4]
-            )
+            return _row_to_index(row)
     
     @staticmethod
     def list() -> List[Index]:
         with get_db_cursor() as cursor:
             cursor.execute(
-                "SELECT i.id, i.name, i.description, i.created_at, COUNT(d.id) as document_count "
+                "SELECT i.id, i.name, i.description, i.created_at, COUNT(d.id) as document_count, "
+                "v.index_type, v.params "
                 "FROM indices i "
+                "LEFT JOIN vector_indices v ON i.id = v.index_id "
                 "LEFT JOIN documents d ON i.id = d.index_id "
                 "GROUP BY i.id "
                 "ORDER BY i.created_at DESC"
             )
             rows = cursor.fetchall()
             
-            return [
-                Index(
-                    id=row[0],
-                    name=row[1],
-                    description=row[2],
-                    created_at=row[3],
-                    document_count=row[4]
-                )
-                for row in rows
-            ]
+            return [_row_to_index(row) for row in rows]
     
     @staticmethod
     def delete(index_id: int) -> bool:
         with get_db_cursor() as cursor:
             cursor.execute("DELETE FROM indices WHERE id = ?", (index_id,))
-            if cursor.rowcount > 0:
-                # 删除对应的向量索引文件
-                index_file = get_index_file_path(index_id)
-                if os.path.exists(index_file):
-                    os.remove(index_file)
-                return True
-            return False
+            deleted = cursor.rowcount > 0
+        
+        # 提交后移出缓存并删除对应的向量索引文件，等待索引锁时不占用连接；
+        # 进行中的后台重建结束后才能拿到索引锁，此后的重建发现索引不存在时直接退出
+        if deleted:
+            index_manager.drop(index_id, delete_file=True)
+            _discard_tombstones(index_id)
+        return deleted
     
     @staticmethod
-    def rebuild_faiss_index(index_id: int) -> bool:
+    def get_index_config(index_id: int) -> Tuple[IndexType, IndexParams]:
+        """获取索引的向量索引类型及参数"""
+        with get_db_cursor() as cursor:
+            cursor.execute(
+                "SELECT index_type, params FROM vector_indices WHERE index_id = ?",
+                (index_id,)
+            )
+            row = cursor.fetchone()
+        
+        if not row:
+            return IndexType.FLAT, IndexParams()
+        return IndexType(row[0] or IndexType.FLAT), IndexParams(**json.loads(row[1])) if row[1] else IndexParams()
+    
+    @staticmethod
+    def sample_embeddings(index_id: int, sample_size: int) -> np.ndarray:
+        """从数据库中随机抽取文档向量，作为 IVF 训练样本"""
+        with get_db_cursor() as cursor:
+            # 先只对ID随机排序，避免排序时读取全部向量
+            cursor.execute(
+                "SELECT embedding FROM documents WHERE id IN ("
+                "SELECT id FROM documents WHERE index_id = ? AND embedding IS NOT NULL "
+                "ORDER BY RANDOM() LIMIT ?)",
+                (index_id, sample_size)
+            )
+            rows = cursor.fetchall()
+        
+        if not rows:
+            return np.empty((0, settings.VECTOR_DIM), dtype=np.float32)
+        return np.vstack([np.frombuffer(row[0], dtype=np.float32) for row in rows])
+    
+    @staticmethod
+    def create_target_index(index_id: int, document_count: int) -> faiss.Index:
         """
-        重建索引的 FAISS 向量索引
+        按索引配置创建空索引
+        
+        文档数未达到升级阈值时返回暴力检索索引，否则返回（训练好的）所选类型索引。
+        """
+        index_type, params = IndexRepository.get_index_config(index_id)
+        threshold = params.promote_threshold or settings.ANN_PROMOTION_THRESHOLD
+        if index_type == IndexType.FLAT or document_count < threshold:
+            return create_flat_index()
+        
+        train_vectors = None
+        if needs_training(index_type):
+            train_vectors = IndexRepository.sample_embeddings(index_id, settings.ANN_TRAINING_SAMPLE_SIZE)
+        return build_ann_index(index_type, params, train_vectors)
+    
+    @staticmethod
+    def build_faiss_index(index_id: int) -> faiss.Index:
+        """
+        从数据库中保存的文档向量构建 FAISS 索引
         
         Args:
             index_id: 索引ID
             
         Returns:
-            bool: 是否成功
+            faiss.Index: 以文档ID为向量ID的索引
         """
         with get_db_cursor() as cursor:
-            # 获取所有文档
             cursor.execute(
-                "SELECT id, embedding FROM documents WHERE index_id = ?",
+                "SELECT id, embedding FROM documents WHERE index_id = ? AND embedding IS NOT NULL",
                 (index_id,)
             )
             documents = cursor.fetchall()
+        
+        faiss_index = IndexRepository.create_target_index(index_id, len(documents))
+        if documents:
+            # 一次性添加所有文档向量
+            ids = np.array([row[0] for row in documents], dtype=np.int64)
+            embeddings = np.vstack([np.frombuffer(row[1], dtype=np.float32) for row in documents])
+            faiss_index.add_with_ids(embeddings, ids)
+        
+        return faiss_index
+    
+    @staticmethod
+    def promote_faiss_index(index_id: int) -> bool:
+        """
+        将暴力检索索引升级为配置的近似最近邻索引
+        
+        训练在不持有索引锁的情况下进行；只有拷贝向量到新索引时才阻塞该索引的读写，
+        向量直接取自当前内存中的索引，保证与并发写入一致。
+        
+        Returns:
+            bool: 是否完成升级
+        """
+        with index_manager.acquire(index_id) as faiss_index:
+            if faiss_index is None or not is_flat_index(faiss_index):
+                return False
+            document_count = faiss_index.ntotal
+        
+        target_index = IndexRepository.create_target_index(index_id, document_count)
+        if is_flat_index(target_index):
+            return False
+        
+        with index_manager.acquire(index_id) as faiss_index:
+            if faiss_index is None or not is_flat_index(faiss_index):
+                return False
+            ids, vectors = export_flat_vectors(faiss_index)
+            if len(ids) > 0:
+                target_index.add_with_ids(vectors, ids)
+            index_manager.put(index_id, target_index)
+        
+        index_manager.flush(index_id)
+        return True
+    
+    @staticmethod
+    def schedule_promotion(index_id: int, vector_count: int):
+        """
+        暴力检索索引的向量数达到阈值时在后台升级索引类型
+        
+        需要查询索引配置，调用方应在事务提交、释放索引锁之后调用，
+        避免持有写事务时再占用一个连接
+        
+        Args:
+            index_id: 索引ID
+            vector_count: 暴力检索索引当前的向量数
+        """
+        index_type, params = IndexRepository.get_index_config(index_id)
+        threshold = params.promote_threshold or settings.ANN_PROMOTION_THRESHOLD
+        if index_type == IndexType.FLAT or vector_count < threshold:
+            return
+        
+        with _promoting_lock:
+            if index_id in _promoting_indices:
+                return
+            _promoting_indices.add(index_id)
+        
+        def run():
+            try:
+                IndexRepository.promote_faiss_index(index_id)
+            except Exception:
+                logger.exception("升级索引 %s 失败", index_id)
+            finally:
+                with _promoting_lock:
+                    _promoting_indices.discard(index_id)
+        
+        threading.Thread(target=run, name=f"faiss-promote-{index_id}", daemon=True).start()
+    
+    @staticmethod
+    def load_faiss_index(index_id: int) -> Optional[faiss.Index]:
+        """
+        从文件加载 FAISS 索引，供索引管理器使用
+        
+        旧版（位置序号）索引，或向量数与数据库不一致（例如进程退出前未落盘）时，
+        从数据库重建并写回文件。
+        """
+        index_file = get_index_file_path(index_id)
+        if not os.path.exists(index_file):
+            return None
+        
+        faiss_index = faiss.read_index(index_file)
+        
+        with get_db_cursor() as cursor:
+            cursor.execute(
+                "SELECT COUNT(*) FROM documents WHERE index_id = ? AND embedding IS NOT NULL",
+                (index_id,)
+            )
+            document_count = cursor.fetchone()[0]
+        
+        if not is_id_mapped(faiss_index) or faiss_index.ntotal != document_count:
+            faiss_index = IndexRepository.build_faiss_index(index_id)
+            faiss.write_index(faiss_index, index_file)
+        
+        return faiss_index
+    
+    @staticmethod
+    def rebuild_faiss_index(index_id: int) -> bool:
+        """
+        重建索引的 FAISS 向量索引
+        
+        从数据库构建时不持有索引锁；替换前从当前索引补上构建期间新增的向量，
+        新索引中已不存在的墓碑随之清除
+        
+        Args:
+            index_id: 索引ID
             
-            if not documents:
-                # 如果没有文档，创建空索引
-                faiss_index = faiss.IndexFlatL2(384)
-            else:
-                # 创建新的 FAISS 索引
-                faiss_index = faiss.IndexFlatL2(384)
-                
-                # 添加所有文档向量
-                for doc_id, embedding_bytes in documents:
-                    embedding = np.frombuffer(embedding_bytes, dtype=np.float32).reshape(1, -1)
-                    faiss_index.add(embedding)
-            
-            # 保存到文件系统
-            faiss.write_index(faiss_index, get_index_file_path(index_id))
+        Returns:
+            bool: 是否成功，索引已删除时返回 False
+        """
+        if IndexRepository.get(index_id) is None:
+            _discard_tombstones(index_id)
+            return False
+        
+        faiss_index = IndexRepository.build_faiss_index(index_id)
+        
+        # 替换缓存中的索引并保存到文件系统
+        with index_manager.acquire(index_id) as current_index:
+            if current_index is None and IndexRepository.get(index_id) is None:
+                # 构建期间索引被删除，不再写回索引文件
+                _discard_tombstones(index_id)
+                return False
+            tombstones = get_tombstones(index_id)
+            current_ids = mapped_ids(current_index) if current_index is not None else None
+            new_ids = mapped_ids(faiss_index)
+            if current_ids is not None and new_ids is not None:
+                missing = np.setdiff1d(current_ids, new_ids)
+                missing = missing[~np.isin(missing, list(tombstones))]
+                if len(missing) > 0:
+                    vectors = np.vstack([current_index.reconstruct(int(doc_id)) for doc_id in missing])
+                    faiss_index.add_with_ids(vectors, missing)
+            index_manager.put(index_id, faiss_index)
             
-            return True
+            remaining = tombstones & set(new_ids.tolist()) if new_ids is not None else set()
+            with _tombstone_lock:
+                # 重建期间新增的墓碑保留，等待下一次重建
+                current = _tombstones.get(index_id, set())
+                current = (current - tombstones) | remaining
+                if current:
+                    _tombstones[index_id] = current
+                else:
+                    _tombstones.pop(index_id, None)
+        index_manager.flush(index_id)
+        
+        if remaining:
+            IndexRepository.schedule_rebuild(index_id)
+        return True
+    
+    @staticmethod
+    def add_tombstones(index_id: int, doc_ids: List[int]):
+        """记录不支持删除的索引中已删除的向量，并在后台重建索引"""
+        with _tombstone_lock:
+            _tombstones.setdefault(index_id, set()).update(doc_ids)
+        IndexRepository.schedule_rebuild(index_id)
+    
+    @staticmethod
+    def schedule_rebuild(index_id: int):
+        """在后台重建索引以清除墓碑，同一索引同时只有一个重建线程"""
+        with _tombstone_lock:
+            if index_id in _rebuilding_indices:
+                return
+            _rebuilding_indices.add(index_id)
+        
+        def run():
+            try:
+                IndexRepository.rebuild_faiss_index(index_id)
+            except Exception:
+                logger.exception("重建索引 %s 失败", index_id)
+            finally:
+                with _tombstone_lock:
+                    _rebuilding_indices.discard(index_id)
+                    pending = index_id in _tombstones
+                # 重建期间又有文档被删除时再重建一次
+                if pending:
+                    IndexRepository.schedule_rebuild(index_id)
+        
+        threading.Thread(target=run, name=f"faiss-rebuild-{index_id}", daemon=True).start()
+
+# 加载索引时校验与数据库的一致性
+index_manager.loader = IndexRepository.load_faiss_index
 
 class DocumentRepository:
     @staticmethod
     def create(index_id: int, document: DocumentCreate, embedding: np.ndarray) -> Document:
-        with get_db_cursor() as cursor:
-            # 插入文档
-            cursor.execute(
-                "INSERT INTO documents (index_id, content, metadata, embedding) VALUES (?, ?, ?, ?)",
-                (index_id, document.content, json.dumps(document.metadata), embedding.tobytes())
-            )
-            doc_id = cursor.lastrowid
-            
-            # 更新 FAISS 索引
-            index_file = get_index_file_path(index_id)
-            if os.path.exists(index_file):
-                faiss_index = faiss.read_index(index_file)
-                faiss_index.add(embedding.reshape(1, -1))
-                faiss.write_index(faiss_index, index_file)
+        doc_id = None
+        added = False
+        flat_count = None
+        try:
+            # 先获取索引再开启事务：索引未缓存时加载器需要另一个连接，不能在持有连接时加载
+            with index_manager.acquire(index_id) as faiss_index:
+                with get_db_cursor() as cursor:
+                    # 插入文档
+                    cursor.execute(
+                        "INSERT INTO documents (index_id, content, metadata, embedding) VALUES (?, ?, ?, ?)",
+                        (index_id, document.content, json.dumps(document.metadata), embedding.tobytes())
+                    )
+                    doc_id = cursor.lastrowid
+                    index_bigrams(cursor, DOCUMENTS_BIGRAM_TABLE, [(doc_id, document.content)])
+                    
+                    # 更新缓存中的 FAISS 索引，由索引管理器延迟落盘
+                    if faiss_index is not None:
+                        faiss_index.add_with_ids(
+                            embedding.reshape(1, -1),
+                            np.array([doc_id], dtype=np.int64)
+                        )
+                        added = True
+                        index_manager.mark_dirty(index_id)
+                        if is_flat_index(faiss_index):
+                            flat_count = faiss_index.ntotal
+        except Exception:
+            # 事务未提交，移除已加入索引的向量，避免检索到不存在的文档
+            if added:
+                DocumentRepository.discard_vectors(index_id, [doc_id])
+            raise
+        
+        if flat_count is not None:
+            IndexRepository.schedule_promotion(index_id, flat_count)
+        
+        return Document(
+            id=doc_id,
+            index_id=index_id,
+            content=document.content,
+            metadata=document.metadata,
+            created_at=datetime.now()
+        )
+
+    @staticmethod
+    def batch_create(
+        index_id: int,
+        documents: List[DocumentCreate],
+        embeddings: np.ndarray,
+        on_insert: Optional[Callable[[sqlite3.Cursor], None]] = None
+    ) -> List[int]:
+        """
+        批量创建文档
+        
+        所有文档在同一事务中通过 executemany 插入，向量一次性加入 FAISS 索引
+        
+        Args:
+            index_id: 索引ID
+            documents: 文档列表
+            embeddings: 与文档一一对应的向量矩阵，形状为 (len(documents), dim)
+            on_insert: 在同一事务中执行的额外写入（例如记录入库任务的检查点）
             
-            return Document(
-                id=doc_id,
-                index_id=index_id,
-                content=document.content,
-                metadata=document.metadata,
-                created_at=datetime.now()
-            )
+        Returns:
+            List[int]: 新文档的ID，与 documents 顺序一致
+        """
+        if not documents:
+            return []
+        
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32).reshape(len(documents), -1)
+        
+        doc_ids: List[int] = []
+        added = False
+        flat_count = None
+        try:
+            # 先获取索引再开启事务：索引未缓存时加载器需要另一个连接，不能在持有连接时加载；
+            # 提交前一直持有索引锁，其他线程不会在这批文档提交后、加入索引前加载到它们而重复添加
+            with index_manager.acquire(index_id) as faiss_index:
+                with get_db_cursor() as cursor:
+                    cursor.executemany(
+                        "INSERT INTO documents (index_id, content, metadata, embedding) VALUES (?, ?, ?, ?)",
+                        [
+                            (index_id, doc.content, json.dumps(doc.metadata), embedding.tobytes())
+                            for doc, embedding in zip(documents, embeddings)
+                        ]
+                    )
+                    
+                    # executemany 不返回 lastrowid；同一写事务内 AUTOINCREMENT 分配的ID是连续的
+                    cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'documents'")
+                    last_id = cursor.fetchone()[0]
+                    doc_ids = list(range(last_id - len(documents) + 1, last_id + 1))
+                    index_bigrams(cursor, DOCUMENTS_BIGRAM_TABLE, zip(doc_ids, (doc.content for doc in documents)))
+                    
+                    if on_insert is not None:
+                        on_insert(cursor)
+                    
+                    # 一次性加入 FAISS 索引
+                    if faiss_index is not None:
+                        faiss_index.add_with_ids(embeddings, np.array(doc_ids, dtype=np.int64))
+                        added = True
+                        index_manager.mark_dirty(index_id)
+                        if is_flat_index(faiss_index):
+                            flat_count = faiss_index.ntotal
+        except Exception:
+            # 提交失败时事务已回滚，移除已加入索引的向量，避免留下没有文档的向量ID
+            if added:
+                DocumentRepository.discard_vectors(index_id, doc_ids)
+            raise
+        
+        if flat_count is not None:
+            IndexRepository.schedule_promotion(index_id, flat_count)
+        
+        return doc_ids
+    
+    @staticmethod
+    def discard_vectors(index_id: int, doc_ids: List[int]):
+        """从 FAISS 索引中移除未能入库的文档向量，不支持删除的索引记为墓碑"""
+        with index_manager.acquire(index_id) as faiss_index:
+            if faiss_index is None:
+                return
+            if remove_ids(faiss_index, np.array(doc_ids, dtype=np.int64)):
+                index_manager.mark_dirty(index_id)
+                return
+        IndexRepository.add_tombstones(index_id, doc_ids)
 
     @staticmethod
     def list(index_id: int) -> List[Document]:
@@ -189,68 +555,258 @@ class DocumentRepository:
     
     @staticmethod
     def delete(index_id: int, document_id: int) -> bool:
-        with get_db_cursor() as cursor:
-            # 获取文档向量
-            cursor.execute(
-                "SELECT embedding FROM documents WHERE id = ? AND index_id = ?",
-                (document_id, index_id)
-            )
-            result = cursor.fetchone()
-            if not result:
-                return False
-            
-            # 删除文档
-            cursor.execute(
-                "DELETE FROM documents WHERE id = ? AND index_id = ?",
-                (document_id, index_id)
-            )
-            
-            if cursor.rowcount == 0:
-                return False
-            
-            # 重建 FAISS 索引
-            IndexRepository.rebuild_faiss_index(index_id)
-            
-            return True
+        tombstone = False
+        # 先获取索引再开启事务，避免持有连接时加载索引
+        with index_manager.acquire(index_id) as faiss_index:
+            with get_db_cursor() as cursor:
+                # 删除文档
+                cursor.execute(
+                    "DELETE FROM documents WHERE id = ? AND index_id = ?",
+                    (document_id, index_id)
+                )
+                
+                if cursor.rowcount == 0:
+                    return False
+                
+                # 按文档ID从 FAISS 索引中移除向量，无需重建
+                if faiss_index is not None:
+                    if remove_ids(faiss_index, np.array([document_id])):
+                        index_manager.mark_dirty(index_id)
+                    else:
+                        tombstone = True
+        
+        # HNSW 等不支持删除的索引，事务提交后记为墓碑，检索时排除，由后台重建清除
+        if tombstone:
+            IndexRepository.add_tombstones(index_id, [document_id])
+        
+        return True
     
     @staticmethod
-    def search_similar(index_id: int, query_embedding: np.ndarray, k: int = 5) -> List[Document]:
-        index_file = get_index_file_path(index_id)
-        if not os.path.exists(index_file):
+    def search_similar(
+        index_id: int,
+        query_embedding: np.ndarray,
+        k: int = 5,
+        allowed_ids: Optional[List[int]] = None,
+        include_content: bool = True,
+        include_metadata: bool = True
+    ) -> List[Document]:
+        """向量检索并返回文档，顺序与 FAISS 结果一致"""
+        ranked = DocumentRepository.search_vector(index_id, query_embedding, k, allowed_ids)
+        return DocumentRepository.hydrate(index_id, ranked, include_content, include_metadata)
+
+    @staticmethod
+    def search_vector(index_id: int, query_embedding: np.ndarray, k: int, allowed_ids: Optional[List[int]] = None) -> List[Tuple[int, float]]:
+        """
+        向量检索
+        
+        Args:
+            index_id: 索引ID
+            query_embedding: 查询向量
+            k: 返回数量
+            allowed_ids: 只在这些文档中检索，为空表示不过滤
+        
+        Returns:
+            (文档ID, 相似度) 列表，按相似度降序
+        """
+        return DocumentRepository.search_vector_batch(index_id, query_embedding.reshape(1, -1), k, allowed_ids)[0]
+
+    @staticmethod
+    def search_vector_batch(index_id: int, query_embeddings: np.ndarray, k: int, allowed_ids: Optional[List[int]] = None) -> List[List[Tuple[int, float]]]:
+        """
+        对多个查询向量执行一次 FAISS 检索
+        
+        Args:
+            index_id: 索引ID
+            query_embeddings: 查询向量矩阵，形状为 (n, dim)
+            k: 每个查询的返回数量
+            allowed_ids: 只在这些文档中检索，为空表示不过滤
+        
+        Returns:
+            与查询一一对应的 (文档ID, 相似度) 列表，按相似度降序
+        """
+        empty = [[] for _ in range(len(query_embeddings))]
+        if allowed_ids is not None and not allowed_ids:
+            return empty
+        
+        tombstones = get_tombstones(index_id)
+        with index_manager.acquire(index_id) as faiss_index:
+            if faiss_index is None or faiss_index.ntotal == 0:
+                return empty
+            distances, indices = search_vectors(
+                faiss_index,
+                query_embeddings,
+                min(k, faiss_index.ntotal),
+                np.array(allowed_ids, dtype=np.int64) if allowed_ids is not None else None,
+                np.array(list(tombstones), dtype=np.int64) if tombstones else None
+            )
+        
+        return [
+            [
+                (int(idx), float(1 / (1 + distance)))  # 转换距离为相似度
+                for idx, distance in zip(row_indices, row_distances)
+                if idx >= 0  # FAISS 返回 -1 表示没有足够的结果
+            ]
+            for row_indices, row_distances in zip(indices, distances)
+        ]
+
+    @staticmethod
+    def search_keyword(index_id: int, query: str, k: int, allowed_ids: Optional[List[int]] = None) -> List[Tuple[int, float]]:
+        """
+        基于 FTS5 的 BM25 关键词检索
+        
+        少于 3 个字符的词通过 bigram 表匹配，全部为短词时使用 bigram 表的 BM25 分数
+        
+        Args:
+            index_id: 索引ID
+            query: 查询字符串
+            k: 返回数量
+            allowed_ids: 只在这些文档中检索，为空表示不过滤
+        
+        Returns:
+            (文档ID, BM25 分数) 列表，分数越大越相关
+        """
+        if allowed_ids is not None and not allowed_ids:
             return []
-            
-        # 从文件加载 FAISS 索引
-        faiss_index = faiss.read_index(index_file)
         
-        # 检查索引中是否有向量
-        if faiss_index.ntotal == 0:
+        match_query, bigram_query = build_match_queries(query)
+        if match_query is not None:
+            sql = (
+                "SELECT d.id, -f.rank FROM documents_fts f "
+                "JOIN documents d ON d.id = f.rowid "
+                "WHERE documents_fts MATCH ? AND d.index_id = ?"
+            )
+            params: list = [match_query, index_id]
+            if bigram_query is not None:
+                sql += " AND f.rowid IN (SELECT rowid FROM documents_bigram_fts WHERE documents_bigram_fts MATCH ?)"
+                params.append(bigram_query)
+            order_by = "f.rank"
+        elif bigram_query is not None:
+            sql = (
+                "SELECT d.id, -b.rank FROM documents_bigram_fts b "
+                "JOIN documents d ON d.id = b.rowid "
+                "WHERE documents_bigram_fts MATCH ? AND d.index_id = ?"
+            )
+            params = [bigram_query, index_id]
+            order_by = "b.rank"
+        else:
             return []
+        if allowed_ids is not None:
+            sql += " AND d.id IN (SELECT value FROM json_each(?))"
+            params.append(json.dumps(allowed_ids))
+        sql += f" ORDER BY {order_by} LIMIT ?"
+        params.append(k)
         
-        # 搜索相似向量
-        distances, indices = faiss_index.search(query_embedding.reshape(1, -1), min(k, faiss_index.ntotal))
+        with get_db_cursor() as cursor:
+            cursor.execute(sql, params)
+            return [(row[0], row[1]) for row in cursor.fetchall()]
+
+    @staticmethod
+    def resolve_filters(index_id: int, filters: List[MetadataFilter]) -> List[int]:
+        """
+        通过元数据侧表将过滤条件解析为文档ID集合
+        
+        Args:
+            index_id: 索引ID
+            filters: 过滤条件，多个条件之间为 AND 关系
+            
+        Returns:
+            List[int]: 满足全部条件的文档ID
+        """
+        queries = []
+        params: list = []
+        for metadata_filter in filters:
+            sql = "SELECT document_id FROM document_metadata WHERE index_id = ? AND key = ? AND "
+            params.extend([index_id, metadata_filter.key])
+            if metadata_filter.op == FilterOperator.EQ:
+                sql += "value = ?"
+                params.append(metadata_filter.value)
+            elif metadata_filter.op == FilterOperator.IN:
+                sql += "value IN (SELECT value FROM json_each(?))"
+                params.append(json.dumps(metadata_filter.value))
+            else:
+                # 前缀匹配转换为范围查询，可以使用索引
+                sql += "value >= ? AND value < ?"
+                params.extend([metadata_filter.value, metadata_filter.value + "\U0010ffff"])
+            queries.append(sql)
         
-        # 获取文档内容
         with get_db_cursor() as cursor:
-            results = []
-            for i, idx in enumerate(indices[0]):
-                if idx < 0:  # FAISS 返回 -1 表示没有足够的结果
-                    continue
-                
-                cursor.execute(
-                    "SELECT id, content, metadata, created_at FROM documents WHERE index_id = ? AND id = ?",
-                    (index_id, int(idx))
-                )
-                row = cursor.fetchone()
-                if row:
-                    results.append(
-                        Document(
-                            id=row[0],
-                            index_id=index_id,
-                            content=row[1],
-                            metadata=json.loads(row[2]) if row[2] else {},
-                            created_at=row[3],
-                            similarity=float(1 / (1 + distances[0][i]))  # 转换距离为相似度
-                        )
-                    )
+            cursor.execute(" INTERSECT ".join(queries), params)
+            return [row[0] for row in cursor.fetchall()]
+
+    @staticmethod
+    def hydrate(
+        index_id: int,
+        ranked: List[Tuple[int, float]],
+        include_content: bool = True,
+        include_metadata: bool = True
+    ) -> List[Document]:
+        """
+        一次查询获取检索结果对应的文档，保持检索结果的顺序
+        
+        Args:
+            index_id: 索引ID
+            ranked: (文档ID, 分数) 列表，分数写入 Document.similarity
+            include_content: 是否返回文档内容
+            include_metadata: 是否返回元数据
             
-            return results 
\ No newline at end of file
+        Returns:
+            List[Document]: 文档列表，已删除的文档会被跳过
+        """
+        return DocumentRepository.hydrate_batch(index_id, [ranked], include_content, include_metadata)[0]
+
+    @staticmethod
+    def hydrate_batch(
+        index_id: int,
+        rankings: List[List[Tuple[int, float]]],
+        include_content: bool = True,
+        include_metadata: bool = True
+    ) -> List[List[Document]]:
+        """
+        一次查询获取多组检索结果对应的文档，每组保持检索结果的顺序
+        
+        Args:
+            index_id: 索引ID
+            rankings: 多组 (文档ID, 分数) 列表
+            include_content: 是否返回文档内容
+            include_metadata: 是否返回元数据
+            
+        Returns:
+            与 rankings 一一对应的文档列表
+        """
+        document_ids = list({doc_id for ranked in rankings for doc_id, _ in ranked})
+        if not document_ids:
+            return [[] for _ in rankings]
+        
+        # 不需要的字段不读取，省去传输和 JSON 解析
+        columns = [
+            "id",
+            "content" if include_content else "NULL",
+            "metadata" if include_metadata else "NULL",
+            "created_at",
+        ]
+        with get_db_cursor() as cursor:
+            cursor.execute(
+                f"SELECT {', '.join(columns)} FROM documents "
+                "WHERE index_id = ? AND id IN (SELECT value FROM json_each(?))",
+                (index_id, json.dumps(document_ids))
+            )
+            rows = {
+                row[0]: (row[1], (json.loads(row[2]) if row[2] else {}) if include_metadata else None, row[3])
+                for row in cursor.fetchall()
+            }
+        
+        return [
+            [
+                Document(
+                    id=doc_id,
+                    index_id=index_id,
+                    content=rows[doc_id][0],
+                    metadata=rows[doc_id][1],
+                    created_at=rows[doc_id][2],
+                    similarity=score
+                )
+                for doc_id, score in ranked
+                if doc_id in rows
+            ]
+            for ranked in rankings
+        ]
@@ -0,0 +1,190 @@
+import json
+import sqlite3
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set
+from app.db.session import get_db_cursor
+from app.models.ingestion_job import IngestionJob, IngestionJobStatus, IngestionJobType
+
+_JOB_COLUMNS = (
+    "id, index_id, job_type, status, params, total_files, processed_files, failed_files, "
+    "total_chunks, total_characters, error, created_at, updated_at, started_at, finished_at"
+)
+
+def _row_to_job(row) -> IngestionJob:
+    return IngestionJob(
+        id=row[0],
+        index_id=row[1],
+        job_type=row[2],
+        status=row[3],
+        params=json.loads(row[4]) if row[4] else {},
+        total_files=row[5],
+        processed_files=row[6],
+        failed_files=row[7],
+        total_chunks=row[8],
+        total_characters=row[9],
+        error=row[10],
+        created_at=row[11],
+        updated_at=row[12],
+        started_at=row[13],
+        finished_at=row[14]
+    )
+
+class IngestionJobRepository:
+    @staticmethod
+    def create(
+        index_id: int,
+        job_type: IngestionJobType,
+        params: Dict[str, Any],
+        total_files: Optional[int] = None,
+        work_dir: Optional[str] = None
+    ) -> IngestionJob:
+        """
+        创建任务
+
+        Args:
+            params: 任务参数，通过任务接口原样返回
+            work_dir: 服务端的临时工作目录，单独保存，不随任务返回
+        """
+        now = datetime.now().isoformat()
+
+        with get_db_cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO ingestion_jobs (index_id, job_type, status, params, total_files, work_dir, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (index_id, job_type.value, IngestionJobStatus.PENDING.value, json.dumps(params), total_files, work_dir, now, now)
+            )
+            job_id = cursor.lastrowid
+
+        return IngestionJobRepository.get(job_id)
+
+    @staticmethod
+    def get_work_dir(job_id: int) -> Optional[str]:
+        """获取任务的临时工作目录"""
+        with get_db_cursor() as cursor:
+            cursor.execute("SELECT work_dir FROM ingestion_jobs WHERE id = ?", (job_id,))
+            row = cursor.fetchone()
+            return row[0] if row else None
+
+    @staticmethod
+    def get(job_id: int) -> Optional[IngestionJob]:
+        with get_db_cursor() as cursor:
+            cursor.execute(f"SELECT {_JOB_COLUMNS} FROM ingestion_jobs WHERE id = ?", (job_id,))
+            row = cursor.fetchone()
+            return _row_to_job(row) if row else None
+
+    @staticmethod
+    def list(index_id: int) -> List[IngestionJob]:
+        with get_db_cursor() as cursor:
+            cursor.execute(
+                f"SELECT {_JOB_COLUMNS} FROM ingestion_jobs WHERE index_id = ? ORDER BY id DESC",
+                (index_id,)
+            )
+            return [_row_to_job(row) for row in cursor.fetchall()]
+
+    @staticmethod
+    def list_unfinished() -> List[IngestionJob]:
+        """获取未结束的任务，用于服务重启后恢复"""
+        with get_db_cursor() as cursor:
+            cursor.execute(
+                f"SELECT {_JOB_COLUMNS} FROM ingestion_jobs WHERE status IN (?, ?) ORDER BY id",
+                (IngestionJobStatus.PENDING.value, IngestionJobStatus.RUNNING.value)
+            )
+            return [_row_to_job(row) for row in cursor.fetchall()]
+
+    @staticmethod
+    def mark_running(job_id: int) -> bool:
+        """将未结束的任务标记为运行中，任务已被取消时返回 False"""
+        now = datetime.now().isoformat()
+        with get_db_cursor() as cursor:
+            cursor.execute(
+                "UPDATE ingestion_jobs SET status = ?, started_at = COALESCE(started_at, ?), updated_at = ? "
+                "WHERE id = ? AND status IN (?, ?)",
+                (IngestionJobStatus.RUNNING.value, now, now, job_id,
+                 IngestionJobStatus.PENDING.value, IngestionJobStatus.RUNNING.value)
+            )
+            return cursor.rowcount > 0
+
+    @staticmethod
+    def finish(job_id: int, status: IngestionJobStatus, error: Optional[str] = None, failed_files: Optional[int] = None, total_files: Optional[int] = None) -> bool:
+        """将运行中的任务标记为结束状态，任务已被取消时保持不变并返回 False"""
+        now = datetime.now().isoformat()
+        with get_db_cursor() as cursor:
+            cursor.execute(
+                "UPDATE ingestion_jobs SET status = ?, error = ?, "
+                "failed_files = COALESCE(?, failed_files), total_files = COALESCE(?, total_files), "
+                "finished_at = ?, updated_at = ? WHERE id = ? AND status = ?",
+                (status.value, error, failed_files, total_files, now, now, job_id, IngestionJobStatus.RUNNING.value)
+            )
+            return cursor.rowcount > 0
+
+    @staticmethod
+    def cancel(job_id: int) -> bool:
+        """取消未结束的任务"""
+        now = datetime.now().isoformat()
+        with get_db_cursor() as cursor:
+            cursor.execute(
+                "UPDATE ingestion_jobs SET status = ?, finished_at = ?, updated_at = ? "
+                "WHERE id = ? AND status IN (?, ?)",
+                (IngestionJobStatus.CANCELLED.value, now, now, job_id,
+                 IngestionJobStatus.PENDING.value, IngestionJobStatus.RUNNING.value)
+            )
+            return cursor.rowcount > 0
+
+    @staticmethod
+    def checkpoint(cursor: sqlite3.Cursor, job_id: int, files: List[Dict[str, Any]]) -> None:
+        """
+        记录已写入数据库的文件并累加进度
+
+        需在写入文档的同一事务中调用，保证检查点与文档数据一致
+
+        Args:
+            cursor: 写入文档所用的游标
+            job_id: 任务ID
+            files: 文件列表，每项包含 path、chunk_count、total_characters
+        """
+        now = datetime.now().isoformat()
+        cursor.executemany(
+            "INSERT OR IGNORE INTO ingestion_job_files (job_id, path, chunk_count, total_characters, created_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            [(job_id, f["path"], f["chunk_count"], f["total_characters"], now) for f in files]
+        )
+        cursor.execute(
+            "UPDATE ingestion_jobs SET processed_files = processed_files + ?, total_chunks = total_chunks + ?, "
+            "total_characters = total_characters + ?, updated_at = ? WHERE id = ?",
+            (
+                len(files),
+                sum(f["chunk_count"] for f in files),
+                sum(f["total_characters"] for f in files),
+                now,
+                job_id
+            )
+        )
+
+    @staticmethod
+    def record_empty(job_id: int, path: str) -> None:
+        """记录没有切出文本块的文件，恢复任务时跳过该文件"""
+        with get_db_cursor() as cursor:
+            IngestionJobRepository.checkpoint(cursor, job_id, [{"path": path, "chunk_count": 0, "total_characters": 0}])
+
+    @staticmethod
+    def record_failure(job_id: int, path: str, error: str) -> None:
+        """记录处理失败的文件并累加失败数，恢复任务时跳过该文件"""
+        now = datetime.now().isoformat()
+        with get_db_cursor() as cursor:
+            cursor.execute(
+                "INSERT OR IGNORE INTO ingestion_job_files (job_id, path, chunk_count, total_characters, status, error, created_at) "
+                "VALUES (?, ?, 0, 0, 'failed', ?, ?)",
+                (job_id, path, error, now)
+            )
+            if cursor.rowcount > 0:
+                cursor.execute(
+                    "UPDATE ingestion_jobs SET failed_files = failed_files + 1, updated_at = ? WHERE id = ?",
+                    (now, job_id)
+                )
+
+    @staticmethod
+    def completed_paths(job_id: int) -> Set[str]:
+        """获取任务已处理（写入成功或处理失败）的文件路径"""
+        with get_db_cursor() as cursor:
+            cursor.execute("SELECT path FROM ingestion_job_files WHERE job_id = ?", (job_id,))
+            return {row[0] for row in cursor.fetchall()}
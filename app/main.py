@@ -4,9 +4,14 @@ from fastapi.exceptions import RequestValidationError
 from starlette.exceptions import HTTPException as StarletteHTTPException
 
 from app.core.config import settings
-from app.api.v1.endpoints import chat_conversations, conversations, indices, example
+from app.api.v1.endpoints import chat_conversations, conversations, generation_jobs, indices, ingestion_jobs, metrics, example
 from app.db.migrations import init_db
+from app.db.repositories.index import index_manager
+from app.services.ingestion_jobs import ingestion_job_runner
+from app.services.generation_jobs import generation_job_runner
+from app.services.openai import get_openai_service
 from app.core.middlewares import ResponseFormatMiddleware
+from app.core.executors import shutdown_executors
 from app.core.exceptions import (
     APIException, 
     api_exception_handler, 
@@ -39,12 +44,36 @@ app.add_exception_handler(StarletteHTTPException, http_exception_handler)
 # 注册路由
 app.include_router(conversations.router, prefix=settings.API_V1_STR)
 app.include_router(indices.router, prefix=settings.API_V1_STR)
+app.include_router(ingestion_jobs.router, prefix=settings.API_V1_STR)
+app.include_router(generation_jobs.router, prefix=settings.API_V1_STR)
 app.include_router(example.router, prefix=settings.API_V1_STR)
 app.include_router(chat_conversations.router, prefix=settings.API_V1_STR)
+app.include_router(metrics.router, prefix=settings.API_V1_STR)
 
 # 初始化数据库
 init_db()
 
+@app.on_event("startup")
+async def startup():
+    # 启动向量索引后台落盘
+    index_manager.start()
+    # 恢复未完成的入库任务
+    await ingestion_job_runner.resume()
+    # 恢复未完成的对话生成任务
+    await generation_job_runner.resume()
+
+@app.on_event("shutdown")
+async def shutdown():
+    # 停止入库任务，下次启动时从检查点恢复
+    await ingestion_job_runner.shutdown()
+    # 停止对话生成任务，已生成的结果已写入，下次启动时继续
+    await generation_job_runner.shutdown()
+    # 将所有未落盘的向量索引写入文件
+    index_manager.stop()
+    # 关闭 OpenAI 客户端连接池
+    await get_openai_service().close()
+    shutdown_executors()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
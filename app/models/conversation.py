@@ -1,8 +1,11 @@
-from typing import List, Optional
-from pydantic import BaseModel
+from typing import Generic, List, Optional, TypeVar, Union
+from pydantic import BaseModel, Field
 from datetime import datetime
+from enum import Enum
 from .base import BaseDBModel
 
+T = TypeVar('T')
+
 class Message(BaseModel):
     role: str
     content: str
@@ -12,6 +15,44 @@ class Conversation(BaseDBModel):
     token_count: Optional[int] = None
     message_count: Optional[int] = None
 
+class ConversationView(str, Enum):
+    """对话列表返回的字段范围"""
+    SUMMARY = "summary"  # 只返回标题、计数和时间
+    FULL = "full"  # 包含完整消息
+
+class ConversationSummary(BaseDBModel):
+    """对话列表的摘要投影，不包含消息内容"""
+    title: Optional[str] = None
+    token_count: Optional[int] = None
+    message_count: Optional[int] = None
+
+class ConversationPage(BaseModel):
+    """按游标分页的对话列表"""
+    items: List[Union[Conversation, ConversationSummary]]
+    next_cursor: Optional[str] = Field(None, description="下一页游标，为空表示没有更多数据")
+
+class TokenStats(BaseModel):
+    """训练数据集的 token 统计"""
+    encoding: str
+    conversation_count: int
+    message_count: int
+    total_tokens: int
+    max_tokens: int
+    avg_tokens: float
+
+class ImportLineError(BaseModel):
+    """导入失败的行"""
+    line: int = Field(description="行号，从 1 开始")
+    error: str
+
+class ImportResult(BaseModel):
+    """对话导入结果"""
+    total_lines: int = Field(description="非空行数")
+    imported: int
+    failed: int
+    errors: List[ImportLineError] = Field(default_factory=list, description="失败行详情，最多返回前若干条")
+    elapsed_seconds: float
+
 class ChatConversation(BaseDBModel):
     title: str
     message_count: Optional[int] = None
@@ -19,4 +60,29 @@ class ChatConversation(BaseDBModel):
 class ChatMessage(BaseDBModel):
     conversation_id: int
     role: str
-    content: str 
\ No newline at end of file
+    content: str 
+
+class SearchPage(BaseModel, Generic[T]):
+    """全文检索结果分页"""
+    items: List[T]
+    offset: int
+    has_more: bool
+
+class ConversationSearchHit(BaseModel):
+    """训练对话中匹配的消息"""
+    conversation_id: int
+    title: Optional[str] = None
+    message_index: int = Field(description="消息在对话中的序号，从 0 开始")
+    role: str
+    snippet: str = Field(description="匹配内容摘要，命中部分以 <mark> 标记")
+    score: float = Field(description="BM25 相关度，越大越相关；全部为短词时为 bigram 表的 BM25 分数")
+
+class ChatMessageSearchHit(BaseModel):
+    """聊天记录中匹配的消息"""
+    message_id: int
+    conversation_id: int
+    conversation_title: Optional[str] = None
+    role: str
+    snippet: str = Field(description="匹配内容摘要，命中部分以 <mark> 标记")
+    score: float = Field(description="BM25 相关度，越大越相关；全部为短词时为 bigram 表的 BM25 分数")
+    created_at: Optional[datetime] = None
@@ -0,0 +1,81 @@
+from typing import Any, Dict, List, Optional
+from pydantic import BaseModel, Field, model_validator
+from enum import Enum
+from .base import BaseDBModel
+from app.utils.template import template_placeholders
+
+class GenerationJobStatus(str, Enum):
+    """生成任务状态"""
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+# 每组变量最多生成的对话数，任务总条目数另受 GENERATION_MAX_ITEMS 限制
+MAX_SAMPLES_PER_ITEM = 1000
+
+# 已结束的任务状态
+FINISHED_GENERATION_STATUSES = (GenerationJobStatus.COMPLETED, GenerationJobStatus.FAILED, GenerationJobStatus.CANCELLED)
+
+class GenerationItemStatus(str, Enum):
+    """生成任务中单条对话的状态"""
+    PENDING = "pending"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+class GenerationJobCreate(BaseModel):
+    """
+    批量生成对话的请求
+
+    提示词模板中的 {name} 占位符由 variables 中的每组变量替换；
+    只提供 seeds 时每个种子作为变量 {seed}。每组变量生成 samples_per_item 条对话
+    """
+    system_prompt: Optional[str] = Field(None, description="系统提示词")
+    prompt_template: str = Field(..., min_length=1, description="用户提示词模板")
+    variables: Optional[List[Dict[str, Any]]] = Field(None, description="模板变量列表")
+    seeds: Optional[List[str]] = Field(None, description="种子列表，等价于变量 {seed}")
+    samples_per_item: int = Field(1, ge=1, le=MAX_SAMPLES_PER_ITEM, description="每组变量生成的对话数")
+    model: Optional[str] = Field(None, description="模型名称，默认使用 OPENAI_MODEL")
+    temperature: float = Field(0.7, ge=0, le=2)
+    max_tokens: int = Field(4000, ge=1)
+    concurrency: Optional[int] = Field(None, ge=1, description="同时进行的请求数，默认使用全局配置")
+    requests_per_second: Optional[float] = Field(None, gt=0, description="每秒最多发起的请求数，默认使用全局配置")
+
+    @model_validator(mode="after")
+    def check_variables(self):
+        if self.variables is not None and self.seeds is not None:
+            raise ValueError("variables 和 seeds 只能提供一个")
+        placeholders = template_placeholders(self.prompt_template)
+        for i, variables in enumerate(self.item_variables()):
+            missing = placeholders - variables.keys()
+            if missing:
+                raise ValueError(f"第 {i + 1} 组变量缺少模板占位符: {', '.join(sorted(missing))}")
+        return self
+
+    def item_variables(self) -> List[Dict[str, Any]]:
+        """每组模板变量，未提供变量时模板本身作为一组"""
+        if self.seeds is not None:
+            return [{"seed": seed} for seed in self.seeds]
+        if self.variables is not None:
+            return self.variables
+        return [{}]
+
+class GenerationJob(BaseDBModel):
+    status: GenerationJobStatus
+    params: Dict[str, Any] = Field(default_factory=dict, description="任务参数")
+    total_items: int = 0
+    completed_items: int = 0
+    failed_items: int = 0
+    error: Optional[str] = None
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+
+class GenerationJobItem(BaseModel):
+    job_id: int
+    item_index: int
+    variables: Dict[str, Any] = Field(default_factory=dict)
+    status: GenerationItemStatus
+    conversation_id: Optional[int] = None
+    error: Optional[str] = None
+    updated_at: Optional[str] = None
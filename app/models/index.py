@@ -1,17 +1,39 @@
-from typing import Dict, Any, Optional, List
-from pydantic import BaseModel, Field
+from typing import Dict, Any, Optional, List, Union
+from pydantic import BaseModel, Field, HttpUrl, model_validator
 from datetime import datetime
 from .base import BaseDBModel
 from enum import Enum
 
+class IndexType(str, Enum):
+    """向量索引类型"""
+    FLAT = "flat"  # 暴力检索
+    IVF = "ivf"  # 倒排索引
+    HNSW = "hnsw"  # 分层可导航小世界图
+    IVF_PQ = "ivf_pq"  # 倒排索引 + 乘积量化
+
+class IndexParams(BaseModel):
+    """向量索引参数"""
+    nlist: int = Field(1024, ge=1, description="IVF 聚类中心数量")
+    nprobe: int = Field(16, ge=1, description="IVF 检索时访问的聚类数量")
+    hnsw_m: int = Field(32, ge=2, description="HNSW 每个节点的邻居数量")
+    ef_construction: int = Field(40, ge=1, description="HNSW 构建时的候选数量")
+    ef_search: int = Field(64, ge=1, description="HNSW 检索时的候选数量")
+    pq_m: int = Field(48, ge=1, description="PQ 子向量数量，需整除向量维度")
+    pq_nbits: int = Field(8, ge=1, le=16, description="PQ 每个子向量的编码位数")
+    promote_threshold: Optional[int] = Field(None, ge=1, description="文档数超过该值后由暴力检索升级为所选索引类型，默认使用全局配置")
+
 class IndexCreate(BaseModel):
     name: str
     description: Optional[str] = None
+    index_type: IndexType = Field(IndexType.FLAT, description="向量索引类型")
+    index_params: IndexParams = Field(default_factory=IndexParams, description="向量索引参数")
 
 class Index(BaseDBModel):
     name: str
     description: Optional[str]
     document_count: int
+    index_type: IndexType = IndexType.FLAT
+    index_params: Optional[IndexParams] = None
 
 class DocumentCreate(BaseModel):
     content: str
@@ -19,14 +41,81 @@ class DocumentCreate(BaseModel):
 
 class Document(BaseDBModel):
     index_id: int
-    content: str
-    metadata: Optional[Dict[str, Any]]
-    similarity: Optional[float] = None 
+    content: Optional[str] = None
+    metadata: Optional[Dict[str, Any]] = None
+    similarity: Optional[float] = None
+    rerank_score: Optional[float] = None 
+
+class RecallMode(str, Enum):
+    """召回方式"""
+    VECTOR = "vector"  # 向量检索
+    KEYWORD = "keyword"  # BM25 关键词检索
+    HYBRID = "hybrid"  # 向量 + 关键词融合
+
+class FusionMethod(str, Enum):
+    """混合召回的结果融合方式"""
+    RRF = "rrf"  # 倒数排名融合
+    WEIGHTED = "weighted"  # 归一化分数加权
+
+class FilterOperator(str, Enum):
+    """元数据过滤操作符"""
+    EQ = "eq"  # 等于
+    IN = "in"  # 属于列表中任一值
+    PREFIX = "prefix"  # 字符串前缀
+
+MetadataValue = Union[str, int, float, bool]
+
+class MetadataFilter(BaseModel):
+    """元数据过滤条件，例如 {"key": "file_extension", "op": "in", "value": [".py", ".md"]}"""
+    key: str = Field(description="元数据字段名")
+    op: FilterOperator = Field(FilterOperator.EQ, description="操作符")
+    value: Union[MetadataValue, List[MetadataValue]] = Field(description="比较值，in 操作符为列表")
+
+    @model_validator(mode="after")
+    def check_value(self):
+        if self.op == FilterOperator.IN and not isinstance(self.value, list):
+            raise ValueError("in 操作符的 value 必须是列表")
+        if self.op == FilterOperator.PREFIX and not isinstance(self.value, str):
+            raise ValueError("prefix 操作符的 value 必须是字符串")
+        if self.op == FilterOperator.EQ and isinstance(self.value, list):
+            raise ValueError("eq 操作符的 value 不能是列表")
+        return self
 
 class DocumentRecallRequest(BaseModel):
     index_id: int
     query: str
     top_k: Optional[int] = 5
+    mode: RecallMode = Field(RecallMode.VECTOR, description="召回方式")
+    fusion: FusionMethod = Field(FusionMethod.RRF, description="混合召回的融合方式")
+    vector_weight: float = Field(0.5, ge=0, description="混合召回中向量检索的权重")
+    keyword_weight: float = Field(0.5, ge=0, description="混合召回中关键词检索的权重")
+    rrf_k: int = Field(60, ge=1, description="RRF 平滑常数")
+    candidate_k: Optional[int] = Field(None, ge=1, description="混合召回时每路检索的候选数量，默认为 top_k 的若干倍")
+    filters: List[MetadataFilter] = Field(default_factory=list, description="元数据过滤条件，多个条件之间为 AND 关系")
+    include_content: bool = Field(True, description="是否返回文档内容")
+    include_metadata: bool = Field(True, description="是否返回文档元数据")
+    rerank: bool = Field(False, description="是否使用交叉编码器对候选结果重排序")
+    rerank_depth: Optional[int] = Field(None, ge=1, description="重排序的候选数量，默认使用全局配置")
+    rerank_model: Optional[str] = Field(None, description="重排序模型，需在允许的模型列表中")
+
+class BatchRecallQuery(BaseModel):
+    query: str
+    top_k: Optional[int] = Field(None, ge=1, description="该查询的返回数量，默认使用请求的 top_k")
+
+class BatchRecallRequest(BaseModel):
+    """批量向量召回请求"""
+    queries: List[BatchRecallQuery] = Field(min_length=1, description="查询列表")
+    top_k: int = Field(5, ge=1, description="默认返回数量")
+    filters: List[MetadataFilter] = Field(default_factory=list, description="元数据过滤条件，对所有查询生效")
+    include_content: bool = Field(True, description="是否返回文档内容")
+    include_metadata: bool = Field(True, description="是否返回文档元数据")
+    stream: bool = Field(False, description="是否以 NDJSON 逐条流式返回结果")
+
+class BatchRecallResult(BaseModel):
+    """单个查询的召回结果"""
+    index: int = Field(description="查询在请求中的序号")
+    query: str
+    documents: List[Document]
 
 class ChunkingStrategy(str, Enum):
     """文档切片策略"""
@@ -48,8 +137,37 @@ class FileUploadRequest(BaseModel):
     chunking_config: ChunkingConfig
     metadata: Optional[Dict[str, Any]] = Field(None, description="要添加到所有文档的元数据")
 
+class GitRepoIndexRequest(BaseModel):
+    """Git仓库索引请求"""
+    git_url: HttpUrl
+    branch: Optional[str] = "main"
+    chunking_config: ChunkingConfig
+    recursive: bool = True
+    metadata: Optional[Dict[str, Any]] = None
+
 class ProcessedFileInfo(BaseModel):
     """处理后的文件信息"""
     filename: str
     chunk_count: int
-    total_characters: int
\ No newline at end of file
+    total_characters: int
+
+class StageMetrics(BaseModel):
+    """入库流水线单个阶段的吞吐统计"""
+    name: str
+    workers: int
+    items: int = Field(0, description="处理的文件数（embed/persist 阶段为批次中的文件数/批次数）")
+    chunks: int = Field(0, description="处理的文本块数")
+    errors: int = 0
+    busy_seconds: float = Field(0, description="各工作协程处理耗时之和")
+    elapsed_seconds: float = Field(0, description="阶段开始到结束的时间")
+    items_per_second: float = 0
+
+class IngestionResult(BaseModel):
+    """入库流水线处理结果"""
+    total_files: int
+    total_chunks: int
+    total_characters: int
+    processed_files: List[ProcessedFileInfo]
+    failed_files: List[str] = []
+    stage_metrics: List[StageMetrics] = []
+    elapsed_seconds: float = 0
@@ -0,0 +1,40 @@
+from typing import Any, Dict, List, Optional
+from pydantic import BaseModel, Field
+from enum import Enum
+from .base import BaseDBModel
+from .index import StageMetrics
+
+class IngestionJobType(str, Enum):
+    """入库任务类型"""
+    GIT = "git"  # 索引 Git 仓库
+    FILES = "files"  # 上传的文件
+
+class IngestionJobStatus(str, Enum):
+    """入库任务状态"""
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+# 已结束的任务状态
+FINISHED_JOB_STATUSES = (IngestionJobStatus.COMPLETED, IngestionJobStatus.FAILED, IngestionJobStatus.CANCELLED)
+
+class IngestionJob(BaseDBModel):
+    index_id: int
+    job_type: IngestionJobType
+    status: IngestionJobStatus
+    params: Dict[str, Any] = Field(default_factory=dict, description="任务参数")
+    total_files: Optional[int] = Field(None, description="待处理文件总数，Git 仓库任务在遍历完成后才确定")
+    processed_files: int = 0
+    failed_files: int = 0
+    total_chunks: int = 0
+    total_characters: int = 0
+    error: Optional[str] = None
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+
+class IngestionJobProgress(BaseModel):
+    """推送给客户端的任务进度"""
+    job: IngestionJob
+    stage_metrics: List[StageMetrics] = []
@@ -1,7 +1,8 @@
 from typing import List
 from git import Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from app.models.conversation import Message
+from app.models.index import MetadataFilter, RecallMode
 
 
 
@@ -23,3 +24,16 @@ class GetChatRequest(BaseModel):
 class CopyChatRequest(BaseModel):
     id: int
 
+class ChatCompletionRequest(BaseModel):
+    """聊天补全请求，指定索引时先检索相关文档作为上下文"""
+    content: str = Field(..., min_length=1, description="用户消息")
+    index_id: Optional[int] = Field(None, description="检索的索引ID，为空时不检索")
+    top_k: Optional[int] = Field(None, ge=1, le=50, description="检索的文档块数量")
+    mode: RecallMode = Field(RecallMode.VECTOR, description="召回方式")
+    filters: List[MetadataFilter] = Field(default_factory=list, description="元数据过滤条件")
+    context_token_budget: Optional[int] = Field(None, ge=0, description="检索上下文的 token 上限")
+    history_token_budget: Optional[int] = Field(None, ge=0, description="历史消息的 token 上限")
+    system_prompt: Optional[str] = Field(None, description="系统提示词，默认使用内置提示词")
+    model: Optional[str] = None
+    temperature: float = Field(0.7, ge=0, le=2)
+    max_tokens: Optional[int] = Field(None, ge=1, description="最大生成 token 数")
@@ -1,12 +1,13 @@
 import os
 import re
 import fnmatch
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterator, Optional
 import docx
 import PyPDF2
 import chardet
 from pathlib import Path
 
+from app.core.executors import run_io
 from app.models.index import ChunkingStrategy, ChunkingConfig, DocumentCreate
 
 
@@ -50,6 +51,8 @@ class DocumentProcessor:
         """
         处理文件并返回切片后的文本块
         
+        文件读取和切片都是阻塞操作，在 IO 线程池中执行
+        
         Args:
             file_path: 文件路径
             chunking_config: 切片配置
@@ -57,6 +60,25 @@ class DocumentProcessor:
         Returns:
             List[str]: 切片后的文本块列表
         """
+        return await run_io(DocumentProcessor.process_file_sync, file_path, chunking_config)
+    
+    @staticmethod
+    def process_file_sync(file_path: str, chunking_config: ChunkingConfig) -> List[str]:
+        """process_file 的同步实现"""
+        text = DocumentProcessor.extract_text(file_path)
+        return DocumentProcessor.chunk_text(text, chunking_config)
+    
+    @staticmethod
+    def extract_text(file_path: str) -> str:
+        """
+        根据文件类型提取文本
+        
+        Args:
+            file_path: 文件路径
+            
+        Returns:
+            str: 文件文本内容
+        """
         # 获取文件后缀
         file_ext = Path(file_path).suffix.lower()
         
@@ -74,7 +96,20 @@ class DocumentProcessor:
         else:
             raise ValueError(f"不支持的文件类型: {file_ext}")
         
-        # 根据切片策略处理文本
+        return text
+    
+    @staticmethod
+    def chunk_text(text: str, chunking_config: ChunkingConfig) -> List[str]:
+        """
+        根据切片策略切分文本
+        
+        Args:
+            text: 文本内容
+            chunking_config: 切片配置
+            
+        Returns:
+            List[str]: 切片后的文本块列表
+        """
         if chunking_config.strategy == ChunkingStrategy.NO_CHUNKING:
             return [text]
         elif chunking_config.strategy == ChunkingStrategy.PARAGRAPH:
@@ -152,22 +187,24 @@ class DocumentProcessor:
         return False
     
     @staticmethod
-    async def process_directory(dir_path: str, chunking_config: ChunkingConfig, recursive: bool = True) -> List[Dict[str, Any]]:
+    def is_supported_file(file_path: str) -> bool:
+        """检查文件类型是否支持"""
+        ext = os.path.splitext(file_path)[1].lower()
+        return ext in ['.txt', '.docx', '.pdf', '.md', '.markdown'] or ext in DocumentProcessor.CODE_EXTENSIONS
+    
+    @staticmethod
+    def iter_files(dir_path: str, recursive: bool = True) -> Iterator[str]:
         """
-        递归处理目录下的所有文件
+        逐个返回目录下需要处理的文件路径
         
         Args:
             dir_path: 目录路径
-            chunking_config: 切片配置
             recursive: 是否递归处理子目录
             
-        Returns:
-            List[Dict]: 处理结果列表，每个元素包含文件名、路径和文本块
+        Yields:
+            str: 文件路径
         """
-        results = []
-        
         for root, dirs, files in os.walk(dir_path):
-            # 处理当前目录下的文件
             for file in files:
                 file_path = os.path.join(root, file)
                 
@@ -176,28 +213,47 @@ class DocumentProcessor:
                     continue
                 
                 # 检查文件扩展名是否支持
-                ext = os.path.splitext(file)[1].lower()
-                if ext not in ['.txt', '.docx', '.pdf', '.md', '.markdown'] and ext not in DocumentProcessor.CODE_EXTENSIONS:
+                if not DocumentProcessor.is_supported_file(file_path):
                     continue
                 
-                try:
-                    # 处理文件
-                    chunks = await DocumentProcessor.process_file(file_path, chunking_config)
-                    relative_path = os.path.relpath(file_path, dir_path)
-                    
-                    results.append({
-                        'filename': file,
-                        'path': relative_path,
-                        'chunks': chunks,
-                        'chunk_count': len(chunks),
-                        'total_characters': sum(len(chunk) for chunk in chunks)
-                    })
-                except Exception as e:
-                    print(f"处理文件 {file_path} 失败: {str(e)}")
+                yield file_path
             
-            # 如果不递归，直接返回
+            # 如果不递归，只处理顶层目录
             if not recursive:
                 break
+    
+    @staticmethod
+    async def process_directory(dir_path: str, chunking_config: ChunkingConfig, recursive: bool = True) -> List[Dict[str, Any]]:
+        """
+        递归处理目录下的所有文件
+        
+        会将所有文件的文本块保存在内存中，处理大型目录请使用 IngestionPipeline
+        
+        Args:
+            dir_path: 目录路径
+            chunking_config: 切片配置
+            recursive: 是否递归处理子目录
+            
+        Returns:
+            List[Dict]: 处理结果列表，每个元素包含文件名、路径和文本块
+        """
+        results = []
+        
+        for file_path in DocumentProcessor.iter_files(dir_path, recursive):
+            try:
+                # 处理文件
+                chunks = await DocumentProcessor.process_file(file_path, chunking_config)
+                relative_path = os.path.relpath(file_path, dir_path)
+                
+                results.append({
+                    'filename': os.path.basename(file_path),
+                    'path': relative_path,
+                    'chunks': chunks,
+                    'chunk_count': len(chunks),
+                    'total_characters': sum(len(chunk) for chunk in chunks)
+                })
+            except Exception as e:
+                print(f"处理文件 {file_path} 失败: {str(e)}")
         
         return results
     
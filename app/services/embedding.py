@@ -1,16 +1,158 @@
+import asyncio
+from functools import lru_cache
+from typing import List, Optional, Tuple
 import numpy as np
 import torch
 from sentence_transformers import SentenceTransformer
 from app.core.config import settings
+from app.core.executors import run_embedding
+from app.services.embedding_cache import EmbeddingCache
+
+class EmbeddingBatcher:
+    """
+    向量请求合并器
+
+    将并发的单条向量请求合并为一次 model.encode 调用，
+    每批最多 max_batch_size 条，最多等待 max_wait_ms 毫秒。
+    """
+
+    def __init__(self, service: "EmbeddingService", max_batch_size: int, max_wait_ms: float):
+        self.service = service
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+    async def embed(self, text: str) -> np.ndarray:
+        """获取单条文本的向量，与其他并发请求合并计算"""
+        self._ensure_worker()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, future))
+        return await future
+
+    async def close(self):
+        """停止后台合并任务"""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+            self._queue = None
+
+    def _ensure_worker(self):
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+
+    async def _collect_batch(self) -> List[Tuple[str, asyncio.Future]]:
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            # 优先取走已在排队的请求
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect_batch()
+            # 跳过已被取消的请求
+            batch = [(text, future) for text, future in batch if not future.done()]
+            if not batch:
+                continue
+
+            try:
+                embeddings = await run_embedding(
+                    self.service.get_embeddings, [text for text, _ in batch]
+                )
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, future), embedding in zip(batch, embeddings):
+                if not future.done():
+                    future.set_result(embedding)
 
 class EmbeddingService:
     def __init__(self):
+        if settings.TORCH_NUM_THREADS:
+            torch.set_num_threads(settings.TORCH_NUM_THREADS)
         self.model = SentenceTransformer(settings.SENTENCE_TRANSFORMER_MODEL)
         self.device = 'cuda' if torch.cuda.is_available() else 'cpu'
         self.model.to(self.device)
-    
+        self.cache = EmbeddingCache(
+            settings.EMBEDDING_CACHE_FILE,
+            model_name=settings.SENTENCE_TRANSFORMER_MODEL,
+            max_entries=settings.EMBEDDING_CACHE_MAX_ENTRIES
+        ) if settings.EMBEDDING_CACHE_ENABLED else None
+        self.batcher = EmbeddingBatcher(
+            self,
+            max_batch_size=settings.EMBEDDING_BATCH_SIZE,
+            max_wait_ms=settings.EMBEDDING_MAX_WAIT_MS
+        )
+
     def get_embedding(self, text: str) -> np.ndarray:
         """获取文本的向量表示"""
+        return self.get_embeddings([text])[0]
+
+    def get_embeddings(self, texts: List[str]) -> np.ndarray:
+        """
+        批量获取文本的向量表示，返回形状为 (len(texts), dim) 的矩阵
+        
+        先查询向量缓存，只对未命中的文本（去重后）调用模型
+        """
+        if not texts:
+            return np.empty((0, settings.VECTOR_DIM), dtype=np.float32)
+        if self.cache is None:
+            return self._encode(texts)
+        
+        cached = self.cache.get_many(texts)
+        missing = list(dict.fromkeys(text for text, embedding in zip(texts, cached) if embedding is None))
+        computed = {}
+        if missing:
+            embeddings = self._encode(missing)
+            self.cache.put_many(missing, embeddings)
+            computed = dict(zip(missing, embeddings))
+        
+        return np.vstack([
+            embedding if embedding is not None else computed[text]
+            for text, embedding in zip(texts, cached)
+        ]).astype(np.float32)
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        """调用模型计算向量"""
         with torch.no_grad():
-            embedding = self.model.encode(text, convert_to_numpy=True)
-        return embedding.astype(np.float32) 
\ No newline at end of file
+            embeddings = self.model.encode(
+                texts,
+                batch_size=settings.EMBEDDING_BATCH_SIZE,
+                convert_to_numpy=True
+            )
+        return embeddings.astype(np.float32)
+
+    async def aget_embedding(self, text: str) -> np.ndarray:
+        """异步获取文本的向量表示，并发请求会被合并为一批计算"""
+        return await self.batcher.embed(text)
+
+    async def aget_embeddings(self, texts: List[str]) -> np.ndarray:
+        """异步批量获取文本的向量表示"""
+        return await run_embedding(self.get_embeddings, texts)
+
+@lru_cache(maxsize=None)
+def get_embedding_service() -> EmbeddingService:
+    """获取进程内共享的向量服务，模型只加载一次"""
+    return EmbeddingService()
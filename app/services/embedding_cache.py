@@ -0,0 +1,146 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from threading import Lock
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+class EmbeddingCache:
+    """
+    持久化的文本向量缓存
+
+    以“模型名 + 文本”的哈希为键，保存在独立的 SQLite 文件中，所有索引共享。
+    超过容量上限时按最近使用时间淘汰。
+
+    查询使用每个线程独立的只读连接，在 WAL 模式下不等待写锁；命中时只在
+    last_used 早于 TOUCH_INTERVAL 时记下新的使用时间，攒够一批或写入、淘汰前再统一提交
+    """
+
+    # 超出上限时一次淘汰到上限的比例，避免每次写入都触发淘汰
+    EVICT_RATIO = 0.9
+    # last_used 的更新粒度（秒），淘汰只需要粗略的使用时间
+    TOUCH_INTERVAL = 600.0
+    # 待更新的使用时间达到该数量时提交
+    TOUCH_BATCH_SIZE = 1000
+
+    def __init__(self, db_file: str, model_name: str, max_entries: int):
+        self.db_file = db_file
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self._lock = Lock()
+        self._local = threading.local()
+        self._readers: List[sqlite3.Connection] = []
+        self._touch_lock = Lock()
+        self._pending_touches: Dict[str, float] = {}
+        self._conn = sqlite3.connect(db_file, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("PRAGMA synchronous = NORMAL")
+        self._conn.execute("""
+        CREATE TABLE IF NOT EXISTS embedding_cache (
+            key TEXT PRIMARY KEY,
+            embedding BLOB NOT NULL,
+            last_used REAL NOT NULL
+        )
+        """)
+        self._conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_embedding_cache_last_used
+        ON embedding_cache (last_used)
+        """)
+        self._conn.commit()
+        self._count = self._conn.execute("SELECT COUNT(*) FROM embedding_cache").fetchone()[0]
+
+    def make_key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def _reader(self) -> sqlite3.Connection:
+        """当前线程的只读连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_file, check_same_thread=False)
+            conn.execute("PRAGMA query_only = ON")
+            self._local.conn = conn
+            with self._touch_lock:
+                self._readers.append(conn)
+        return conn
+
+    def get_many(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """批量查询缓存，未命中的位置返回 None"""
+        if not texts:
+            return []
+
+        keys = [self.make_key(text) for text in texts]
+        rows = self._reader().execute(
+            "SELECT key, embedding, last_used FROM embedding_cache WHERE key IN (SELECT value FROM json_each(?))",
+            (json.dumps(list(set(keys))),)
+        ).fetchall()
+
+        now = time.time()
+        stale = [row[0] for row in rows if now - row[2] >= self.TOUCH_INTERVAL]
+        if stale:
+            with self._touch_lock:
+                for key in stale:
+                    self._pending_touches[key] = now
+                flush = len(self._pending_touches) >= self.TOUCH_BATCH_SIZE
+            if flush:
+                with self._lock:
+                    self._flush_touches()
+                    self._conn.commit()
+
+        found = {row[0]: np.frombuffer(row[1], dtype=np.float32) for row in rows}
+        return [found.get(key) for key in keys]
+
+    def _flush_touches(self):
+        """写入待更新的使用时间，调用方需持有锁并负责提交"""
+        with self._touch_lock:
+            touches, self._pending_touches = self._pending_touches, {}
+        if touches:
+            self._conn.executemany(
+                "UPDATE embedding_cache SET last_used = ? WHERE key = ?",
+                [(last_used, key) for key, last_used in touches.items()]
+            )
+
+    def put_many(self, texts: List[str], embeddings: np.ndarray):
+        """批量写入缓存"""
+        if not texts:
+            return
+
+        now = time.time()
+        records = [
+            (self.make_key(text), np.asarray(embedding, dtype=np.float32).tobytes(), now)
+            for text, embedding in zip(texts, embeddings)
+        ]
+        with self._lock:
+            cursor = self._conn.executemany(
+                "INSERT OR IGNORE INTO embedding_cache (key, embedding, last_used) VALUES (?, ?, ?)",
+                records
+            )
+            self._count += max(cursor.rowcount, 0)
+            if self._count > self.max_entries:
+                # 淘汰前写入最近的使用时间，避免淘汰刚命中的条目
+                self._flush_touches()
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """淘汰最久未使用的条目，调用方需持有锁"""
+        evict_count = self._count - int(self.max_entries * self.EVICT_RATIO)
+        cursor = self._conn.execute(
+            "DELETE FROM embedding_cache WHERE key IN ("
+            "SELECT key FROM embedding_cache ORDER BY last_used LIMIT ?)",
+            (evict_count,)
+        )
+        self._count -= max(cursor.rowcount, 0)
+
+    def close(self):
+        with self._lock:
+            self._flush_touches()
+            self._conn.commit()
+            self._conn.close()
+        with self._touch_lock:
+            readers, self._readers = self._readers, []
+        for conn in readers:
+            conn.close()
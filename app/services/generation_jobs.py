@@ -0,0 +1,183 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.executors import run_io
+from app.db.repositories.generation_job import GenerationJobRepository
+from app.models.generation_job import FINISHED_GENERATION_STATUSES, GenerationJob, GenerationJobCreate, GenerationJobStatus
+from app.services.openai import OpenAIService, get_openai_service
+from app.utils.template import render_template
+
+logger = logging.getLogger(__name__)
+
+# 对话标题的最大长度
+TITLE_MAX_LENGTH = 50
+
+
+class TokenBucket:
+    """
+    令牌桶限流器
+
+    令牌以 rate 个/秒的速度补充，最多累积 capacity 个，每次请求消耗一个令牌，
+    允许短时间内突发 capacity 个请求，长期速率不超过 rate
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = max(capacity, 1)
+        self._tokens = float(self.capacity)
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        # 持锁只预订令牌：令牌可以透支，透支部分决定本次需要等待的时间，
+        # 等待在锁外进行，后到的请求预订到更晚的令牌，仍按到达顺序发放
+        async with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            try:
+                await asyncio.sleep(wait)
+            except asyncio.CancelledError:
+                # 取消时归还预订的令牌
+                self._tokens += 1
+                raise
+
+
+class GenerationJobRunner:
+    """
+    后台对话生成任务执行器
+
+    - 每个任务内同时进行的请求数受 concurrency 限制，发起请求的速率受令牌桶限制
+    - 生成结果攒够 GENERATION_WRITE_BATCH_SIZE 条后批量写入，对话与条目状态在同一事务中提交
+    - 服务重启后只重新生成未完成的条目
+    """
+
+    def __init__(self, max_concurrent_jobs: int):
+        self.max_concurrent_jobs = max_concurrent_jobs
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._tasks: Dict[int, asyncio.Task] = {}
+
+    # ---------- 任务控制 ----------
+
+    def submit(self, job_id: int):
+        """提交任务到后台执行"""
+        if job_id in self._tasks:
+            return
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent_jobs)
+
+        task = asyncio.create_task(self._run(job_id))
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job_id, None))
+
+    async def cancel(self, job_id: int) -> bool:
+        """取消任务，已生成的对话保留"""
+        cancelled = await run_io(GenerationJobRepository.cancel, job_id)
+        task = self._tasks.get(job_id)
+        if task is not None:
+            task.cancel()
+        return cancelled
+
+    async def resume(self):
+        """恢复服务重启前未完成的任务"""
+        for job in await run_io(GenerationJobRepository.list_unfinished):
+            self.submit(job.id)
+
+    async def shutdown(self):
+        """停止所有任务，任务状态保持不变，下次启动时恢复"""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    # ---------- 执行 ----------
+
+    async def _run(self, job_id: int):
+        async with self._semaphore:
+            job = await run_io(GenerationJobRepository.get, job_id)
+            if job is None or job.status in FINISHED_GENERATION_STATUSES:
+                return
+
+            if not await run_io(GenerationJobRepository.mark_running, job_id):
+                return
+            try:
+                await self._execute(job)
+            except Exception as e:
+                logger.exception("生成任务 %s 失败", job_id)
+                await run_io(GenerationJobRepository.finish, job_id, GenerationJobStatus.FAILED, error=str(e))
+                return
+
+            # finish 只更新运行中的任务，最后一批写入期间被取消时保持取消状态
+            await run_io(GenerationJobRepository.finish, job_id, GenerationJobStatus.COMPLETED)
+
+    async def _execute(self, job: GenerationJob):
+        request = GenerationJobCreate(**job.params)
+        items = await run_io(GenerationJobRepository.pending_items, job.id)
+        service = get_openai_service()
+
+        concurrency = min(request.concurrency or settings.GENERATION_CONCURRENCY, settings.GENERATION_MAX_CONCURRENCY)
+        bucket = TokenBucket(
+            request.requests_per_second or settings.GENERATION_REQUESTS_PER_SECOND,
+            settings.GENERATION_BURST
+        )
+
+        completed: List[Tuple[int, Optional[str], List[Dict[str, str]]]] = []
+        failed: List[Tuple[int, str]] = []
+
+        async def flush():
+            nonlocal completed, failed
+            if not completed and not failed:
+                return
+            batch_completed, batch_failed = completed, failed
+            completed, failed = [], []
+            await run_io(GenerationJobRepository.record_results, job.id, batch_completed, batch_failed)
+
+        # concurrency 个协程共享同一个条目迭代器，慢请求不会阻塞其他条目
+        pending = iter(items)
+
+        async def worker():
+            for item_index, variables in pending:
+                await bucket.acquire()
+                try:
+                    completed.append((item_index, *await self._generate(service, request, variables)))
+                except Exception as e:
+                    failed.append((item_index, str(e)))
+                if len(completed) + len(failed) >= settings.GENERATION_WRITE_BATCH_SIZE:
+                    await flush()
+
+        try:
+            await asyncio.gather(*[worker() for _ in range(min(concurrency, len(items)))])
+        finally:
+            # 取消或出错时也写入已生成的结果，恢复后不会重复生成
+            await flush()
+
+    @staticmethod
+    async def _generate(
+        service: OpenAIService,
+        request: GenerationJobCreate,
+        variables: Dict[str, Any]
+    ) -> Tuple[str, List[Dict[str, str]]]:
+        """生成一条对话，返回 (标题, 消息列表)"""
+        prompt = render_template(request.prompt_template, variables)
+        messages = []
+        if request.system_prompt:
+            messages.append({"role": "system", "content": request.system_prompt})
+        messages.append({"role": "user", "content": prompt})
+
+        content = await service.create_chat_completion(
+            messages,
+            temperature=request.temperature,
+            max_tokens=request.max_tokens,
+            model=request.model
+        )
+        messages.append({"role": "assistant", "content": content})
+        return prompt[:TITLE_MAX_LENGTH], messages
+
+
+generation_job_runner = GenerationJobRunner(settings.GENERATION_MAX_CONCURRENT_JOBS)
@@ -0,0 +1,324 @@
+import logging
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import faiss
+
+logger = logging.getLogger(__name__)
+
+# 向量ID占用的字节数（int64）
+ID_BYTES = 8
+# IDMap2 反向映射、IVF 直接映射等哈希表中每个条目的近似开销
+HASH_ENTRY_BYTES = 32
+
+
+def estimate_index_bytes(faiss_index: faiss.Index) -> int:
+    """
+    按索引类型估算内存占用
+
+    - 暴力检索：向量编码
+    - HNSW：底层向量存储加邻接表
+    - IVF / IVF-PQ：倒排表中的编码和ID、粗量化器，PQ 另加码本
+    - ID 映射：ID 数组，IDMap2 另加反向哈希表
+    """
+    # 转换后的对象不持有底层索引，faiss_index 需保持引用
+    index = faiss.downcast_index(faiss_index)
+    ntotal = int(index.ntotal)
+
+    if isinstance(index, faiss.IndexIDMap):
+        size = estimate_index_bytes(index.index) + ntotal * ID_BYTES
+        if isinstance(index, faiss.IndexIDMap2):
+            size += ntotal * HASH_ENTRY_BYTES
+        return size
+
+    if isinstance(index, faiss.IndexHNSW):
+        hnsw = index.hnsw
+        return (
+            estimate_index_bytes(index.storage)
+            + int(hnsw.neighbors.size()) * 4
+            + int(hnsw.offsets.size()) * 8
+            + int(hnsw.levels.size()) * 4
+        )
+
+    if isinstance(index, faiss.IndexIVF):
+        size = ntotal * (int(index.code_size) + ID_BYTES) + estimate_index_bytes(index.quantizer)
+        if isinstance(index, faiss.IndexIVFPQ):
+            size += int(index.pq.centroids.size()) * 4
+        if index.direct_map.type == faiss.DirectMap.Hashtable:
+            size += ntotal * HASH_ENTRY_BYTES
+        return size
+
+    if isinstance(index, faiss.IndexFlatCodes):
+        return ntotal * int(index.code_size)
+
+    # 其他类型按 float32 原始向量估算
+    return ntotal * int(index.d) * 4
+
+
+class _CachedIndex:
+    """缓存中的单个索引"""
+
+    def __init__(self, faiss_index: faiss.Index):
+        self.index = faiss_index
+        self.lock = threading.RLock()
+        self.dirty = False
+        self.size = estimate_index_bytes(faiss_index)
+
+
+class IndexManager:
+    """
+    进程级 FAISS 索引管理器
+
+    - 常驻内存缓存热索引，按数量和内存预算进行 LRU 淘汰
+    - 写入只标记为脏，由后台线程定期落盘（write-behind），关闭时全部刷盘
+    - 每个索引有独立的锁，读写索引需通过 acquire 获取
+    """
+
+    def __init__(
+        self,
+        max_indices: int,
+        max_memory_bytes: int,
+        flush_interval: float,
+        path_factory: Callable[[int], str],
+    ):
+        self.max_indices = max_indices
+        self.max_memory_bytes = max_memory_bytes
+        self.flush_interval = flush_interval
+        self.path_factory = path_factory
+        # 加载函数，默认直接从文件读取，可由仓储层替换（例如加载后做一致性校验）
+        self.loader: Callable[[int], Optional[faiss.Index]] = self._read_from_disk
+
+        self._cache: "OrderedDict[int, _CachedIndex]" = OrderedDict()
+        # 已移出缓存、正在落盘的索引，落盘完成前再次访问时直接放回缓存
+        self._evicting: Dict[int, _CachedIndex] = {}
+        self._lock = threading.RLock()
+        self._load_locks: Dict[int, threading.Lock] = {}
+        self._stop_event = threading.Event()
+        self._flush_thread: Optional[threading.Thread] = None
+
+    # ---------- 生命周期 ----------
+
+    def start(self):
+        """启动后台刷盘线程"""
+        if self._flush_thread and self._flush_thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._flush_thread = threading.Thread(
+            target=self._flush_loop, name="faiss-index-flusher", daemon=True
+        )
+        self._flush_thread.start()
+
+    def stop(self):
+        """停止后台线程并将所有脏索引落盘"""
+        self._stop_event.set()
+        if self._flush_thread:
+            self._flush_thread.join(timeout=self.flush_interval + 5)
+            self._flush_thread = None
+        self.flush_all()
+
+    def _flush_loop(self):
+        while not self._stop_event.wait(self.flush_interval):
+            try:
+                self.flush_all()
+            except Exception:
+                logger.exception("索引后台落盘失败")
+
+    # ---------- 访问 ----------
+
+    @contextmanager
+    def acquire(self, index_id: int, create: Optional[Callable[[], faiss.Index]] = None) -> Iterator[Optional[faiss.Index]]:
+        """
+        获取索引并持有其锁
+
+        Args:
+            index_id: 索引ID
+            create: 缓存和磁盘中都不存在时用于创建新索引的函数
+
+        Yields:
+            faiss.Index: 索引对象，不存在时为 None
+        """
+        while True:
+            entry = self._get_entry(index_id, create)
+            if entry is None:
+                yield None
+                return
+
+            with entry.lock:
+                # 拿到锁之前索引可能已被淘汰或替换，此时重新获取
+                with self._lock:
+                    current = self._cache.get(index_id) is entry
+                if not current:
+                    continue
+                yield entry.index
+                return
+
+    def mark_dirty(self, index_id: int):
+        """标记索引已修改，并重新计算内存占用"""
+        with self._lock:
+            entry = self._cache.get(index_id)
+            if entry is None:
+                return
+            entry.dirty = True
+            entry.size = estimate_index_bytes(entry.index)
+            victims = self._evict(keep=index_id)
+        self._write_victims(victims)
+
+    def put(self, index_id: int, faiss_index: faiss.Index, dirty: bool = True):
+        """放入（或替换）一个索引"""
+        entry = _CachedIndex(faiss_index)
+        entry.dirty = dirty
+        with self._lock:
+            # 替换索引时调用方应已通过 acquire 持有旧索引的锁
+            self._cache.pop(index_id, None)
+            self._evicting.pop(index_id, None)
+            self._cache[index_id] = entry
+            victims = self._evict(keep=index_id)
+        self._write_victims(victims)
+
+    def drop(self, index_id: int, delete_file: bool = False):
+        """从缓存中移除索引（不落盘），可选删除索引文件"""
+        with self._lock:
+            entry = self._cache.pop(index_id, None)
+            evicting = self._evicting.pop(index_id, None)
+        # 正在淘汰落盘的索引需等待写完，再删除文件
+        for current in (entry, evicting):
+            if current is not None:
+                with current.lock:
+                    current.dirty = False
+        if delete_file:
+            index_file = self.path_factory(index_id)
+            if os.path.exists(index_file):
+                os.remove(index_file)
+
+    # ---------- 落盘 ----------
+
+    def flush(self, index_id: int):
+        """将指定索引落盘"""
+        with self._lock:
+            entry = self._cache.get(index_id)
+        if entry is not None:
+            self._write_entry(index_id, entry)
+
+    def flush_all(self):
+        """将所有脏索引落盘"""
+        with self._lock:
+            entries = [(index_id, entry) for index_id, entry in self._cache.items() if entry.dirty]
+        for index_id, entry in entries:
+            self._write_entry(index_id, entry)
+
+    def _write_entry(self, index_id: int, entry: _CachedIndex):
+        with entry.lock:
+            if not entry.dirty:
+                return
+            index_file = self.path_factory(index_id)
+            # 先写临时文件再替换，避免写到一半时崩溃导致索引文件损坏
+            tmp_file = f"{index_file}.tmp"
+            faiss.write_index(entry.index, tmp_file)
+            os.replace(tmp_file, index_file)
+            entry.dirty = False
+
+    # ---------- 内部方法 ----------
+
+    def _read_from_disk(self, index_id: int) -> Optional[faiss.Index]:
+        index_file = self.path_factory(index_id)
+        if not os.path.exists(index_file):
+            return None
+        return faiss.read_index(index_file)
+
+    def _get_entry(self, index_id: int, create: Optional[Callable[[], faiss.Index]]) -> Optional[_CachedIndex]:
+        with self._lock:
+            entry = self._cache.get(index_id)
+            if entry is not None:
+                self._cache.move_to_end(index_id)
+                return entry
+            load_lock = self._load_locks.setdefault(index_id, threading.Lock())
+
+        # 按索引加锁加载，避免同一索引被并发重复加载，同时不阻塞其他索引的访问
+        with load_lock:
+            with self._lock:
+                entry = self._cache.get(index_id)
+                if entry is not None:
+                    return entry
+                # 刚被淘汰、尚未写完的索引比磁盘上的新，直接放回缓存
+                entry = self._evicting.pop(index_id, None)
+                if entry is not None:
+                    self._cache[index_id] = entry
+                    self._load_locks.pop(index_id, None)
+                    victims = self._evict(keep=index_id)
+            if entry is not None:
+                self._write_victims(victims)
+                return entry
+
+            faiss_index = self.loader(index_id)
+            dirty = False
+            if faiss_index is None:
+                if create is None:
+                    return None
+                faiss_index = create()
+                dirty = True
+
+            entry = _CachedIndex(faiss_index)
+            entry.dirty = dirty
+            with self._lock:
+                self._cache[index_id] = entry
+                self._load_locks.pop(index_id, None)
+                victims = self._evict(keep=index_id)
+            self._write_victims(victims)
+            return entry
+
+    def _evict(self, keep: Optional[int] = None) -> List[Tuple[int, _CachedIndex]]:
+        """
+        按数量和内存预算选出最久未使用的索引并移出缓存
+
+        调用方需持有全局锁，并在释放全局锁后将返回值交给 _write_victims 落盘，
+        避免写文件时阻塞其他索引的访问。正在被使用的索引不会被淘汰，
+        这里只尝试非阻塞地获取索引锁；选中的索引保持加锁，直到落盘完成。
+
+        Returns:
+            被淘汰的 (索引ID, 缓存项) 列表
+        """
+        victims = []
+        total_size = sum(entry.size for entry in self._cache.values())
+        for victim_id in list(self._cache.keys()):
+            if len(self._cache) <= self.max_indices and total_size <= self.max_memory_bytes:
+                break
+            if victim_id == keep:
+                continue
+
+            victim = self._cache[victim_id]
+            if not victim.lock.acquire(blocking=False):
+                continue
+            del self._cache[victim_id]
+            self._evicting[victim_id] = victim
+            total_size -= victim.size
+            victims.append((victim_id, victim))
+        return victims
+
+    def _write_victims(self, victims: List[Tuple[int, _CachedIndex]]):
+        """在全局锁之外将被淘汰的脏索引落盘，并释放 _evict 中获取的索引锁"""
+        for victim_id, victim in victims:
+            try:
+                self._write_entry(victim_id, victim)
+            except Exception:
+                # 落盘失败时放回缓存，保留未写入的修改
+                logger.exception("淘汰索引 %s 时落盘失败", victim_id)
+                with self._lock:
+                    if self._evicting.get(victim_id) is victim and victim_id not in self._cache:
+                        self._cache[victim_id] = victim
+            finally:
+                with self._lock:
+                    if self._evicting.get(victim_id) is victim:
+                        del self._evicting[victim_id]
+                victim.lock.release()
+
+    def stats(self) -> Dict[str, int]:
+        """缓存统计信息"""
+        with self._lock:
+            return {
+                "cached_indices": len(self._cache),
+                "dirty_indices": sum(1 for entry in self._cache.values() if entry.dirty),
+                "memory_bytes": sum(entry.size for entry in self._cache.values()),
+            }
@@ -0,0 +1,346 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, Iterator, List, Optional, Set
+
+from app.core.config import settings
+from app.core.executors import run_io
+from app.db.repositories.index import DocumentRepository
+from app.models.index import ChunkingConfig, DocumentCreate, IngestionResult, ProcessedFileInfo, StageMetrics
+from app.services.document_processor import DocumentProcessor
+from app.services.embedding import EmbeddingService
+
+logger = logging.getLogger(__name__)
+
+# 队列结束标记
+_DONE = object()
+
+
+class SourceFile:
+    """待处理的文件"""
+
+    def __init__(self, path: str, relative_path: str, filename: Optional[str] = None):
+        self.path = path
+        self.relative_path = relative_path
+        self.filename = filename or os.path.basename(path)
+        self.text: Optional[str] = None
+        self.documents: List[DocumentCreate] = []
+        self.total_characters = 0
+
+
+def build_file_metadata(metadata: Optional[Dict[str, Any]], source: SourceFile) -> Dict[str, Any]:
+    """生成上传文件的文档元数据"""
+    return {
+        **(metadata or {}),
+        'file_path': source.relative_path,
+        'file_name': source.filename,
+        'file_extension': os.path.splitext(source.filename)[1],
+    }
+
+
+def build_git_metadata(
+    git_url: str,
+    branch: Optional[str],
+    metadata: Optional[Dict[str, Any]],
+    source: SourceFile,
+    processed_at: str
+) -> Dict[str, Any]:
+    """生成 Git 仓库文件的文档元数据"""
+    return {
+        **build_file_metadata(metadata, source),
+        'git_repo': git_url,
+        'git_branch': branch,
+        'processed_at': processed_at,
+    }
+
+
+class _StageStats:
+    """单个阶段的运行统计"""
+
+    def __init__(self, name: str, workers: int):
+        self.name = name
+        self.workers = workers
+        self.items = 0
+        self.chunks = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def to_metrics(self) -> StageMetrics:
+        elapsed = (self.finished_at or time.monotonic()) - (self.started_at or time.monotonic())
+        return StageMetrics(
+            name=self.name,
+            workers=self.workers,
+            items=self.items,
+            chunks=self.chunks,
+            errors=self.errors,
+            busy_seconds=round(self.busy_seconds, 3),
+            elapsed_seconds=round(elapsed, 3),
+            items_per_second=round(self.items / elapsed, 2) if elapsed > 0 else 0.0,
+        )
+
+
+class IngestionPipeline:
+    """
+    分阶段的流式文档入库流水线
+
+    discover → extract → chunk → embed → persist
+
+    各阶段之间通过有界队列连接，下游处理不过来时上游会被阻塞（背压），
+    因此内存中最多只保留队列容量范围内的文件内容；每个阶段有独立的并发数。
+    """
+
+    def __init__(
+        self,
+        index_id: int,
+        chunking_config: ChunkingConfig,
+        embedding_service: EmbeddingService,
+        metadata_factory: Optional[Callable[[SourceFile], Dict[str, Any]]] = None,
+        on_persisted: Optional[Callable[[List[SourceFile]], Awaitable[None]]] = None,
+        checkpoint: Optional[Callable[[sqlite3.Cursor, List[SourceFile]], None]] = None,
+        completed_paths: Optional[Set[str]] = None,
+        on_failure: Optional[Callable[[SourceFile, Exception], None]] = None,
+        on_empty: Optional[Callable[[SourceFile], None]] = None,
+    ):
+        """
+        Args:
+            index_id: 目标索引ID
+            chunking_config: 切片配置
+            embedding_service: 向量服务
+            metadata_factory: 为每个文件生成文档元数据
+            on_persisted: 一批文件写入数据库后的回调
+            checkpoint: 与文档写入在同一事务中执行，用于记录已完成的文件
+            completed_paths: 已处理过的文件相对路径，恢复任务时跳过
+            on_failure: 文件处理失败时在 IO 线程池中调用，用于记录失败的文件
+            on_empty: 文件没有切出文本块时在 IO 线程池中调用，用于记录已完成的文件
+        """
+        self.index_id = index_id
+        self.chunking_config = chunking_config
+        self.embedding_service = embedding_service
+        self.metadata_factory = metadata_factory or (lambda source: {})
+        self.on_persisted = on_persisted
+        self.checkpoint = checkpoint
+        self.completed_paths = completed_paths or set()
+        self.on_failure = on_failure
+        self.on_empty = on_empty
+
+        self.queue_size = settings.INGESTION_QUEUE_SIZE
+        self.embed_batch_size = settings.INGESTION_EMBED_BATCH_SIZE
+        self.stats = {
+            "discover": _StageStats("discover", 1),
+            "extract": _StageStats("extract", settings.INGESTION_EXTRACT_WORKERS),
+            "chunk": _StageStats("chunk", settings.INGESTION_CHUNK_WORKERS),
+            "embed": _StageStats("embed", settings.INGESTION_EMBED_WORKERS),
+            "persist": _StageStats("persist", settings.INGESTION_PERSIST_WORKERS),
+        }
+        self.processed_files: List[ProcessedFileInfo] = []
+        self.failed_files: List[str] = []
+
+    async def run_directory(self, dir_path: str, recursive: bool = True) -> IngestionResult:
+        """处理目录下的所有文件"""
+        def sources() -> Iterator[SourceFile]:
+            for file_path in DocumentProcessor.iter_files(dir_path, recursive):
+                yield SourceFile(file_path, os.path.relpath(file_path, dir_path))
+
+        return await self.run(sources())
+
+    async def run(self, sources: Iterable[SourceFile]) -> IngestionResult:
+        """处理给定的文件序列"""
+        started_at = time.monotonic()
+        extract_queue: asyncio.Queue = asyncio.Queue(self.queue_size)
+        chunk_queue: asyncio.Queue = asyncio.Queue(self.queue_size)
+        embed_queue: asyncio.Queue = asyncio.Queue(self.queue_size)
+        persist_queue: asyncio.Queue = asyncio.Queue(self.queue_size)
+
+        tasks = [
+            asyncio.create_task(self._discover(sources, extract_queue)),
+            asyncio.create_task(self._stage("extract", self._extract, extract_queue, chunk_queue, "chunk")),
+            asyncio.create_task(self._stage("chunk", self._chunk, chunk_queue, embed_queue, "embed")),
+            asyncio.create_task(self._stage("embed", None, embed_queue, persist_queue, "persist")),
+            asyncio.create_task(self._stage("persist", self._persist, persist_queue, None, None)),
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            # 任一阶段失败或被取消时，停止其余阶段
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        return IngestionResult(
+            total_files=len(self.processed_files),
+            total_chunks=sum(f.chunk_count for f in self.processed_files),
+            total_characters=sum(f.total_characters for f in self.processed_files),
+            processed_files=self.processed_files,
+            failed_files=self.failed_files,
+            stage_metrics=self.metrics(),
+            elapsed_seconds=round(time.monotonic() - started_at, 3),
+        )
+
+    def metrics(self) -> List[StageMetrics]:
+        """各阶段当前的吞吐统计"""
+        return [stats.to_metrics() for stats in self.stats.values()]
+
+    # ---------- 阶段调度 ----------
+
+    async def _discover(self, sources: Iterable[SourceFile], out_queue: asyncio.Queue):
+        stats = self.stats["discover"]
+        stats.started_at = time.monotonic()
+        iterator = iter(sources)
+        while True:
+            # 遍历目录是阻塞操作，逐个在 IO 线程池中获取
+            started = time.monotonic()
+            source = await run_io(next, iterator, None)
+            stats.busy_seconds += time.monotonic() - started
+            if source is None:
+                break
+            if source.relative_path in self.completed_paths:
+                continue
+            stats.items += 1
+            await out_queue.put(source)
+
+        stats.finished_at = time.monotonic()
+        for _ in range(self.stats["extract"].workers):
+            await out_queue.put(_DONE)
+
+    async def _stage(
+        self,
+        name: str,
+        handler: Optional[Callable[[SourceFile], Awaitable[Optional[SourceFile]]]],
+        in_queue: asyncio.Queue,
+        out_queue: Optional[asyncio.Queue],
+        next_stage: Optional[str],
+    ):
+        stats = self.stats[name]
+        stats.started_at = time.monotonic()
+        worker = self._embed_worker if name == "embed" else self._worker
+        await asyncio.gather(*[
+            worker(stats, handler, in_queue, out_queue)
+            for _ in range(stats.workers)
+        ])
+        stats.finished_at = time.monotonic()
+
+        if out_queue is not None:
+            for _ in range(self.stats[next_stage].workers):
+                await out_queue.put(_DONE)
+
+    async def _worker(self, stats: _StageStats, handler, in_queue: asyncio.Queue, out_queue: Optional[asyncio.Queue]):
+        while True:
+            item = await in_queue.get()
+            if item is _DONE:
+                return
+
+            started = time.monotonic()
+            result = await handler(item)
+            stats.busy_seconds += time.monotonic() - started
+            stats.items += 1
+
+            if result is not None and out_queue is not None:
+                await out_queue.put(result)
+
+    async def _embed_worker(self, stats: _StageStats, handler, in_queue: asyncio.Queue, out_queue: asyncio.Queue):
+        """合并多个文件的文本块为一批计算向量"""
+        done = False
+        while not done:
+            item = await in_queue.get()
+            if item is _DONE:
+                return
+
+            batch = [item]
+            chunk_count = len(item.documents)
+            while chunk_count < self.embed_batch_size and not in_queue.empty():
+                next_item = in_queue.get_nowait()
+                if next_item is _DONE:
+                    done = True
+                    break
+                batch.append(next_item)
+                chunk_count += len(next_item.documents)
+
+            started = time.monotonic()
+            texts = [doc.content for source in batch for doc in source.documents]
+            try:
+                embeddings = await self.embedding_service.aget_embeddings(texts)
+            except Exception as e:
+                # 只跳过这一批文件，其余批次继续处理
+                for source in batch:
+                    await self._record_failure("embed", source, e)
+                    source.documents = []
+                continue
+            finally:
+                stats.busy_seconds += time.monotonic() - started
+            stats.items += len(batch)
+            stats.chunks += len(texts)
+
+            await out_queue.put((batch, embeddings))
+
+    # ---------- 阶段处理函数 ----------
+
+    async def _extract(self, source: SourceFile) -> Optional[SourceFile]:
+        try:
+            source.text = await run_io(DocumentProcessor.extract_text, source.path)
+            return source
+        except Exception as e:
+            await self._record_failure("extract", source, e)
+            return None
+
+    async def _chunk(self, source: SourceFile) -> Optional[SourceFile]:
+        try:
+            chunks = await run_io(DocumentProcessor.chunk_text, source.text, self.chunking_config)
+        except Exception as e:
+            await self._record_failure("chunk", source, e)
+            return None
+        finally:
+            # 切片后不再需要原文
+            source.text = None
+
+        chunks = [chunk for chunk in chunks if chunk]
+        if not chunks:
+            # 没有内容的文件不会进入写入阶段，单独记录为已完成，恢复任务时不再重复提取
+            if self.on_empty is not None:
+                await run_io(self.on_empty, source)
+            return None
+
+        source.total_characters = sum(len(chunk) for chunk in chunks)
+        source.documents = DocumentProcessor.chunks_to_documents(chunks, self.metadata_factory(source))
+        self.stats["chunk"].chunks += len(chunks)
+        return source
+
+    async def _persist(self, item) -> None:
+        batch, embeddings = item
+        documents = [doc for source in batch for doc in source.documents]
+        on_insert = None
+        if self.checkpoint is not None:
+            on_insert = lambda cursor: self.checkpoint(cursor, batch)
+        try:
+            await run_io(DocumentRepository.batch_create, self.index_id, documents, embeddings, on_insert)
+        except Exception as e:
+            # 整批回滚，记为失败后继续处理后续批次
+            for source in batch:
+                await self._record_failure("persist", source, e)
+                source.documents = []
+            return
+        self.stats["persist"].chunks += len(documents)
+
+        for source in batch:
+            self.processed_files.append(ProcessedFileInfo(
+                filename=source.filename,
+                chunk_count=len(source.documents),
+                total_characters=source.total_characters
+            ))
+
+        if self.on_persisted is not None:
+            await self.on_persisted(batch)
+
+        # 写入后释放文本块
+        for source in batch:
+            source.documents = []
+
+    async def _record_failure(self, stage: str, source: SourceFile, error: Exception):
+        self.stats[stage].errors += 1
+        self.failed_files.append(source.relative_path)
+        logger.warning("处理文件 %s 失败（%s 阶段）", source.path, stage, exc_info=error)
+        if self.on_failure is not None:
+            await run_io(self.on_failure, source, error)
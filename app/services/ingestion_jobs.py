@@ -0,0 +1,253 @@
+import asyncio
+import logging
+import os
+import shutil
+from datetime import datetime
+from typing import Dict, List, Optional, Set
+
+import git
+
+from app.core.config import settings
+from app.core.executors import run_io
+from app.db.repositories.ingestion_job import IngestionJobRepository
+from app.models.index import ChunkingConfig, IngestionResult, StageMetrics
+from app.models.ingestion_job import (
+    FINISHED_JOB_STATUSES,
+    IngestionJob,
+    IngestionJobProgress,
+    IngestionJobStatus,
+    IngestionJobType,
+)
+from app.services.embedding import get_embedding_service
+from app.services.ingestion import IngestionPipeline, SourceFile, build_file_metadata, build_git_metadata
+
+logger = logging.getLogger(__name__)
+
+# 克隆未完成时所在的临时目录后缀
+CLONE_PARTIAL_SUFFIX = ".partial"
+
+
+class IngestionJobRunner:
+    """
+    后台入库任务执行器
+
+    - 任务在事件循环中后台执行，同时运行的任务数受 INGESTION_MAX_CONCURRENT_JOBS 限制
+    - 每批文件与其检查点在同一事务中写入，服务重启后从检查点继续，不会重复入库
+    - 通过 subscribe 订阅任务进度
+    """
+
+    # 每个订阅者最多缓存的进度事件数，超出时丢弃最旧的事件
+    SUBSCRIBER_QUEUE_SIZE = 16
+
+    def __init__(self, max_concurrent_jobs: int):
+        self.max_concurrent_jobs = max_concurrent_jobs
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._tasks: Dict[int, asyncio.Task] = {}
+        self._subscribers: Dict[int, Set[asyncio.Queue]] = {}
+        self._metrics: Dict[int, List[StageMetrics]] = {}
+        self._shutting_down = False
+
+    # ---------- 任务控制 ----------
+
+    def submit(self, job_id: int):
+        """提交任务到后台执行"""
+        if job_id in self._tasks:
+            return
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent_jobs)
+
+        task = asyncio.create_task(self._run(job_id))
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job_id, None))
+
+    async def cancel(self, job_id: int) -> bool:
+        """取消任务，返回任务是否处于可取消状态"""
+        cancelled = await run_io(IngestionJobRepository.cancel, job_id)
+        task = self._tasks.get(job_id)
+        if task is not None:
+            task.cancel()
+        elif cancelled:
+            # 尚未开始执行的任务直接清理
+            work_dir = await run_io(IngestionJobRepository.get_work_dir, job_id)
+            await run_io(self._cleanup, work_dir)
+            await self._publish(job_id)
+        return cancelled
+
+    async def resume(self):
+        """恢复服务重启前未完成的任务"""
+        self._shutting_down = False
+        for job in await run_io(IngestionJobRepository.list_unfinished):
+            self.submit(job.id)
+
+    async def shutdown(self):
+        """停止所有任务，任务状态保持不变，下次启动时恢复"""
+        self._shutting_down = True
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    # ---------- 进度订阅 ----------
+
+    def subscribe(self, job_id: int) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(self.SUBSCRIBER_QUEUE_SIZE)
+        self._subscribers.setdefault(job_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, job_id: int, queue: asyncio.Queue):
+        subscribers = self._subscribers.get(job_id)
+        if subscribers is not None:
+            subscribers.discard(queue)
+            if not subscribers:
+                self._subscribers.pop(job_id, None)
+
+    async def progress(self, job_id: int) -> Optional[IngestionJobProgress]:
+        """获取任务当前进度"""
+        job = await run_io(IngestionJobRepository.get, job_id)
+        if job is None:
+            return None
+        return IngestionJobProgress(job=job, stage_metrics=self._metrics.get(job_id, []))
+
+    async def _publish(self, job_id: int):
+        if not self._subscribers.get(job_id):
+            return
+        progress = await self.progress(job_id)
+        if progress is None:
+            return
+        for queue in list(self._subscribers.get(job_id, ())):
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(progress)
+
+    # ---------- 执行 ----------
+
+    async def _run(self, job_id: int):
+        async with self._semaphore:
+            job = await run_io(IngestionJobRepository.get, job_id)
+            if job is None or job.status in FINISHED_JOB_STATUSES:
+                return
+
+            work_dir = await run_io(IngestionJobRepository.get_work_dir, job_id)
+            if not await run_io(IngestionJobRepository.mark_running, job_id):
+                await run_io(self._cleanup, work_dir)
+                return
+            await self._publish(job_id)
+
+            try:
+                await self._execute(job, work_dir)
+                # 成功和失败的文件都已逐批记录，总数包括恢复前已处理的文件；
+                # finish 只更新运行中的任务，结束前被取消时保持取消状态
+                finished = await run_io(IngestionJobRepository.get, job_id)
+                await run_io(
+                    IngestionJobRepository.finish,
+                    job_id,
+                    IngestionJobStatus.COMPLETED,
+                    total_files=finished.processed_files + finished.failed_files
+                )
+            except asyncio.CancelledError:
+                if self._shutting_down:
+                    # 服务关闭，保留任务状态和临时文件以便恢复
+                    raise
+                await run_io(self._cleanup, work_dir)
+                await self._publish(job_id)
+                self._metrics.pop(job_id, None)
+                raise
+            except Exception as e:
+                logger.exception("入库任务 %s 失败", job_id)
+                await run_io(IngestionJobRepository.finish, job_id, IngestionJobStatus.FAILED, error=str(e))
+
+            await run_io(self._cleanup, work_dir)
+            await self._publish(job_id)
+            self._metrics.pop(job_id, None)
+
+    async def _execute(self, job: IngestionJob, work_dir: str) -> IngestionResult:
+        params = job.params
+        chunking_config = ChunkingConfig(**params["chunking_config"])
+        metadata = params.get("metadata")
+
+        def checkpoint(cursor, batch: List[SourceFile]):
+            IngestionJobRepository.checkpoint(cursor, job.id, [
+                {
+                    "path": source.relative_path,
+                    "chunk_count": len(source.documents),
+                    "total_characters": source.total_characters,
+                }
+                for source in batch
+            ])
+
+        def on_failure(source: SourceFile, error: Exception):
+            IngestionJobRepository.record_failure(job.id, source.relative_path, str(error))
+
+        def on_empty(source: SourceFile):
+            IngestionJobRepository.record_empty(job.id, source.relative_path)
+
+        async def on_persisted(batch: List[SourceFile]):
+            self._metrics[job.id] = pipeline.metrics()
+            await self._publish(job.id)
+
+        if job.job_type == IngestionJobType.GIT:
+            processed_at = datetime.now().isoformat()
+            metadata_factory = lambda source: build_git_metadata(
+                params["git_url"], params.get("branch"), metadata, source, processed_at
+            )
+        else:
+            metadata_factory = lambda source: build_file_metadata(metadata, source)
+
+        pipeline = IngestionPipeline(
+            job.index_id,
+            chunking_config,
+            get_embedding_service(),
+            metadata_factory=metadata_factory,
+            on_persisted=on_persisted,
+            checkpoint=checkpoint,
+            completed_paths=await run_io(IngestionJobRepository.completed_paths, job.id),
+            on_failure=on_failure,
+            on_empty=on_empty,
+        )
+
+        if job.job_type == IngestionJobType.GIT:
+            await run_io(self._ensure_clone, params["git_url"], params.get("branch"), work_dir)
+            return await pipeline.run_directory(work_dir, params.get("recursive", True))
+
+        sources = [
+            SourceFile(os.path.join(work_dir, f["path"]), f["path"], f["filename"])
+            for f in params["files"]
+        ]
+        return await pipeline.run(sources)
+
+    @staticmethod
+    def _ensure_clone(git_url: str, branch: Optional[str], work_dir: str):
+        """
+        克隆仓库到任务工作目录
+
+        先克隆到临时目录，完成后再改名为工作目录，因此工作目录存在即说明克隆完整，
+        恢复任务时直接复用；无法打开或没有提交的工作目录删除后重新克隆
+        """
+        if os.path.exists(work_dir):
+            try:
+                git.Repo(work_dir).head.commit
+                return
+            except Exception:
+                logger.warning("工作目录 %s 不是完整的克隆，重新克隆", work_dir)
+                shutil.rmtree(work_dir)
+
+        partial_dir = f"{work_dir}{CLONE_PARTIAL_SUFFIX}"
+        if os.path.exists(partial_dir):
+            shutil.rmtree(partial_dir)
+        git.Repo.clone_from(git_url, partial_dir, depth=1, branch=branch)
+        os.replace(partial_dir, work_dir)
+
+    @staticmethod
+    def _cleanup(work_dir: Optional[str]):
+        """删除任务的临时目录"""
+        if not work_dir:
+            return
+        for path in (work_dir, f"{work_dir}{CLONE_PARTIAL_SUFFIX}"):
+            try:
+                if os.path.exists(path):
+                    shutil.rmtree(path)
+            except Exception:
+                logger.exception("清理临时目录 %s 失败", path)
+
+
+ingestion_job_runner = IngestionJobRunner(settings.INGESTION_MAX_CONCURRENT_JOBS)
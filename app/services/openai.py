@@ -1,39 +1,82 @@
-import json
-from typing import List, Dict, Any, AsyncGenerator
-from openai import OpenAI
+from functools import lru_cache
+from typing import List, Dict, Any, AsyncGenerator, Optional
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
 from app.core.config import settings
 
 class OpenAIService:
+    """
+    OpenAI 兼容接口的异步客户端
+
+    进程内共享一个连接池，复用 keep-alive 连接；流式响应逐块异步读取，不阻塞事件循环。
+    连接池上限需大于并发的对话流数量，否则新请求会排队等待空闲连接
+    """
+
     def __init__(self):
-        self.client = OpenAI(
+        self.model = settings.OPENAI_MODEL
+        self.client = AsyncOpenAI(
             api_key=settings.OPENAI_API_KEY,
-            base_url=settings.OPENAI_API_HOST
+            base_url=settings.OPENAI_API_HOST,
+            max_retries=settings.OPENAI_MAX_RETRIES,
+            http_client=DefaultAsyncHttpxClient(
+                limits=httpx.Limits(
+                    max_connections=settings.OPENAI_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=settings.OPENAI_KEEPALIVE_EXPIRY
+                ),
+                # 流式响应中 read 超时作用于相邻两个数据块之间
+                timeout=httpx.Timeout(
+                    settings.OPENAI_READ_TIMEOUT,
+                    connect=settings.OPENAI_CONNECT_TIMEOUT,
+                    pool=settings.OPENAI_POOL_TIMEOUT
+                )
+            )
         )
-    
-    async def generate_chat_completion(
+
+    async def stream_chat_completion(
         self,
         messages: List[Dict[str, str]],
-        stream: bool = False,
         temperature: float = 0.7,
-        max_tokens: int = 4000
+        max_tokens: int = 4000,
+        model: Optional[str] = None
     ) -> AsyncGenerator[str, None]:
+        """流式生成对话补全，逐个返回新增的文本片段"""
+        response = await self.client.chat.completions.create(
+            model=model or self.model,
+            messages=messages,
+            stream=True,
+            temperature=temperature,
+            max_tokens=max_tokens
+        )
         try:
-            response = self.client.chat.completions.create(
-                model="deepseek-chat",
-                messages=messages,
-                stream=stream,
-                temperature=temperature,
-                max_tokens=max_tokens
-            )
-            
-            if stream:
-                for chunk in response:
-                    if chunk.choices[0].delta.content is not None:
-                        yield f"data: {json.dumps({'content': chunk.choices[0].delta.content})}\n\n"
-            else:
-                yield f"data: {json.dumps({'content': response.choices[0].message.content})}\n\n"
-                
-        except Exception as e:
-            if stream:
-                yield f"data: {json.dumps({'error': str(e)})}\n\n"
-            raise e 
\ No newline at end of file
+            async for chunk in response:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            # 提前结束（如客户端断开）时释放上游连接
+            await response.close()
+
+    async def create_chat_completion(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.7,
+        max_tokens: int = 4000,
+        model: Optional[str] = None
+    ) -> str:
+        """非流式生成对话补全，返回回复内容"""
+        response = await self.client.chat.completions.create(
+            model=model or self.model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens
+        )
+        return response.choices[0].message.content or ""
+
+    async def close(self):
+        """关闭连接池"""
+        await self.client.close()
+
+@lru_cache(maxsize=None)
+def get_openai_service() -> OpenAIService:
+    """获取进程内共享的 OpenAI 服务，所有请求复用同一个连接池"""
+    return OpenAIService()
@@ -0,0 +1,119 @@
+from typing import Dict, List, Optional, Tuple
+
+from app.models.conversation import ChatMessage
+from app.models.index import Document
+from app.utils.token import count_text_tokens, count_tokens_batch
+
+DEFAULT_SYSTEM_PROMPT = """你是一个有帮助的 AI 助手。请基于以下信息回答问题：
+1. 如果提供了相关文档内容，请优先使用这些信息
+2. 如果相关文档内容不足，可以使用你的通用知识
+3. 请明确标注信息来源（是来自相关文档还是通用知识）
+4. 如果信息不足，请明确说明"""
+
+CONTEXT_HEADER = "相关文档内容："
+
+# 每个文档块的编号等额外开销
+BLOCK_OVERHEAD_TOKENS = 4
+
+
+def document_source(doc: Document) -> str:
+    """文档块的来源，优先使用文件路径"""
+    metadata = doc.metadata or {}
+    return metadata.get("file_path") or metadata.get("file_name") or f"document:{doc.id}"
+
+
+def pack_context(
+    documents: List[Document],
+    token_budget: int,
+    max_chunks_per_source: int,
+    encoding: Optional[str] = None
+) -> Tuple[List[Document], str, int]:
+    """
+    按相关度顺序将文档块装入 token 预算
+
+    内容相同的块只保留一个，同一来源最多保留 max_chunks_per_source 个；
+    放不下的块跳过，继续尝试后面更短的块
+
+    Args:
+        documents: 按相关度降序的文档块
+        token_budget: 上下文的 token 上限
+        max_chunks_per_source: 每个来源最多保留的块数
+        encoding: 编码名，为空时使用默认编码
+
+    Returns:
+        (选中的文档块, 上下文文本, 上下文 token 数)，没有选中任何块时文本为空
+    """
+    candidates: List[Document] = []
+    seen_contents = set()
+    for doc in documents:
+        content = (doc.content or "").strip()
+        if not content or content in seen_contents:
+            continue
+        seen_contents.add(content)
+        candidates.append(doc)
+    if not candidates or token_budget <= 0:
+        return [], "", 0
+
+    blocks = [f"来源: {document_source(doc)}\n{doc.content.strip()}" for doc in candidates]
+    header_tokens = count_text_tokens([CONTEXT_HEADER], encoding)[0]
+    block_tokens = count_text_tokens(blocks, encoding)
+
+    selected: List[Document] = []
+    selected_blocks: List[str] = []
+    source_counts: Dict[str, int] = {}
+    used = header_tokens
+    for doc, block, tokens in zip(candidates, blocks, block_tokens):
+        source = document_source(doc)
+        if source_counts.get(source, 0) >= max_chunks_per_source:
+            continue
+        if used + tokens + BLOCK_OVERHEAD_TOKENS > token_budget:
+            continue
+        source_counts[source] = source_counts.get(source, 0) + 1
+        used += tokens + BLOCK_OVERHEAD_TOKENS
+        selected.append(doc)
+        selected_blocks.append(block)
+
+    if not selected:
+        return [], "", 0
+
+    text = CONTEXT_HEADER + "\n\n" + "\n\n".join(
+        f"[{i}] {block}" for i, block in enumerate(selected_blocks, 1)
+    )
+    return selected, text, used
+
+
+def trim_history(messages: List[ChatMessage], token_budget: int, encoding: Optional[str] = None) -> List[Dict[str, str]]:
+    """
+    从最新的消息开始保留历史，直到超出 token 预算
+
+    Returns:
+        按时间正序的消息列表
+    """
+    history = [{"role": message.role, "content": message.content} for message in messages]
+    token_counts = count_tokens_batch([[message] for message in history], encoding)
+
+    kept = 0
+    used = 0
+    for tokens in reversed(token_counts):
+        if used + tokens > token_budget:
+            break
+        used += tokens
+        kept += 1
+    return history[len(history) - kept:]
+
+
+def build_messages(
+    system_prompt: Optional[str],
+    context: str,
+    history: List[Dict[str, str]],
+    content: str
+) -> List[Dict[str, str]]:
+    """组装发送给模型的消息：系统提示词和检索上下文、历史消息、本次用户消息"""
+    system_content = system_prompt or DEFAULT_SYSTEM_PROMPT
+    if context:
+        system_content += "\n\n" + context
+    return [
+        {"role": "system", "content": system_content},
+        *history,
+        {"role": "user", "content": content},
+    ]
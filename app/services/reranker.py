@@ -0,0 +1,143 @@
+import hashlib
+from collections import OrderedDict
+from functools import lru_cache
+from threading import Lock
+from typing import List, Optional
+
+import torch
+from sentence_transformers import CrossEncoder
+
+from app.core.config import settings
+from app.core.executors import run_rerank
+from app.models.index import Document
+
+
+class RerankScoreCache:
+    """
+    进程内的 (查询, 文本块) 打分缓存
+
+    以“模型名 + 查询 + 文本内容”的哈希为键，超过容量上限时淘汰最久未使用的条目
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._lock = Lock()
+        self._scores: "OrderedDict[str, float]" = OrderedDict()
+
+    @staticmethod
+    def make_key(model_name: str, query: str, content: str) -> str:
+        return hashlib.sha256(f"{model_name}\0{query}\0{content}".encode("utf-8")).hexdigest()
+
+    def get_many(self, keys: List[str]) -> List[Optional[float]]:
+        """批量查询缓存，未命中的位置返回 None"""
+        with self._lock:
+            scores = []
+            for key in keys:
+                score = self._scores.get(key)
+                if score is not None:
+                    self._scores.move_to_end(key)
+                scores.append(score)
+            return scores
+
+    def put_many(self, keys: List[str], scores: List[float]):
+        """批量写入缓存"""
+        with self._lock:
+            for key, score in zip(keys, scores):
+                self._scores[key] = score
+                self._scores.move_to_end(key)
+            while len(self._scores) > self.max_entries:
+                self._scores.popitem(last=False)
+
+
+_score_cache = RerankScoreCache(settings.RERANKER_CACHE_SIZE)
+
+
+class RerankerService:
+    """交叉编码器重排序服务，对 (查询, 文本块) 对直接打分"""
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+        self.device = 'cuda' if torch.cuda.is_available() else 'cpu'
+        self.model = CrossEncoder(model_name, device=self.device)
+
+    def score(self, query: str, contents: List[str]) -> List[float]:
+        """
+        计算查询与各文本块的相关度分数
+
+        先查询打分缓存，未命中的文本块（去重后）在一次 predict 调用中批量打分
+
+        Args:
+            query: 查询文本
+            contents: 文本块列表
+
+        Returns:
+            与 contents 顺序一致的分数列表，分数越高越相关
+        """
+        keys = [RerankScoreCache.make_key(self.model_name, query, content) for content in contents]
+        cached = _score_cache.get_many(keys)
+
+        missing = list(dict.fromkeys(
+            (key, content) for key, content, score in zip(keys, contents, cached) if score is None
+        ))
+        computed = {}
+        if missing:
+            with torch.no_grad():
+                scores = self.model.predict(
+                    [(query, content) for _, content in missing],
+                    batch_size=settings.RERANKER_BATCH_SIZE,
+                    convert_to_numpy=True,
+                    show_progress_bar=False
+                )
+            scores = [float(score) for score in scores]
+            _score_cache.put_many([key for key, _ in missing], scores)
+            computed = {key: score for (key, _), score in zip(missing, scores)}
+
+        return [score if score is not None else computed[key] for key, score in zip(keys, cached)]
+
+
+def resolve_reranker_model(model_name: Optional[str]) -> str:
+    """校验重排序模型名称，未指定时返回默认模型"""
+    model_name = model_name or settings.RERANKER_DEFAULT_MODEL
+    if model_name not in settings.RERANKER_MODELS:
+        raise ValueError(f"不支持的重排序模型: {model_name}，可选: {', '.join(settings.RERANKER_MODELS)}")
+    return model_name
+
+
+@lru_cache(maxsize=None)
+def get_reranker(model_name: str) -> RerankerService:
+    """获取进程内共享的重排序服务，每个模型只加载一次"""
+    return RerankerService(model_name)
+
+
+def _rerank(model_name: str, query: str, contents: List[str]) -> List[float]:
+    return get_reranker(model_name).score(query, contents)
+
+
+async def rerank_documents(
+    query: str,
+    documents: List[Document],
+    top_k: int,
+    model_name: Optional[str] = None
+) -> List[Document]:
+    """
+    使用交叉编码器对候选文档重排序
+
+    模型加载和打分都在重排序线程池中执行，线程数受 RERANKER_WORKERS 限制
+
+    Args:
+        query: 查询文本
+        documents: 候选文档，需包含 content
+        top_k: 返回数量
+        model_name: 重排序模型，为空时使用默认模型
+
+    Returns:
+        按 rerank_score 降序的前 top_k 个文档
+    """
+    model_name = resolve_reranker_model(model_name)
+    if not documents:
+        return []
+
+    scores = await run_rerank(_rerank, model_name, query, [doc.content or "" for doc in documents])
+    for doc, score in zip(documents, scores):
+        doc.rerank_score = score
+    return sorted(documents, key=lambda doc: doc.rerank_score, reverse=True)[:top_k]
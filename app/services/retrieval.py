@@ -0,0 +1,174 @@
+import asyncio
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.executors import run_io, run_search
+from app.db.repositories.index import DocumentRepository
+from app.models.index import BatchRecallRequest, BatchRecallResult, Document, DocumentRecallRequest, FusionMethod, RecallMode
+from app.services.embedding import EmbeddingService
+from app.services.reranker import rerank_documents, resolve_reranker_model
+
+# (文档ID, 分数) 列表，按相关度降序
+RankedIds = List[Tuple[int, float]]
+
+
+def reciprocal_rank_fusion(rankings: List[RankedIds], weights: List[float], k: int) -> RankedIds:
+    """
+    倒数排名融合：score = Σ weight / (k + rank)
+
+    只依赖名次，不受各路分数量纲影响
+    """
+    scores: Dict[int, float] = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, (doc_id, _) in enumerate(ranking, 1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + weight / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+def weighted_score_fusion(rankings: List[RankedIds], weights: List[float]) -> RankedIds:
+    """
+    加权分数融合：各路分数先按 min-max 归一化到 [0, 1]，再按权重求和
+    """
+    scores: Dict[int, float] = {}
+    for ranking, weight in zip(rankings, weights):
+        if not ranking:
+            continue
+        values = [score for _, score in ranking]
+        low, high = min(values), max(values)
+        for doc_id, score in ranking:
+            normalized = (score - low) / (high - low) if high > low else 1.0
+            scores[doc_id] = scores.get(doc_id, 0.0) + weight * normalized
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+async def vector_search(
+    embedding_service: EmbeddingService,
+    index_id: int,
+    query: str,
+    k: int,
+    allowed_ids: Optional[List[int]] = None
+) -> RankedIds:
+    # 并发的召回请求会合并为一批计算向量
+    query_embedding = await embedding_service.aget_embedding(query)
+    return await run_search(DocumentRepository.search_vector, index_id, query_embedding, k, allowed_ids)
+
+
+async def keyword_search(index_id: int, query: str, k: int, allowed_ids: Optional[List[int]] = None) -> RankedIds:
+    return await run_io(DocumentRepository.search_keyword, index_id, query, k, allowed_ids)
+
+
+async def recall_documents(request: DocumentRecallRequest, embedding_service: EmbeddingService) -> List[Document]:
+    """
+    按请求的召回方式检索文档
+
+    混合召回时向量检索和关键词检索并发执行，各取 candidate_k 个候选后融合，
+    返回的 similarity 为融合后的分数。指定了元数据过滤条件时，先解析为文档ID集合，
+    再在检索过程中只考虑这些文档。开启重排序时先召回 rerank_depth 个候选，
+    再用交叉编码器打分后取前 top_k 个
+
+    Args:
+        request: 召回请求
+        embedding_service: 向量服务
+
+    Returns:
+        按相关度降序的文档列表
+    """
+    top_k = request.top_k or 5
+    if not request.rerank:
+        return await _recall(request, embedding_service, top_k, request.include_content)
+
+    model_name = resolve_reranker_model(request.rerank_model)
+    depth = min(request.rerank_depth or settings.RERANK_DEFAULT_DEPTH, settings.RERANK_MAX_DEPTH)
+    # 重排序需要文本内容，打分后再按请求决定是否返回
+    candidates = await _recall(request, embedding_service, max(depth, top_k), True)
+    documents = await rerank_documents(request.query, candidates, top_k, model_name)
+    if not request.include_content:
+        for doc in documents:
+            doc.content = None
+    return documents
+
+
+async def _recall(
+    request: DocumentRecallRequest,
+    embedding_service: EmbeddingService,
+    top_k: int,
+    include_content: bool
+) -> List[Document]:
+    allowed_ids = None
+    if request.filters:
+        allowed_ids = await run_io(DocumentRepository.resolve_filters, request.index_id, request.filters)
+        if not allowed_ids:
+            return []
+
+    if request.mode == RecallMode.VECTOR:
+        query_embedding = await embedding_service.aget_embedding(request.query)
+        return await run_search(
+            DocumentRepository.search_similar,
+            request.index_id,
+            query_embedding,
+            top_k,
+            allowed_ids,
+            include_content,
+            request.include_metadata
+        )
+
+    if request.mode == RecallMode.KEYWORD:
+        ranked = await keyword_search(request.index_id, request.query, top_k, allowed_ids)
+    else:
+        candidate_k = request.candidate_k or top_k * settings.HYBRID_CANDIDATE_MULTIPLIER
+        rankings = list(await asyncio.gather(
+            vector_search(embedding_service, request.index_id, request.query, candidate_k, allowed_ids),
+            keyword_search(request.index_id, request.query, candidate_k, allowed_ids),
+        ))
+        weights = [request.vector_weight, request.keyword_weight]
+        if request.fusion == FusionMethod.RRF:
+            ranked = reciprocal_rank_fusion(rankings, weights, request.rrf_k)
+        else:
+            ranked = weighted_score_fusion(rankings, weights)
+        ranked = ranked[:top_k]
+
+    return await run_io(
+        DocumentRepository.hydrate,
+        request.index_id,
+        ranked,
+        include_content,
+        request.include_metadata
+    )
+
+
+async def batch_recall(
+    index_id: int,
+    request: BatchRecallRequest,
+    embedding_service: EmbeddingService
+) -> AsyncIterator[BatchRecallResult]:
+    """
+    批量向量召回，按查询顺序逐条产出结果
+
+    查询按 BATCH_RECALL_CHUNK_SIZE 分块，每块只计算一次向量、执行一次 FAISS 检索
+    （k 取块内最大的 top_k）和一次文档查询
+
+    Args:
+        index_id: 索引ID
+        request: 批量召回请求
+        embedding_service: 向量服务
+    """
+    allowed_ids = None
+    if request.filters:
+        allowed_ids = await run_io(DocumentRepository.resolve_filters, index_id, request.filters)
+
+    chunk_size = settings.BATCH_RECALL_CHUNK_SIZE
+    for start in range(0, len(request.queries), chunk_size):
+        queries = request.queries[start:start + chunk_size]
+        top_ks = [query.top_k or request.top_k for query in queries]
+
+        query_embeddings = await embedding_service.aget_embeddings([query.query for query in queries])
+        rankings = await run_search(
+            DocumentRepository.search_vector_batch, index_id, query_embeddings, max(top_ks), allowed_ids
+        )
+        rankings = [ranked[:top_k] for ranked, top_k in zip(rankings, top_ks)]
+        documents = await run_io(
+            DocumentRepository.hydrate_batch, index_id, rankings, request.include_content, request.include_metadata
+        )
+
+        for offset, (query, docs) in enumerate(zip(queries, documents)):
+            yield BatchRecallResult(index=start + offset, query=query.query, documents=docs)
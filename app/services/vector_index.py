@@ -0,0 +1,175 @@
+from typing import Optional, Tuple
+
+import faiss
+import numpy as np
+
+from app.core.config import settings
+from app.models.index import IndexType, IndexParams
+
+# 每个 IVF 聚类中心至少需要的训练样本数（FAISS 建议值）
+MIN_POINTS_PER_CENTROID = 39
+
+
+def create_flat_index(dim: int = settings.VECTOR_DIM) -> faiss.Index:
+    """创建以文档ID为向量ID的暴力检索索引"""
+    return faiss.IndexIDMap2(faiss.IndexFlatL2(dim))
+
+
+def is_flat_index(faiss_index: faiss.Index) -> bool:
+    """是否为（ID映射的）暴力检索索引"""
+    if isinstance(faiss_index, faiss.IndexIDMap):
+        return isinstance(faiss.downcast_index(faiss_index.index), faiss.IndexFlat)
+    return isinstance(faiss_index, faiss.IndexFlat)
+
+
+def is_id_mapped(faiss_index: faiss.Index) -> bool:
+    """索引是否使用文档ID作为向量ID（旧版索引使用位置序号）"""
+    return isinstance(faiss_index, (faiss.IndexIDMap, faiss.IndexIVF))
+
+
+def effective_nlist(nlist: int, train_size: int) -> int:
+    """根据训练样本数调整聚类中心数量，避免样本不足导致训练质量下降"""
+    return max(1, min(nlist, train_size // MIN_POINTS_PER_CENTROID))
+
+
+def needs_training(index_type: IndexType) -> bool:
+    return index_type in (IndexType.IVF, IndexType.IVF_PQ)
+
+
+def build_ann_index(
+    index_type: IndexType,
+    params: IndexParams,
+    train_vectors: Optional[np.ndarray] = None,
+    dim: int = settings.VECTOR_DIM
+) -> faiss.Index:
+    """
+    创建（并训练）指定类型的空索引
+
+    Args:
+        index_type: 索引类型
+        params: 索引参数
+        train_vectors: 训练样本，IVF 类索引必须提供
+        dim: 向量维度
+
+    Returns:
+        faiss.Index: 可直接 add_with_ids 的空索引
+    """
+    if index_type == IndexType.FLAT:
+        return create_flat_index(dim)
+
+    if index_type == IndexType.HNSW:
+        faiss_index = faiss.index_factory(dim, f"IDMap2,HNSW{params.hnsw_m}", faiss.METRIC_L2)
+        hnsw_index = faiss.downcast_index(faiss_index.index)
+        hnsw_index.hnsw.efConstruction = params.ef_construction
+        hnsw_index.hnsw.efSearch = params.ef_search
+        return faiss_index
+
+    if train_vectors is None or len(train_vectors) == 0:
+        raise ValueError(f"{index_type.value} 索引需要训练样本")
+
+    nlist = effective_nlist(params.nlist, len(train_vectors))
+    if index_type == IndexType.IVF:
+        description = f"IVF{nlist},Flat"
+    elif index_type == IndexType.IVF_PQ:
+        if dim % params.pq_m != 0:
+            raise ValueError(f"PQ 子向量数量 {params.pq_m} 必须整除向量维度 {dim}")
+        description = f"IVF{nlist},PQ{params.pq_m}x{params.pq_nbits}"
+    else:
+        raise ValueError(f"不支持的索引类型: {index_type}")
+
+    faiss_index = faiss.index_factory(dim, description, faiss.METRIC_L2)
+    faiss_index.train(np.ascontiguousarray(train_vectors, dtype=np.float32))
+
+    ivf_index = faiss.extract_index_ivf(faiss_index)
+    ivf_index.nprobe = min(params.nprobe, nlist)
+    # 使用哈希表直接映射，支持按文档ID删除
+    ivf_index.set_direct_map_type(faiss.DirectMap.Hashtable)
+    return faiss_index
+
+
+def search(
+    faiss_index: faiss.Index,
+    queries: np.ndarray,
+    k: int,
+    allowed_ids: Optional[np.ndarray] = None,
+    excluded_ids: Optional[np.ndarray] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    检索最近邻，可限定只在给定的文档ID中检索，或排除给定的文档ID
+
+    过滤通过 IDSelector 在检索过程中完成，沿用索引自身的 nprobe / efSearch。
+
+    Args:
+        faiss_index: 索引
+        queries: 查询向量矩阵，形状为 (n, dim)
+        k: 每个查询返回的数量
+        allowed_ids: 允许返回的文档ID，为空表示不过滤
+        excluded_ids: 不返回的文档ID（例如 HNSW 中已删除文档的墓碑），为空表示不排除
+
+    Returns:
+        (distances, ids): 形状均为 (n, k)，不足 k 个时 ID 为 -1
+    """
+    queries = np.ascontiguousarray(queries, dtype=np.float32)
+    if allowed_ids is None and excluded_ids is None:
+        return faiss_index.search(queries, k)
+
+    # 选择器需在检索期间保持引用
+    selectors = []
+    if allowed_ids is not None:
+        allowed_ids = np.ascontiguousarray(allowed_ids, dtype=np.int64)
+        selectors.append(faiss.IDSelectorBatch(len(allowed_ids), faiss.swig_ptr(allowed_ids)))
+    if excluded_ids is not None:
+        excluded_ids = np.ascontiguousarray(excluded_ids, dtype=np.int64)
+        selectors.append(faiss.IDSelectorBatch(len(excluded_ids), faiss.swig_ptr(excluded_ids)))
+        selectors.append(faiss.IDSelectorNot(selectors[-1]))
+    if allowed_ids is not None and excluded_ids is not None:
+        selectors.append(faiss.IDSelectorAnd(selectors[0], selectors[-1]))
+    selector = selectors[-1]
+
+    ivf_index = faiss.try_extract_index_ivf(faiss_index)
+    if ivf_index is not None:
+        params = faiss.SearchParametersIVF()
+        params.nprobe = ivf_index.nprobe
+    elif isinstance(faiss_index, faiss.IndexIDMap) and isinstance(faiss.downcast_index(faiss_index.index), faiss.IndexHNSW):
+        params = faiss.SearchParametersHNSW()
+        params.efSearch = faiss.downcast_index(faiss_index.index).hnsw.efSearch
+    else:
+        params = faiss.SearchParameters()
+    # IDMap 会将选择器转换为内部序号
+    params.sel = selector
+
+    return faiss_index.search(queries, k, params=params)
+
+
+def mapped_ids(faiss_index: faiss.Index) -> Optional[np.ndarray]:
+    """ID 映射索引中的全部文档ID，其他类型返回 None"""
+    if not isinstance(faiss_index, faiss.IndexIDMap):
+        return None
+    return faiss.vector_to_array(faiss_index.id_map).astype(np.int64)
+
+
+def export_flat_vectors(faiss_index: faiss.Index):
+    """
+    导出暴力检索索引中的全部向量及其ID
+
+    Returns:
+        (ids, vectors): int64 ID 数组与 float32 向量矩阵
+    """
+    inner_index = faiss.downcast_index(faiss_index.index)
+    ids = mapped_ids(faiss_index)
+    vectors = inner_index.reconstruct_n(0, inner_index.ntotal)
+    return ids, vectors
+
+
+def remove_ids(faiss_index: faiss.Index, ids: np.ndarray) -> bool:
+    """
+    按文档ID删除向量
+
+    Returns:
+        bool: 索引类型不支持删除（如 HNSW）时返回 False，调用方需记录墓碑并在后台重建
+    """
+    try:
+        faiss_index.remove_ids(np.asarray(ids, dtype=np.int64))
+        return True
+    except RuntimeError:
+        return False
@@ -0,0 +1,136 @@
+import re
+import sqlite3
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# trigram 分词器只能匹配不少于 3 个字符的词，更短的词走 bigram 表
+MIN_TERM_LENGTH = 3
+
+# 训练对话消息的 FTS rowid 为 (对话ID << MESSAGE_INDEX_BITS) | 消息序号，单个对话的消息数不能超过上限
+MESSAGE_INDEX_BITS = 20
+MAX_CONVERSATION_MESSAGES = 1 << MESSAGE_INDEX_BITS
+
+# bigram 表，由仓储层在写入原表的同一事务中写入
+CONVERSATION_MESSAGES_BIGRAM_TABLE = "conversation_messages_bigram_fts"
+CHAT_MESSAGES_BIGRAM_TABLE = "chat_messages_bigram_fts"
+DOCUMENTS_BIGRAM_TABLE = "documents_bigram_fts"
+
+# 摘要高亮标记
+SNIPPET_OPEN = "<mark>"
+SNIPPET_CLOSE = "</mark>"
+SNIPPET_ELLIPSIS = "…"
+# 摘要长度（trigram 分词下约等于字符数）
+SNIPPET_TOKENS = 32
+
+# 不以空格分词的文字：中日韩统一表意文字、假名、谚文
+CJK_RUN = re.compile(
+    "[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af\U00020000-\U0002ffff]+"
+)
+
+def split_terms(query: str) -> List[str]:
+    """按空白拆分查询词"""
+    return query.split()
+
+def _quote(phrase: str) -> str:
+    return '"' + phrase.replace('"', '""') + '"'
+
+def bigram_text(text: Optional[str]) -> Optional[str]:
+    """
+    将文本展开为 bigram 表的索引文本
+    
+    连续的中日韩文字拆成相邻两字的 bigram，并保留每段的最后一个字，
+    使任意位置的单字都能以前缀匹配命中；其余文字交给 unicode61 按词切分。
+    bigram 表保存展开后的文本并按 rowid 删除，修改本函数只影响之后写入的行
+    """
+    if text is None:
+        return None
+    
+    def expand(match: re.Match) -> str:
+        run = match.group(0)
+        tokens = [run[i:i + 2] for i in range(len(run) - 1)]
+        tokens.append(run[-1])
+        return " " + " ".join(tokens) + " "
+    
+    return CJK_RUN.sub(expand, text)
+
+def check_message_count(message_count: int):
+    """单个对话的消息数超过 rowid 编码上限时抛出 ValueError"""
+    if message_count > MAX_CONVERSATION_MESSAGES:
+        raise ValueError(f"单个对话最多 {MAX_CONVERSATION_MESSAGES} 条消息")
+
+def message_rowid(conversation_id: int, message_index: int) -> int:
+    """训练对话消息在 FTS 表中的 rowid"""
+    return (conversation_id << MESSAGE_INDEX_BITS) | message_index
+
+def index_bigrams(cursor: sqlite3.Cursor, table: str, rows: Iterable[Tuple[int, Optional[str]]]):
+    """
+    将 (rowid, 原文) 展开为 bigram 文本写入 bigram 表
+    
+    需在写入原表的同一事务中调用；原表的删除和更新由触发器按 rowid 清理 bigram 表
+    """
+    cursor.executemany(
+        f"INSERT INTO {table} (rowid, content) VALUES (?, ?)",
+        ((rowid, bigram_text(text)) for rowid, text in rows)
+    )
+
+def index_conversation_bigrams(cursor: sqlite3.Cursor, conversations: Iterable[Tuple[int, List[Dict[str, str]]]]):
+    """将 (对话ID, 消息列表) 中的每条消息写入训练对话的 bigram 表"""
+    index_bigrams(cursor, CONVERSATION_MESSAGES_BIGRAM_TABLE, (
+        (message_rowid(conversation_id, i), message.get("content"))
+        for conversation_id, messages in conversations
+        for i, message in enumerate(messages)
+    ))
+
+def _bigram_phrase(term: str) -> str:
+    """短查询词对应的 bigram 短语，最后一个 token 按前缀匹配"""
+    
+    def expand(match: re.Match) -> str:
+        run = match.group(0)
+        tokens = [run[i:i + 2] for i in range(len(run) - 1)] if len(run) > 1 else [run]
+        return " " + " ".join(tokens) + " "
+    
+    return _quote(" ".join(CJK_RUN.sub(expand, term).split())) + "*"
+
+def build_match_queries(query: str) -> Tuple[Optional[str], Optional[str]]:
+    """
+    将用户输入转换为 FTS5 MATCH 表达式
+    
+    每个词作为短语加引号，避免用户输入被解析为 FTS5 语法；多个词之间为 AND 关系。
+    不少于 3 个字符的词匹配 trigram 表，更短的词匹配 bigram 表，两者同时存在时取交集。
+    
+    Returns:
+        (trigram 表达式, bigram 表达式)，没有对应的词时为 None
+    """
+    terms = split_terms(query)
+    long_terms = [_quote(term) for term in terms if len(term) >= MIN_TERM_LENGTH]
+    short_terms = [_bigram_phrase(term) for term in terms if len(term) < MIN_TERM_LENGTH]
+    return (
+        " ".join(long_terms) if long_terms else None,
+        " ".join(short_terms) if short_terms else None,
+    )
+
+def make_snippet(text: str, query: str, width: int = SNIPPET_TOKENS) -> str:
+    """
+    在 Python 中生成与 FTS5 snippet() 格式一致的摘要，用于只命中 bigram 表的查询
+    
+    Args:
+        text: 原文
+        query: 查询字符串
+        width: 摘要长度（字符数）
+    """
+    text = text or ""
+    terms = [term for term in split_terms(query) if term]
+    lower_text = text.lower()
+    positions = [lower_text.find(term.lower()) for term in terms]
+    positions = [pos for pos in positions if pos >= 0]
+    
+    start = max(0, min(positions) - width // 4) if positions else 0
+    end = min(len(text), start + width)
+    window = text[start:end]
+    
+    if terms:
+        pattern = re.compile("|".join(re.escape(term) for term in terms), re.IGNORECASE)
+        window = pattern.sub(lambda m: f"{SNIPPET_OPEN}{m.group(0)}{SNIPPET_CLOSE}", window)
+    
+    prefix = SNIPPET_ELLIPSIS if start > 0 else ""
+    suffix = SNIPPET_ELLIPSIS if end < len(text) else ""
+    return f"{prefix}{window}{suffix}"
@@ -0,0 +1,27 @@
+import re
+from typing import Any, Dict, Set
+
+# 模板占位符，形如 {name}；不支持属性访问和格式说明，避免执行任意表达式
+PLACEHOLDER_PATTERN = re.compile(r"\{(\w+)\}")
+
+
+def template_placeholders(template: str) -> Set[str]:
+    """获取模板中的所有占位符名称"""
+    return set(PLACEHOLDER_PATTERN.findall(template))
+
+
+def render_template(template: str, variables: Dict[str, Any]) -> str:
+    """
+    用变量替换模板中的占位符
+
+    Args:
+        template: 提示词模板
+        variables: 变量值
+
+    Returns:
+        替换后的文本
+
+    Raises:
+        KeyError: 模板中的占位符没有对应的变量
+    """
+    return PLACEHOLDER_PATTERN.sub(lambda match: str(variables[match.group(1)]), template)
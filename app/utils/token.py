@@ -1,24 +1,102 @@
 import tiktoken
-from typing import List, Dict
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+from app.core.config import settings
 
-def count_tokens(messages: List[Dict[str, str]]) -> int:
-    """计算消息列表的token数量"""
-    enc = tiktoken.encoding_for_model("gpt-3.5-turbo")
-    total_tokens = 0
+# 支持的编码，取值为 tiktoken 的编码名
+SUPPORTED_ENCODINGS: Tuple[str, ...] = ("cl100k_base", "o200k_base", "p50k_base", "r50k_base")
+
+# 每条消息的格式开销
+MESSAGE_OVERHEAD_ROLES = {"system", "user", "assistant"}
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# 文本数量少于该值时逐条编码，避免线程调度的开销
+BATCH_THRESHOLD = 64
+# 每次批量编码的文本数量，限制中间结果占用的内存
+ENCODE_CHUNK_SIZE = 10000
+
+def resolve_encoding_name(name: Optional[str] = None) -> str:
+    """
+    解析编码名，同时接受模型名（如 gpt-4o）
     
-    for message in messages:
-        # 计算消息内容的 tokens
-        total_tokens += len(enc.encode(message["content"]))
+    Args:
+        name: 编码名或模型名，为空时使用默认编码
         
-        # 计算角色名称的 tokens
-        total_tokens += len(enc.encode(message["role"]))
+    Returns:
+        tiktoken 编码名，不支持时抛出 ValueError
+    """
+    name = name or settings.TOKENIZER_ENCODING
+    if name in SUPPORTED_ENCODINGS:
+        return name
+    try:
+        encoding_name = tiktoken.encoding_name_for_model(name)
+    except KeyError:
+        raise ValueError(f"不支持的编码: {name}，可选值: {', '.join(SUPPORTED_ENCODINGS)}")
+    if encoding_name not in SUPPORTED_ENCODINGS:
+        raise ValueError(f"不支持的编码: {name}，可选值: {', '.join(SUPPORTED_ENCODINGS)}")
+    return encoding_name
+
+@lru_cache(maxsize=None)
+def _load_encoding(encoding_name: str) -> tiktoken.Encoding:
+    return tiktoken.get_encoding(encoding_name)
+
+def get_encoding(name: Optional[str] = None) -> tiktoken.Encoding:
+    """获取编码器，每种编码只加载一次"""
+    return _load_encoding(resolve_encoding_name(name))
+
+def count_text_tokens(texts: List[str], encoding: Optional[str] = None) -> List[int]:
+    """
+    批量计算文本的 token 数
+    
+    文本较多时使用 encode_ordinary_batch 多线程编码，并分块处理以限制内存
+    """
+    enc = get_encoding(encoding)
+    if len(texts) < BATCH_THRESHOLD:
+        return [len(enc.encode_ordinary(text)) for text in texts]
+    
+    counts = []
+    for start in range(0, len(texts), ENCODE_CHUNK_SIZE):
+        tokens = enc.encode_ordinary_batch(
+            texts[start:start + ENCODE_CHUNK_SIZE],
+            num_threads=settings.TOKENIZER_THREADS
+        )
+        counts.extend(len(t) for t in tokens)
+    return counts
+
+def count_tokens_batch(conversations: List[List[Dict[str, str]]], encoding: Optional[str] = None) -> List[int]:
+    """
+    批量计算多个消息列表的 token 数
+    
+    所有消息内容合并为一批编码；角色名只有少数几种，单独缓存计数
+    
+    Args:
+        conversations: 消息列表的列表，每条消息包含 role 和 content
+        encoding: 编码名或模型名，为空时使用默认编码
         
-        # 添加一些系统消息的 tokens
-        if message["role"] == "system":
-            total_tokens += 4
-        elif message["role"] == "user":
-            total_tokens += 4
-        elif message["role"] == "assistant":
-            total_tokens += 4
+    Returns:
+        与 conversations 一一对应的 token 数
+    """
+    content_counts = iter(count_text_tokens(
+        [message["content"] for messages in conversations for message in messages],
+        encoding
+    ))
     
-    return total_tokens 
\ No newline at end of file
+    enc = get_encoding(encoding)
+    role_counts: Dict[str, int] = {}
+    
+    totals = []
+    for messages in conversations:
+        total_tokens = 0
+        for message in messages:
+            role = message["role"]
+            if role not in role_counts:
+                role_counts[role] = len(enc.encode_ordinary(role))
+                if role in MESSAGE_OVERHEAD_ROLES:
+                    role_counts[role] += MESSAGE_OVERHEAD_TOKENS
+            total_tokens += next(content_counts) + role_counts[role]
+        totals.append(total_tokens)
+    return totals
+
+def count_tokens(messages: List[Dict[str, str]], encoding: Optional[str] = None) -> int:
+    """计算消息列表的token数量"""
+    return count_tokens_batch([messages], encoding)[0]
@@ -0,0 +1,205 @@
+"""
+流式接口压测脚本
+
+以 N 个并发客户端反复请求 SSE 流式接口，统计首 token 时间（TTFT）、整体耗时和吞吐。
+可同时以固定间隔请求一个轻量接口（--probe-url），其延迟明显升高说明事件循环被阻塞。
+
+用法:
+    # 直接压测桩服务
+    python scripts/load_test.py --url http://127.0.0.1:9000/v1/chat/completions -c 50 -n 500
+
+    # 压测后端的流式接口，并探测事件循环
+    python scripts/load_test.py --url http://127.0.0.1:8000/api/v1/chat-conversations/1/complete \\
+        --body '{"content": "你好", "index_id": 1}' -c 50 -n 500 \\
+        --probe-url http://127.0.0.1:8000/api/v1/indices
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+DEFAULT_BODY = {
+    "model": "stub",
+    "messages": [{"role": "user", "content": "你好"}],
+    "stream": True,
+    "max_tokens": 200,
+}
+
+
+class RequestResult:
+    def __init__(self):
+        self.ttft: Optional[float] = None
+        self.duration: float = 0.0
+        self.chunks = 0
+        self.error: Optional[str] = None
+
+
+def percentile(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(p / 100 * len(values)) - 1))
+    return values[index]
+
+
+def parse_event(data: str) -> Optional[Dict[str, Any]]:
+    try:
+        payload = json.loads(data)
+    except ValueError:
+        return None
+    return payload if isinstance(payload, dict) else None
+
+
+def has_content(payload: Dict[str, Any]) -> bool:
+    """判断 SSE 数据块是否包含生成内容，兼容 OpenAI 格式和后端的 {"content": ...} 格式"""
+    if payload.get("content"):
+        return True
+    for choice in payload.get("choices") or []:
+        if (choice.get("delta") or {}).get("content"):
+            return True
+    return False
+
+
+async def run_request(client: httpx.AsyncClient, url: str, body: Dict[str, Any]) -> RequestResult:
+    result = RequestResult()
+    started = time.perf_counter()
+    try:
+        async with client.stream("POST", url, json=body) as response:
+            if response.status_code >= 400:
+                await response.aread()
+                result.error = f"HTTP {response.status_code}"
+                return result
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                payload = parse_event(data)
+                if payload is None:
+                    continue
+                if payload.get("error"):
+                    result.error = json.dumps(payload["error"], ensure_ascii=False)
+                    break
+                if has_content(payload):
+                    if result.ttft is None:
+                        result.ttft = time.perf_counter() - started
+                    result.chunks += 1
+    except httpx.HTTPError as e:
+        result.error = f"{type(e).__name__}: {e}"
+    finally:
+        result.duration = time.perf_counter() - started
+    return result
+
+
+async def run_clients(args: argparse.Namespace, body: Dict[str, Any]) -> List[RequestResult]:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    timeout = httpx.Timeout(args.timeout)
+    remaining = iter(range(args.requests))
+    results: List[RequestResult] = []
+
+    async with httpx.AsyncClient(limits=limits, timeout=timeout) as client:
+        async def client_loop():
+            for _ in remaining:
+                results.append(await run_request(client, args.url, body))
+
+        await asyncio.gather(*[client_loop() for _ in range(args.concurrency)])
+    return results
+
+
+async def run_probe(url: str, interval: float, stop: asyncio.Event) -> List[float]:
+    """按固定间隔请求轻量接口，返回每次的延迟"""
+    latencies: List[float] = []
+    async with httpx.AsyncClient(timeout=30) as client:
+        while not stop.is_set():
+            started = time.perf_counter()
+            try:
+                await client.get(url)
+                latencies.append(time.perf_counter() - started)
+            except httpx.HTTPError:
+                pass
+            try:
+                await asyncio.wait_for(stop.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+    return latencies
+
+
+def format_ms(seconds: float) -> str:
+    return f"{seconds * 1000:.1f}ms"
+
+
+def report(results: List[RequestResult], elapsed: float, probe_latencies: Optional[List[float]], concurrency: int):
+    succeeded = [r for r in results if r.error is None]
+    failed = [r for r in results if r.error is not None]
+    ttfts = [r.ttft for r in succeeded if r.ttft is not None]
+    durations = [r.duration for r in succeeded]
+    chunks = sum(r.chunks for r in succeeded)
+
+    print(f"并发数:       {concurrency}")
+    print(f"请求数:       {len(results)}（成功 {len(succeeded)}，失败 {len(failed)}）")
+    print(f"总耗时:       {elapsed:.2f}s")
+    print(f"吞吐:         {len(succeeded) / elapsed:.2f} 请求/s，{chunks / elapsed:.1f} 数据块/s")
+    if ttfts:
+        print(
+            f"TTFT:         均值 {format_ms(statistics.mean(ttfts))}  p50 {format_ms(percentile(ttfts, 50))}  "
+            f"p95 {format_ms(percentile(ttfts, 95))}  p99 {format_ms(percentile(ttfts, 99))}  "
+            f"最大 {format_ms(max(ttfts))}"
+        )
+    if durations:
+        print(
+            f"请求耗时:     p50 {format_ms(percentile(durations, 50))}  "
+            f"p95 {format_ms(percentile(durations, 95))}  p99 {format_ms(percentile(durations, 99))}"
+        )
+    if probe_latencies:
+        print(
+            f"探测延迟:     p50 {format_ms(percentile(probe_latencies, 50))}  "
+            f"p99 {format_ms(percentile(probe_latencies, 99))}  最大 {format_ms(max(probe_latencies))}"
+            f"（{len(probe_latencies)} 次）"
+        )
+    if failed:
+        errors: Dict[str, int] = {}
+        for r in failed:
+            errors[r.error[:100]] = errors.get(r.error[:100], 0) + 1
+        print("错误:")
+        for error, count in sorted(errors.items(), key=lambda item: item[1], reverse=True)[:10]:
+            print(f"  {count:>6}  {error}")
+
+
+async def main_async(args: argparse.Namespace):
+    body = json.loads(args.body) if args.body else DEFAULT_BODY
+
+    stop = asyncio.Event()
+    probe_task = asyncio.create_task(run_probe(args.probe_url, args.probe_interval, stop)) if args.probe_url else None
+
+    started = time.perf_counter()
+    results = await run_clients(args, body)
+    elapsed = time.perf_counter() - started
+
+    probe_latencies = None
+    if probe_task is not None:
+        stop.set()
+        probe_latencies = await probe_task
+
+    report(results, elapsed, probe_latencies, args.concurrency)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="流式接口压测")
+    parser.add_argument("--url", required=True, help="流式接口地址")
+    parser.add_argument("--body", default=None, help="请求体 JSON，默认为 chat completions 流式请求")
+    parser.add_argument("-c", "--concurrency", type=int, default=10, help="并发客户端数")
+    parser.add_argument("-n", "--requests", type=int, default=100, help="总请求数")
+    parser.add_argument("--timeout", type=float, default=120, help="单个请求超时（秒）")
+    parser.add_argument("--probe-url", default=None, help="压测期间定时请求的轻量接口，用于发现事件循环阻塞")
+    parser.add_argument("--probe-interval", type=float, default=0.1, help="探测间隔（秒）")
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+本地 OpenAI 兼容接口桩服务
+
+实现 chat completions 接口（流式与非流式），用于在不依赖远程 API 的情况下
+压测 OpenAIService、对话接口和生成任务。token 速率、首 token 延迟分布和错误率均可配置。
+
+用法:
+    python scripts/openai_stub.py --port 9000 --tokens-per-second 50 --latency-ms 300 --error-rate 0.01
+
+    # 后端指向桩服务
+    OPENAI_API_HOST=http://127.0.0.1:9000/v1 OPENAI_API_KEY=stub python main.py
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import time
+import uuid
+from typing import Any, Dict, List
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# 生成内容使用的词表，每个词计为一个 token
+WORDS = [
+    "数据", "标注", "对话", "模型", "训练", "样本", "质量", "检索", "向量", "索引",
+    "the", "quick", "brown", "fox", "jumps", "over", "lazy", "dog",
+]
+
+
+class StubConfig:
+    def __init__(self, args: argparse.Namespace):
+        self.tokens_per_second = args.tokens_per_second
+        self.completion_tokens = args.completion_tokens
+        self.latency_ms = args.latency_ms
+        self.latency_sigma = args.latency_sigma
+        self.error_rate = args.error_rate
+        self.error_status = args.error_status
+
+    def sample_latency(self) -> float:
+        """首 token 延迟（秒），服从中位数为 latency_ms 的对数正态分布，sigma 为 0 时为固定值"""
+        if self.latency_sigma <= 0:
+            return self.latency_ms / 1000
+        return random.lognormvariate(0, self.latency_sigma) * self.latency_ms / 1000
+
+
+def create_app(config: StubConfig) -> FastAPI:
+    app = FastAPI(title="OpenAI Stub")
+    stats = {"requests": 0, "errors": 0, "active_streams": 0}
+
+    def completion_tokens(body: Dict[str, Any]) -> List[str]:
+        count = min(config.completion_tokens, body.get("max_tokens") or config.completion_tokens)
+        words = itertools.cycle(WORDS)
+        return [next(words) + " " for _ in range(count)]
+
+    def prompt_tokens(body: Dict[str, Any]) -> int:
+        return sum(len(str(message.get("content", ""))) for message in body.get("messages", [])) // 2
+
+    def error_response() -> JSONResponse:
+        stats["errors"] += 1
+        return JSONResponse(
+            status_code=config.error_status,
+            content={"error": {"message": "stub injected error", "type": "server_error", "code": None}}
+        )
+
+    async def chat_completions(request: Request):
+        body = await request.json()
+        stats["requests"] += 1
+        if random.random() < config.error_rate:
+            return error_response()
+
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+        model = body.get("model", "stub")
+        tokens = completion_tokens(body)
+        usage = {
+            "prompt_tokens": prompt_tokens(body),
+            "completion_tokens": len(tokens),
+            "total_tokens": prompt_tokens(body) + len(tokens),
+        }
+        interval = 1 / config.tokens_per_second if config.tokens_per_second > 0 else 0
+
+        if not body.get("stream"):
+            await asyncio.sleep(config.sample_latency() + interval * len(tokens))
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "".join(tokens)},
+                    "finish_reason": "stop",
+                }],
+                "usage": usage,
+            }
+
+        def chunk(delta: Dict[str, Any], finish_reason=None) -> str:
+            data = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            return f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+        async def stream():
+            stats["active_streams"] += 1
+            try:
+                await asyncio.sleep(config.sample_latency())
+                yield chunk({"role": "assistant", "content": ""})
+                # 按累计时间而不是逐个 sleep 固定间隔发送，避免调度误差累积
+                started = time.monotonic()
+                for i, token in enumerate(tokens):
+                    delay = started + i * interval - time.monotonic()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                    yield chunk({"content": token})
+                yield chunk({}, "stop")
+                yield "data: [DONE]\n\n"
+            finally:
+                stats["active_streams"] -= 1
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    # 兼容 base_url 带或不带 /v1 的写法
+    app.post("/v1/chat/completions")(chat_completions)
+    app.post("/chat/completions")(chat_completions)
+
+    @app.get("/stats")
+    async def get_stats():
+        return stats
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地 OpenAI 兼容接口桩服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--tokens-per-second", type=float, default=50, help="流式输出速率，0 表示不限速")
+    parser.add_argument("--completion-tokens", type=int, default=200, help="每次回复的 token 数，不超过请求的 max_tokens")
+    parser.add_argument("--latency-ms", type=float, default=300, help="首 token 延迟中位数（毫秒）")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="首 token 延迟对数正态分布的 sigma，0 表示固定延迟")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="请求失败的概率")
+    parser.add_argument("--error-status", type=int, default=500, help="注入错误的 HTTP 状态码，如 429、500")
+    parser.add_argument("--seed", type=int, default=None, help="随机种子")
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+    uvicorn.run(create_app(StubConfig(args)), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
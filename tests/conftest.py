@@ -0,0 +1,57 @@
+import os
+import tempfile
+from queue import Queue
+
+import pytest
+
+# 在导入 app 之前指定数据库位置，向量索引目录随之落在临时目录中
+os.environ.setdefault("DB_FILE", os.path.join(tempfile.mkdtemp(prefix="data-label-test-"), "conversations.db"))
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+from app.core.config import settings  # noqa: E402
+from app.db import session  # noqa: E402
+from app.db.migrations import init_db  # noqa: E402
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """每个用例使用独立的空数据库"""
+    monkeypatch.setattr(settings, "DB_FILE", str(tmp_path / "conversations.db"))
+    monkeypatch.setattr(session, "connection_pool", Queue(maxsize=settings.MAX_CONNECTIONS))
+    init_db()
+    yield settings.DB_FILE
+    while not session.connection_pool.empty():
+        session.connection_pool.get().close()
+
+
+@pytest.fixture
+def vector_store(db, tmp_path, monkeypatch):
+    """索引文件写入用例的临时目录，并清空进程级索引缓存"""
+    from app.db.repositories import index as index_repository
+
+    monkeypatch.setattr(index_repository, "INDICES_DIR", str(tmp_path))
+    monkeypatch.setattr(index_repository, "_tombstones", {})
+    manager = index_repository.index_manager
+    for index_id in list(manager._cache):
+        manager.drop(index_id)
+    yield manager
+    for index_id in list(manager._cache):
+        manager.drop(index_id)
+
+
+class _CharEncoding:
+    """每个字符计为一个 token，测试环境无法下载 tiktoken 的编码文件"""
+
+    def encode_ordinary(self, text):
+        return list(text)
+
+    def encode_ordinary_batch(self, texts, num_threads=1):
+        return [list(text) for text in texts]
+
+
+@pytest.fixture
+def char_tokenizer(monkeypatch):
+    """用按字符计数的编码代替 tiktoken"""
+    from app.utils import token
+
+    monkeypatch.setattr(token, "_load_encoding", lambda encoding_name: _CharEncoding())
@@ -0,0 +1,79 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("sentence_transformers")
+
+from app.core.config import settings
+from app.db.repositories.index import DocumentRepository, IndexRepository
+from app.models.index import BatchRecallRequest, DocumentCreate, IndexCreate
+from app.services.retrieval import batch_recall
+
+
+class _FakeEmbeddingService:
+    """查询文本为单位向量所在的维度"""
+
+    def __init__(self):
+        self.calls = []
+
+    async def aget_embeddings(self, texts):
+        self.calls.append(list(texts))
+        return np.eye(settings.VECTOR_DIM, dtype=np.float32)[[int(text) for text in texts]]
+
+
+@pytest.fixture
+def index_id(vector_store):
+    index = IndexRepository.create(IndexCreate(name="eval"))
+    DocumentRepository.batch_create(
+        index.id, [DocumentCreate(content=f"doc {i}") for i in range(4)], np.eye(4, settings.VECTOR_DIM, dtype=np.float32)
+    )
+    return index.id
+
+
+def _run(index_id, request, service):
+    async def run():
+        return [result async for result in batch_recall(index_id, request, service)]
+
+    return asyncio.run(run())
+
+
+def test_results_keep_query_order_and_per_query_top_k(index_id, monkeypatch):
+    monkeypatch.setattr(settings, "BATCH_RECALL_CHUNK_SIZE", 2)
+    searches = []
+    original_search = DocumentRepository.search_vector_batch
+
+    def record_search(index_id, query_embeddings, k, allowed_ids=None):
+        searches.append((len(query_embeddings), k))
+        return original_search(index_id, query_embeddings, k, allowed_ids)
+
+    monkeypatch.setattr(DocumentRepository, "search_vector_batch", staticmethod(record_search))
+    service = _FakeEmbeddingService()
+    request = BatchRecallRequest(
+        queries=[{"query": "2"}, {"query": "0", "top_k": 3}, {"query": "3", "top_k": 1}],
+        top_k=2,
+        include_metadata=False
+    )
+
+    results = _run(index_id, request, service)
+
+    # 每块只计算一次向量、执行一次检索，k 取块内最大的 top_k
+    assert service.calls == [["2", "0"], ["3"]]
+    assert searches == [(2, 3), (1, 1)]
+    assert [result.index for result in results] == [0, 1, 2]
+    assert [len(result.documents) for result in results] == [2, 3, 1]
+    assert [result.documents[0].content for result in results] == ["doc 2", "doc 0", "doc 3"]
+
+
+def test_filters_apply_to_every_query(index_id):
+    with_metadata = DocumentRepository.batch_create(
+        index_id, [DocumentCreate(content="tagged", metadata={"tag": "x"})], np.eye(1, settings.VECTOR_DIM, k=5, dtype=np.float32)
+    )
+    request = BatchRecallRequest(
+        queries=[{"query": "0"}, {"query": "1"}],
+        filters=[{"key": "tag", "value": "x"}]
+    )
+
+    results = _run(index_id, request, _FakeEmbeddingService())
+    assert [[doc.id for doc in result.documents] for result in results] == [with_metadata, with_metadata]
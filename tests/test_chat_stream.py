@@ -0,0 +1,128 @@
+import asyncio
+import json
+
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("sentence_transformers")
+
+from app.api.v1.endpoints import chat_conversations
+from app.core.metrics import CHAT_STREAMS_ABANDONED
+from app.db.repositories.conversation import ChatConversationRepository, ChatMessageRepository
+from app.schemas.request.chat import ChatCompletionRequest
+
+
+class _FakeOpenAIService:
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.stall_after = None
+        self.stalled = False
+        self.closed = False
+
+    async def stream_chat_completion(self, messages, **kwargs):
+        try:
+            for i, chunk in enumerate(self.chunks):
+                if i == self.stall_after:
+                    # 模拟上游长时间没有输出
+                    self.stalled = True
+                    await asyncio.Event().wait()
+                await asyncio.sleep(0)
+                yield chunk
+        finally:
+            self.closed = True
+
+
+class _FakeRequest:
+    """上游停滞后报告客户端已断开"""
+
+    def __init__(self, service, disconnect):
+        self.service = service
+        self.disconnect = disconnect
+
+    async def is_disconnected(self):
+        return self.disconnect and self.service.stalled
+
+
+@pytest.fixture
+def chat(db, monkeypatch):
+    # 不检索也不计算 token，避免加载模型和分词文件
+    monkeypatch.setattr(chat_conversations, "pack_context", lambda documents, budget, per_source: ([], "", 0))
+    monkeypatch.setattr(chat_conversations, "trim_history", lambda history, budget: [])
+    monkeypatch.setattr(chat_conversations, "DISCONNECT_CHECK_INTERVAL", 0)
+    service = _FakeOpenAIService(["你", "好", "呀"])
+    monkeypatch.setattr(chat_conversations, "openai_service", service)
+    conversation = ChatConversationRepository.create("测试")
+    return conversation.id, service
+
+
+async def _start(conversation_id, service, disconnect=False):
+    response = await chat_conversations.complete_chat(
+        conversation_id, ChatCompletionRequest(content="问题"), _FakeRequest(service, disconnect)
+    )
+    return response.body_iterator
+
+
+def _events(chunks):
+    return [json.loads(chunk[len("data: "):]) for chunk in chunks]
+
+
+def _assistant_messages(conversation_id):
+    return [m.content for m in ChatMessageRepository.list(conversation_id) if m.role == "assistant"]
+
+
+def test_completed_stream_saves_reply(chat):
+    conversation_id, service = chat
+
+    async def run():
+        return [chunk async for chunk in await _start(conversation_id, service)]
+
+    events = _events(asyncio.run(run()))
+    assert [e.get("content") for e in events[1:-1]] == ["你", "好", "呀"]
+    assert events[-1]["done"] is True
+    assert _assistant_messages(conversation_id) == ["你好呀"]
+    assert service.closed
+
+
+def test_disconnect_saves_partial_reply(chat):
+    conversation_id, service = chat
+    service.stall_after = 2
+    abandoned = CHAT_STREAMS_ABANDONED.value
+
+    async def run():
+        return [chunk async for chunk in await _start(conversation_id, service, disconnect=True)]
+
+    events = _events(asyncio.run(asyncio.wait_for(run(), 5)))
+    assert [e.get("content") for e in events[1:]] == ["你", "好"]
+    assert _assistant_messages(conversation_id) == ["你好"]
+    assert service.closed
+    assert CHAT_STREAMS_ABANDONED.value == abandoned + 1
+
+
+def test_disconnect_cancels_stalled_upstream_before_first_chunk(chat):
+    conversation_id, service = chat
+    service.stall_after = 0
+    abandoned = CHAT_STREAMS_ABANDONED.value
+
+    async def run():
+        return [chunk async for chunk in await _start(conversation_id, service, disconnect=True)]
+
+    events = _events(asyncio.run(asyncio.wait_for(run(), 5)))
+    assert len(events) == 1 and "sources" in events[0]
+    assert _assistant_messages(conversation_id) == []
+    assert service.closed
+    assert CHAT_STREAMS_ABANDONED.value == abandoned + 1
+
+
+def test_closed_generator_saves_partial_reply(chat):
+    conversation_id, service = chat
+
+    async def run():
+        body = await _start(conversation_id, service)
+        await body.__anext__()
+        await body.__anext__()
+        # 框架在连接断开时关闭生成器
+        await body.aclose()
+
+    asyncio.run(run())
+    assert _assistant_messages(conversation_id) == ["你"]
+    assert service.closed
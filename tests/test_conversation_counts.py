@@ -0,0 +1,51 @@
+from app.db.migrations import backfill_conversation_counts
+from app.db.repositories.conversation import ConversationRepository
+from app.db.session import get_db_connection, get_db_cursor
+from app.models.conversation import ConversationView, Message
+from app.utils import token
+
+
+def _messages():
+    # 按字符计数：内容 5 + 2，角色 user 4+4、assistant 9+4
+    return [Message(role="user", content="hello"), Message(role="assistant", content="hi")]
+
+
+def _stored_counts(conversation_id):
+    with get_db_cursor() as cursor:
+        cursor.execute("SELECT token_count, message_count FROM conversations WHERE id = ?", (conversation_id,))
+        return tuple(cursor.fetchone())
+
+
+def test_counts_are_stored_on_write(db, char_tokenizer):
+    conversation = ConversationRepository.create(_messages())
+    assert (conversation.token_count, conversation.message_count) == (28, 2)
+    assert _stored_counts(conversation.id) == (28, 2)
+
+    copied = ConversationRepository.copy(conversation.id)
+    assert _stored_counts(copied.id) == (28, 2)
+
+
+def test_reads_do_not_tokenize(db, char_tokenizer, monkeypatch):
+    conversation = ConversationRepository.create(_messages())
+
+    def fail(encoding_name):
+        raise AssertionError("读取时不应计算 token")
+
+    monkeypatch.setattr(token, "_load_encoding", fail)
+    assert ConversationRepository.get(conversation.id).token_count == 28
+    assert [c.token_count for c in ConversationRepository.list()] == [28]
+    page = ConversationRepository.list_page(10, view=ConversationView.SUMMARY)
+    assert [item.token_count for item in page.items] == [28]
+
+
+def test_backfill_fills_missing_counts(db, char_tokenizer):
+    first = ConversationRepository.create(_messages())
+    second = ConversationRepository.create(_messages()[:1])
+    with get_db_cursor() as cursor:
+        cursor.execute("UPDATE conversations SET token_count = NULL, message_count = NULL")
+
+    with get_db_connection() as conn:
+        backfill_conversation_counts(conn, batch_size=1)
+
+    assert _stored_counts(first.id) == (28, 2)
+    assert _stored_counts(second.id) == (13, 1)
@@ -0,0 +1,74 @@
+import gzip
+import json
+from datetime import datetime
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.v1.endpoints import conversations
+from app.core.config import settings
+from app.db.repositories.conversation import ConversationRepository
+from app.db.session import get_db_cursor
+
+
+def _add_conversation(title, created_at, token_count):
+    # 直接写库，避免计算 token 数时下载分词文件
+    with get_db_cursor() as cursor:
+        cursor.execute(
+            "INSERT INTO conversations (title, messages, token_count, message_count, created_at, updated_at) "
+            "VALUES (?, ?, ?, 1, ?, ?)",
+            (title, json.dumps([{"role": "user", "content": title}], ensure_ascii=False), token_count, created_at, created_at)
+        )
+        return cursor.lastrowid
+
+
+@pytest.fixture
+def dataset(db):
+    return [
+        _add_conversation(f"对话 {i}", f"2024-01-0{i + 1}T00:00:00", token_count=10 * (i + 1))
+        for i in range(5)
+    ]
+
+
+@pytest.fixture
+def client(dataset):
+    app = FastAPI()
+    app.include_router(conversations.router, prefix=settings.API_V1_STR)
+    return TestClient(app)
+
+
+def _ids(**filters):
+    return [row[0] for row in ConversationRepository.iter_export_rows(batch_size=2, **filters)]
+
+
+def test_export_reads_every_batch_in_id_order(dataset):
+    assert _ids() == dataset
+
+
+def test_export_filters(dataset):
+    assert _ids(start_id=dataset[1], end_id=dataset[3]) == dataset[1:4]
+    assert _ids(start_date=datetime(2024, 1, 2), end_date=datetime(2024, 1, 4)) == dataset[1:4]
+    assert _ids(max_tokens=20) == dataset[:2]
+    assert _ids(start_id=dataset[1], max_tokens=40) == dataset[1:4]
+
+
+def test_export_endpoint_writes_jsonl(client, dataset):
+    response = client.get(f"{settings.API_V1_STR}/conversations/export", params={"end_id": dataset[1]})
+
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert lines == [
+        {"title": "对话 0", "messages": [{"role": "user", "content": "对话 0"}]},
+        {"title": "对话 1", "messages": [{"role": "user", "content": "对话 1"}]},
+    ]
+
+
+def test_export_endpoint_gzip_in_small_chunks(client, dataset, monkeypatch):
+    monkeypatch.setattr(conversations, "EXPORT_CHUNK_BYTES", 1)
+
+    response = client.get(f"{settings.API_V1_STR}/conversations/export", params={"gzip": True})
+
+    assert response.headers["content-disposition"].endswith('.jsonl.gz"')
+    lines = gzip.decompress(response.content).decode("utf-8").splitlines()
+    assert [json.loads(line)["title"] for line in lines] == [f"对话 {i}" for i in range(5)]
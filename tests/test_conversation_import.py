@@ -0,0 +1,87 @@
+import gzip
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.v1.endpoints import conversations
+from app.core.config import settings
+from app.core.exceptions import APIException, api_exception_handler
+from app.db.session import get_db_cursor
+
+
+@pytest.fixture
+def client(db, monkeypatch):
+    # 分词文件需要联网下载，导入测试只关心行的解析与写入
+    monkeypatch.setattr(
+        "app.db.repositories.conversation.count_tokens_batch",
+        lambda messages_list, encoding=None: [0] * len(messages_list)
+    )
+    app = FastAPI()
+    app.add_exception_handler(APIException, api_exception_handler)
+    app.include_router(conversations.router, prefix=settings.API_V1_STR)
+    return TestClient(app)
+
+
+def _lines(count):
+    return [
+        {"title": f"对话 {i}", "messages": [{"role": "user", "content": f"问题 {i}"}, {"role": "assistant", "content": "回答" * i}]}
+        for i in range(count)
+    ]
+
+
+def _stored():
+    with get_db_cursor() as cursor:
+        cursor.execute("SELECT title, messages FROM conversations ORDER BY id")
+        return [{"title": row[0], "messages": json.loads(row[1])} for row in cursor.fetchall()]
+
+
+def test_gzip_export_import_round_trip(client):
+    records = _lines(50)
+    rows = [(i, r["title"], json.dumps(r["messages"], ensure_ascii=False)) for i, r in enumerate(records)]
+    exported = b"".join(conversations._export_chunks(iter(rows), compress=True))
+
+    response = client.post(
+        "/api/v1/conversations/import",
+        files={"file": ("export.jsonl.gz", exported, "application/gzip")}
+    )
+    assert response.status_code == 200
+    result = response.json()["data"]
+    assert result["imported"] == 50 and result["failed"] == 0
+    assert _stored() == records
+
+
+def test_gzip_body_with_invalid_lines(client):
+    body = "\n".join([json.dumps(r, ensure_ascii=False) for r in _lines(3)] + ["not json", "[]", ""])
+    response = client.post(
+        "/api/v1/conversations/import",
+        content=gzip.compress(body.encode("utf-8")),
+        headers={"content-type": "application/x-ndjson", "content-encoding": "gzip"}
+    )
+    result = response.json()["data"]
+    assert (result["total_lines"], result["imported"], result["failed"]) == (5, 3, 2)
+    assert [error["line"] for error in result["errors"]] == [4, 5]
+
+
+def test_overlong_line_is_rejected(client, monkeypatch):
+    monkeypatch.setattr(settings, "IMPORT_MAX_LINE_BYTES", 1024)
+    line = json.dumps([{"role": "user", "content": "x" * 4096}])
+    body = gzip.compress((json.dumps(_lines(1)[0]) + "\n" + line + "\n").encode("utf-8"))
+    response = client.post(
+        "/api/v1/conversations/import",
+        content=body,
+        headers={"content-type": "application/x-ndjson", "content-encoding": "gzip"}
+    )
+    assert response.status_code == 400
+    assert "第 2 行" in response.json()["message"]
+
+
+def test_decompression_output_is_bounded():
+    import zlib
+
+    bomb = gzip.compress(b"\n" * (8 * conversations.IMPORT_READ_BYTES))
+    decompressor = zlib.decompressobj(wbits=47)
+    pieces = list(conversations._decompress_bounded(decompressor, bomb))
+    assert all(len(piece) <= conversations.IMPORT_READ_BYTES for piece in pieces)
+    assert sum(len(piece) for piece in pieces) + len(decompressor.flush()) == 8 * conversations.IMPORT_READ_BYTES
@@ -0,0 +1,79 @@
+import base64
+import json
+
+import pytest
+
+from app.db.repositories.conversation import ConversationRepository, decode_cursor, encode_cursor
+from app.db.session import get_db_cursor
+from app.models.conversation import Conversation, ConversationSummary, ConversationView
+
+
+def _add_conversation(title, updated_at):
+    # 直接写库，避免计算 token 数时下载分词文件
+    with get_db_cursor() as cursor:
+        cursor.execute(
+            "INSERT INTO conversations (title, messages, token_count, message_count, created_at, updated_at) "
+            "VALUES (?, ?, 3, 1, ?, ?)",
+            (title, json.dumps([{"role": "user", "content": title}]), updated_at, updated_at)
+        )
+        return cursor.lastrowid
+
+
+def _walk(limit, view=ConversationView.SUMMARY):
+    ids, cursor = [], None
+    while True:
+        page = ConversationRepository.list_page(limit, cursor, view)
+        ids.extend(item.id for item in page.items)
+        if page.next_cursor is None:
+            return ids
+        cursor = page.next_cursor
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor("2024-01-01T00:00:00", 42)
+    assert decode_cursor(cursor) == ("2024-01-01T00:00:00", 42)
+
+
+@pytest.mark.parametrize("cursor", [
+    "not-base64!",
+    base64.urlsafe_b64encode(b"[]").decode(),
+    base64.urlsafe_b64encode(b'["2024-01-01", "1"]').decode(),
+])
+def test_decode_cursor_rejects_malformed(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def test_list_page_orders_by_updated_at_then_id(db):
+    # 相同 updated_at 的对话按 id 倒序，翻页时不重复也不遗漏
+    first = _add_conversation("a", "2024-01-01")
+    second = _add_conversation("b", "2024-01-02")
+    third = _add_conversation("c", "2024-01-02")
+    fourth = _add_conversation("d", "2024-01-02")
+    fifth = _add_conversation("e", "2024-01-03")
+
+    expected = [fifth, fourth, third, second, first]
+    for limit in (1, 2, 3, 5, 10):
+        assert _walk(limit) == expected
+
+
+def test_list_page_last_page_has_no_cursor(db):
+    _add_conversation("a", "2024-01-01")
+    _add_conversation("b", "2024-01-02")
+
+    page = ConversationRepository.list_page(2)
+    assert len(page.items) == 2
+    assert page.next_cursor is None
+    assert ConversationRepository.list_page(10).next_cursor is None
+
+
+def test_list_page_views(db):
+    conversation_id = _add_conversation("a", "2024-01-01")
+
+    summary = ConversationRepository.list_page(10).items[0]
+    assert type(summary) is ConversationSummary
+    assert (summary.id, summary.title, summary.message_count) == (conversation_id, "a", 1)
+
+    full = ConversationRepository.list_page(10, view=ConversationView.FULL).items[0]
+    assert isinstance(full, Conversation)
+    assert full.messages[0].content == "a"
@@ -0,0 +1,181 @@
+import os
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from app.core.config import settings
+from app.db.repositories.index import DocumentRepository, IndexRepository, get_index_file_path, get_tombstones
+from app.db import session
+from app.db.session import get_db_cursor
+from app.models.index import DocumentCreate, IndexCreate
+
+
+def _vectors(count, seed=0):
+    vectors = np.random.default_rng(seed).random((count, settings.VECTOR_DIM), dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def _document_count(index_id):
+    with get_db_cursor() as cursor:
+        cursor.execute("SELECT COUNT(*) FROM documents WHERE index_id = ?", (index_id,))
+        return cursor.fetchone()[0]
+
+
+def _vector_count(manager, index_id):
+    with manager.acquire(index_id) as faiss_index:
+        return faiss_index.ntotal
+
+
+def test_batch_create_adds_vectors(vector_store):
+    index = IndexRepository.create(IndexCreate(name="docs"))
+    doc_ids = DocumentRepository.batch_create(index.id, [DocumentCreate(content=f"doc {i}") for i in range(5)], _vectors(5))
+
+    assert _document_count(index.id) == 5
+    assert _vector_count(vector_store, index.id) == 5
+    ranked = DocumentRepository.search_vector(index.id, _vectors(5)[2], 1)
+    assert ranked[0][0] == doc_ids[2]
+
+
+def test_failed_batch_leaves_no_phantom_vectors(vector_store, monkeypatch):
+    index = IndexRepository.create(IndexCreate(name="docs"))
+    DocumentRepository.batch_create(index.id, [DocumentCreate(content="kept")], _vectors(1))
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("commit failed")
+
+    # 向量加入索引之后、事务提交之前失败
+    monkeypatch.setattr(vector_store, "mark_dirty", fail)
+    with pytest.raises(RuntimeError):
+        DocumentRepository.batch_create(index.id, [DocumentCreate(content=f"doc {i}") for i in range(3)], _vectors(3, seed=1))
+    with pytest.raises(RuntimeError):
+        DocumentRepository.create(index.id, DocumentCreate(content="single"), _vectors(1, seed=2)[0])
+
+    assert _document_count(index.id) == 1
+    assert _vector_count(vector_store, index.id) == 1
+
+
+def test_promotion_is_scheduled_after_commit(vector_store, monkeypatch):
+    index = IndexRepository.create(IndexCreate(name="docs", index_type="hnsw", index_params={"promote_threshold": 4}))
+    scheduled = []
+
+    def record(index_id, vector_count):
+        # 事务已提交，另一个连接能读到全部文档
+        scheduled.append((index_id, vector_count, _document_count(index_id)))
+
+    monkeypatch.setattr(IndexRepository, "schedule_promotion", staticmethod(record))
+    DocumentRepository.batch_create(index.id, [DocumentCreate(content=f"doc {i}") for i in range(4)], _vectors(4))
+    assert scheduled == [(index.id, 4, 4)]
+
+
+def _wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def test_hnsw_delete_uses_tombstones_until_background_rebuild(vector_store, monkeypatch):
+    monkeypatch.setattr(IndexRepository, "schedule_promotion", staticmethod(lambda index_id, vector_count: None))
+    index = IndexRepository.create(IndexCreate(name="docs", index_type="hnsw", index_params={"promote_threshold": 4}))
+    vectors = _vectors(8)
+    doc_ids = DocumentRepository.batch_create(index.id, [DocumentCreate(content=f"doc {i}") for i in range(8)], vectors)
+    assert IndexRepository.promote_faiss_index(index.id)
+
+    rebuilds = []
+    original_rebuild = IndexRepository.rebuild_faiss_index
+    release = threading.Event()
+
+    def slow_rebuild(index_id):
+        release.wait(5)
+        rebuilds.append(index_id)
+        return original_rebuild(index_id)
+
+    monkeypatch.setattr(IndexRepository, "rebuild_faiss_index", staticmethod(slow_rebuild))
+    assert DocumentRepository.delete(index.id, doc_ids[3])
+
+    # 重建完成前，向量仍在索引中，但检索结果中排除
+    assert get_tombstones(index.id) == {doc_ids[3]}
+    assert _vector_count(vector_store, index.id) == 8
+    ranked = DocumentRepository.search_vector(index.id, vectors[3], 8)
+    assert doc_ids[3] not in [doc_id for doc_id, _ in ranked]
+    assert len(ranked) == 7
+
+    release.set()
+    assert _wait_for(lambda: not get_tombstones(index.id))
+    assert rebuilds == [index.id]
+    assert _vector_count(vector_store, index.id) == 7
+
+
+def test_deleting_index_discards_tombstones_and_pending_rebuild(vector_store, monkeypatch):
+    monkeypatch.setattr(IndexRepository, "schedule_promotion", staticmethod(lambda index_id, vector_count: None))
+    index = IndexRepository.create(IndexCreate(name="docs", index_type="hnsw", index_params={"promote_threshold": 4}))
+    doc_ids = DocumentRepository.batch_create(index.id, [DocumentCreate(content=f"doc {i}") for i in range(8)], _vectors(8))
+    assert IndexRepository.promote_faiss_index(index.id)
+
+    results = []
+    original_rebuild = IndexRepository.rebuild_faiss_index
+    release = threading.Event()
+
+    def slow_rebuild(index_id):
+        release.wait(5)
+        results.append(original_rebuild(index_id))
+        return results[-1]
+
+    monkeypatch.setattr(IndexRepository, "rebuild_faiss_index", staticmethod(slow_rebuild))
+    assert DocumentRepository.delete(index.id, doc_ids[3])
+    assert IndexRepository.delete(index.id)
+    assert get_tombstones(index.id) == set()
+
+    release.set()
+    assert _wait_for(lambda: results)
+    assert results == [False]
+    assert get_tombstones(index.id) == set()
+    assert index.id not in vector_store._cache
+    assert not os.path.exists(get_index_file_path(index.id))
+
+
+def test_rebuild_keeps_vectors_added_while_building(vector_store, monkeypatch):
+    index = IndexRepository.create(IndexCreate(name="docs"))
+    DocumentRepository.batch_create(index.id, [DocumentCreate(content=f"doc {i}") for i in range(3)], _vectors(3))
+
+    original_build = IndexRepository.build_faiss_index
+
+    def build_then_insert(index_id):
+        faiss_index = original_build(index_id)
+        # 构建完成、替换之前有新文档入库
+        DocumentRepository.batch_create(index_id, [DocumentCreate(content="late")], _vectors(1, seed=5))
+        return faiss_index
+
+    monkeypatch.setattr(IndexRepository, "build_faiss_index", staticmethod(build_then_insert))
+    IndexRepository.rebuild_faiss_index(index.id)
+    assert _vector_count(vector_store, index.id) == 4
+
+
+def test_writes_to_uncached_index_do_not_nest_pool_checkouts(vector_store, monkeypatch):
+    index = IndexRepository.create(IndexCreate(name="docs"))
+    vectors = _vectors(3)
+    doc_id = DocumentRepository.create(index.id, DocumentCreate(content="a"), vectors[0]).id
+    vector_store.flush(index.id)
+    vector_store.drop(index.id)
+
+    # 连接池只保留一个连接且不再补充，持有连接再加载索引会永远等待
+    while session.connection_pool.qsize() > 1:
+        session.connection_pool.get().close()
+    monkeypatch.setattr(session, "init_connection_pool", lambda: None)
+
+    def write():
+        DocumentRepository.create(index.id, DocumentCreate(content="b"), vectors[1])
+        vector_store.drop(index.id)
+        DocumentRepository.batch_create(index.id, [DocumentCreate(content="c")], vectors[2:])
+        vector_store.drop(index.id)
+        DocumentRepository.delete(index.id, doc_id)
+
+    writer = threading.Thread(target=write, daemon=True)
+    writer.start()
+    writer.join(timeout=10)
+    assert not writer.is_alive()
+    assert _vector_count(vector_store, index.id) == 2
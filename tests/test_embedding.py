@@ -0,0 +1,88 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("sentence_transformers")
+
+from app.services.embedding import EmbeddingBatcher, EmbeddingService
+from app.services.embedding_cache import EmbeddingCache
+
+
+class _FakeService:
+    """按文本长度生成向量，并记录每次批量调用"""
+
+    def __init__(self, fail=False):
+        self.calls = []
+        self.fail = fail
+
+    def get_embeddings(self, texts):
+        self.calls.append(list(texts))
+        if self.fail:
+            raise RuntimeError("encode failed")
+        return np.array([[len(text)] for text in texts], dtype=np.float32)
+
+
+def _embed_all(batcher, texts):
+    async def run():
+        try:
+            return await asyncio.gather(*(batcher.embed(text) for text in texts))
+        finally:
+            await batcher.close()
+
+    return asyncio.run(run())
+
+
+def test_concurrent_requests_share_one_batch():
+    service = _FakeService()
+    batcher = EmbeddingBatcher(service, max_batch_size=8, max_wait_ms=50)
+
+    results = _embed_all(batcher, ["a", "bb", "ccc"])
+
+    assert service.calls == [["a", "bb", "ccc"]]
+    assert [float(result[0]) for result in results] == [1, 2, 3]
+
+
+def test_batches_are_bounded_by_max_batch_size():
+    service = _FakeService()
+    batcher = EmbeddingBatcher(service, max_batch_size=2, max_wait_ms=50)
+
+    results = _embed_all(batcher, ["a", "bb", "ccc", "dddd", "eeeee"])
+
+    assert [len(call) for call in service.calls] == [2, 2, 1]
+    assert [float(result[0]) for result in results] == [1, 2, 3, 4, 5]
+
+
+def test_encode_failure_is_raised_to_every_waiter():
+    batcher = EmbeddingBatcher(_FakeService(fail=True), max_batch_size=8, max_wait_ms=50)
+
+    async def run():
+        try:
+            return await asyncio.gather(batcher.embed("a"), batcher.embed("b"), return_exceptions=True)
+        finally:
+            await batcher.close()
+
+    results = asyncio.run(run())
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+def test_get_embeddings_encodes_only_distinct_cache_misses(tmp_path):
+    service = EmbeddingService.__new__(EmbeddingService)
+    service.cache = EmbeddingCache(str(tmp_path / "cache.db"), "model", 100)
+    service.cache.put_many(["cached"], np.array([[7]], dtype=np.float32))
+    encoded = []
+
+    def encode(texts):
+        encoded.append(list(texts))
+        return np.array([[len(text)] for text in texts], dtype=np.float32)
+
+    service._encode = encode
+    embeddings = service.get_embeddings(["ab", "cached", "ab", "abcd"])
+
+    assert encoded == [["ab", "abcd"]]
+    assert embeddings[:, 0].tolist() == [2, 7, 2, 4]
+    # 第二次全部命中缓存
+    service.get_embeddings(["ab", "abcd"])
+    assert len(encoded) == 1
+    service.cache.close()
@@ -0,0 +1,81 @@
+import threading
+
+import numpy as np
+
+from app.services.embedding_cache import EmbeddingCache
+
+
+def _cache(tmp_path, max_entries=100):
+    return EmbeddingCache(str(tmp_path / "cache.db"), "model", max_entries)
+
+
+def _last_used(cache, text):
+    return cache._conn.execute(
+        "SELECT last_used FROM embedding_cache WHERE key = ?", (cache.make_key(text),)
+    ).fetchone()[0]
+
+
+def test_get_many_round_trip(tmp_path):
+    cache = _cache(tmp_path)
+    embeddings = np.arange(6, dtype=np.float32).reshape(2, 3)
+    cache.put_many(["a", "b"], embeddings)
+
+    result = cache.get_many(["b", "missing", "a"])
+    np.testing.assert_array_equal(result[0], embeddings[1])
+    assert result[1] is None
+    np.testing.assert_array_equal(result[2], embeddings[0])
+    cache.close()
+
+
+def test_get_many_does_not_take_write_lock(tmp_path):
+    cache = _cache(tmp_path)
+    cache.put_many(["a"], np.ones((1, 3), dtype=np.float32))
+
+    result = []
+    with cache._lock:
+        reader = threading.Thread(target=lambda: result.extend(cache.get_many(["a"])))
+        reader.start()
+        reader.join(timeout=5)
+        assert not reader.is_alive()
+    assert result[0] is not None
+    cache.close()
+
+
+def test_recent_hits_are_not_rewritten(tmp_path):
+    cache = _cache(tmp_path)
+    cache.put_many(["a"], np.ones((1, 3), dtype=np.float32))
+    cache.get_many(["a"])
+    assert cache._pending_touches == {}
+    cache.close()
+
+
+def test_stale_hits_are_touched_in_batches(tmp_path):
+    cache = _cache(tmp_path)
+    cache.TOUCH_BATCH_SIZE = 2
+    cache.put_many(["a", "b"], np.ones((2, 3), dtype=np.float32))
+    cache._conn.execute("UPDATE embedding_cache SET last_used = 0")
+    cache._conn.commit()
+
+    cache.get_many(["a"])
+    assert _last_used(cache, "a") == 0
+    cache.get_many(["b"])
+    assert _last_used(cache, "a") > 0
+    assert _last_used(cache, "b") > 0
+    cache.close()
+
+
+def test_eviction_keeps_recently_hit_entries(tmp_path):
+    cache = _cache(tmp_path, max_entries=4)
+    cache.put_many(["a", "b", "c", "d"], np.ones((4, 3), dtype=np.float32))
+    cache._conn.execute("UPDATE embedding_cache SET last_used = 0")
+    cache._conn.commit()
+
+    # 命中 a 的使用时间尚未提交，淘汰前会先写入
+    cache.get_many(["a"])
+    cache.put_many(["e"], np.ones((1, 3), dtype=np.float32))
+
+    kept = cache.get_many(["a", "b", "c", "d", "e"])
+    assert kept[0] is not None
+    assert kept[4] is not None
+    assert sum(embedding is not None for embedding in kept) == 3
+    cache.close()
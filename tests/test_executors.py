@@ -0,0 +1,51 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.core import executors
+from app.core.config import settings
+
+
+@pytest.fixture
+def pools():
+    """每个用例重新创建线程池，以便读取修改后的配置"""
+    executors.shutdown_executors()
+    yield
+    executors.shutdown_executors()
+
+
+def test_calls_run_on_their_named_pool(pools):
+    async def run():
+        return (
+            await executors.run_embedding(lambda: threading.current_thread().name),
+            await executors.run_rerank(lambda: threading.current_thread().name),
+            await executors.run_search(lambda: threading.current_thread().name),
+            await executors.run_io(lambda: threading.current_thread().name),
+        )
+
+    names = asyncio.run(run())
+    assert [name.split("-worker")[0] for name in names] == ["embedding", "rerank", "search", "io"]
+
+
+def test_pool_sizes_come_from_settings(pools, monkeypatch):
+    monkeypatch.setattr(settings, "SEARCH_WORKERS", 3)
+    assert executors.get_executor(executors.SEARCH_POOL)._max_workers == 3
+    assert executors.get_executor(executors.SEARCH_POOL) is executors.get_executor(executors.SEARCH_POOL)
+
+    with pytest.raises(ValueError):
+        executors.get_executor("unknown")
+
+
+def test_blocking_work_does_not_block_event_loop(pools):
+    release = threading.Event()
+
+    async def run():
+        blocked = asyncio.ensure_future(executors.run_io(release.wait, 5))
+        # 线程池中的阻塞调用未结束时，事件循环仍能处理其他协程
+        await asyncio.sleep(0.01)
+        assert not blocked.done()
+        release.set()
+        return await blocked
+
+    assert asyncio.run(run()) is True
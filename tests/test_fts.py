@@ -0,0 +1,162 @@
+import json
+import sqlite3
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from app.core.config import settings
+from app.db.repositories import conversation as conversation_repository
+from app.db.repositories.conversation import ChatConversationRepository, ChatMessageRepository, ConversationRepository, _insert_conversations
+from app.db.session import get_db_cursor
+from app.models.conversation import Message
+from app.utils.fts import MAX_CONVERSATION_MESSAGES, SNIPPET_OPEN, bigram_text, build_match_queries, check_message_count
+
+
+def _add_conversation(messages):
+    # 跳过 token 计数，避免下载分词文件
+    with get_db_cursor() as cursor:
+        return _insert_conversations(cursor, [
+            ("测试", json.dumps(messages, ensure_ascii=False), 0, len(messages), "", "")
+        ])[0]
+
+
+def _hits(query, **kwargs):
+    return [(hit.conversation_id, hit.message_index) for hit in ConversationRepository.search(query, **kwargs).items]
+
+
+def test_build_match_queries_routes_terms_by_length():
+    assert build_match_queries("") == (None, None)
+    assert build_match_queries('transformer 模型 "x') == ('"transformer"', '"模型"* """x"*')
+
+
+def test_bigram_text_keeps_last_character_of_each_run():
+    assert bigram_text("我们的AI模型").split() == ["我们", "们的", "的", "AI", "模型", "型"]
+    assert bigram_text(None) is None
+
+
+def test_short_and_long_terms_use_fts(db):
+    first = _add_conversation([
+        {"role": "user", "content": "如何训练一个中文模型"},
+        {"role": "assistant", "content": "先准备语料，再做 tokenizer 训练"},
+    ])
+    second = _add_conversation([{"role": "user", "content": "今天天气不错"}])
+
+    assert _hits("模型") == [(first, 0)]
+    assert _hits("型") == [(first, 0)]
+    assert _hits("天气") == [(second, 0)]
+    assert _hits("语料 tokenizer") == [(first, 1)]
+    assert _hits("训练", role="assistant") == [(first, 1)]
+    assert _hits("不存在") == []
+    assert _hits("   ") == []
+
+    hit = ConversationRepository.search("模型").items[0]
+    assert SNIPPET_OPEN in hit.snippet
+    assert hit.score is not None
+
+
+def test_conversation_updates_and_deletes_follow_fts(db, monkeypatch):
+    monkeypatch.setattr(conversation_repository, "count_tokens", lambda messages: 0)
+    conversation_id = _add_conversation([{"role": "user", "content": "猫咪喜欢晒太阳"}])
+    assert _hits("猫咪") == [(conversation_id, 0)]
+
+    ConversationRepository.update(
+        conversation_id, SimpleNamespace(title="测试", messages=[Message(role="user", content="小狗喜欢散步")])
+    )
+    assert _hits("猫咪") == []
+    assert _hits("小狗") == [(conversation_id, 0)]
+    assert _hits("喜欢散步") == [(conversation_id, 0)]
+
+    ConversationRepository.delete(conversation_id)
+    assert _hits("小狗") == []
+    assert _hits("喜欢散步") == []
+
+
+def test_other_connections_can_write_tables(db):
+    # 触发器不依赖应用注册的 SQL 函数
+    conversation_id = _add_conversation([{"role": "user", "content": "猫咪喜欢晒太阳"}])
+    with sqlite3.connect(settings.DB_FILE) as conn:
+        conn.execute(
+            "UPDATE conversations SET messages = ? WHERE id = ?",
+            ('[{"role": "user", "content": "小狗喜欢散步"}]', conversation_id)
+        )
+        conn.execute("INSERT INTO chat_conversations (title, created_at, updated_at) VALUES ('a', '', '')")
+        conn.execute("INSERT INTO chat_messages (conversation_id, role, content, created_at) VALUES (1, 'user', '你好', '')")
+        conn.execute("DELETE FROM chat_messages")
+        conn.execute("DELETE FROM conversations")
+
+    assert _hits("猫咪") == []
+    with get_db_cursor() as cursor:
+        cursor.execute("SELECT COUNT(*) FROM conversation_messages_bigram_fts")
+        assert cursor.fetchone()[0] == 0
+
+
+def test_message_count_limit():
+    check_message_count(MAX_CONVERSATION_MESSAGES)
+    with pytest.raises(ValueError):
+        check_message_count(MAX_CONVERSATION_MESSAGES + 1)
+
+
+def test_chat_message_search_uses_bigram_table(db):
+    conversation = ChatConversationRepository.create("聊天")
+    message = ChatMessageRepository.create(conversation.id, "user", "帮我写一首诗")
+    ChatMessageRepository.create(conversation.id, "assistant", "床前明月光")
+
+    page = ChatConversationRepository.search_messages("写诗")
+    assert page.items == []
+    page = ChatConversationRepository.search_messages("一首")
+    assert [hit.message_id for hit in page.items] == [message.id]
+
+    with get_db_cursor() as cursor:
+        cursor.execute("DELETE FROM chat_messages WHERE id = ?", (message.id,))
+    assert ChatConversationRepository.search_messages("一首").items == []
+
+
+def test_bigram_tables_are_backfilled_for_existing_rows(db):
+    conversation_id = _add_conversation([{"role": "user", "content": "历史数据"}])
+    with get_db_cursor() as cursor:
+        cursor.execute("DROP TABLE conversation_messages_bigram_fts")
+
+    from app.db.migrations import init_db
+    init_db()
+    assert _hits("历史") == [(conversation_id, 0)]
+
+
+def test_contentless_bigram_tables_are_replaced(db):
+    conversation_id = _add_conversation([{"role": "user", "content": "历史数据"}])
+    with get_db_cursor() as cursor:
+        # 早期版本的无原文表和调用 fts_bigrams() 的触发器
+        cursor.execute("DROP TABLE conversation_messages_bigram_fts")
+        cursor.execute("DROP TRIGGER conversations_bigram_fts_ad")
+        cursor.execute("CREATE VIRTUAL TABLE conversation_messages_bigram_fts USING fts5(content, content = '', tokenize = 'unicode61')")
+        cursor.execute("""
+        CREATE TRIGGER conversations_bigram_fts_ad AFTER DELETE ON conversations BEGIN
+            INSERT INTO conversation_messages_bigram_fts (conversation_messages_bigram_fts, rowid, content)
+            SELECT 'delete', (old.id << 20) | m.key, fts_bigrams(json_extract(m.value, '$.content'))
+            FROM json_each(old.messages) m;
+        END
+        """)
+
+    from app.db.migrations import init_db
+    init_db()
+    assert _hits("历史") == [(conversation_id, 0)]
+    with sqlite3.connect(settings.DB_FILE) as conn:
+        conn.execute("DELETE FROM conversations")
+    assert _hits("历史") == []
+
+
+def test_document_keyword_search_matches_short_terms(vector_store):
+    from app.db.repositories.index import DocumentRepository, IndexRepository
+    from app.models.index import DocumentCreate, IndexCreate
+
+    index_id = IndexRepository.create(IndexCreate(name="docs")).id
+    first, second = DocumentRepository.batch_create(
+        index_id,
+        [DocumentCreate(content="向量检索与关键词召回"), DocumentCreate(content="关键词匹配使用倒排索引")],
+        np.zeros((2, settings.VECTOR_DIM), dtype=np.float32)
+    )
+
+    assert [doc_id for doc_id, _ in DocumentRepository.search_keyword(index_id, "召回", 10)] == [first]
+    assert sorted(doc_id for doc_id, _ in DocumentRepository.search_keyword(index_id, "关键词", 10)) == [first, second]
+    assert [doc_id for doc_id, _ in DocumentRepository.search_keyword(index_id, "关键词 倒排", 10)] == [second]
+    assert DocumentRepository.search_keyword(index_id, "召回", 10, allowed_ids=[second]) == []
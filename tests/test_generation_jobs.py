@@ -0,0 +1,62 @@
+import asyncio
+import time
+
+import pytest
+from pydantic import ValidationError
+
+from app.api.v1.endpoints.generation_jobs import submit_generation_job
+from app.core.config import settings
+from app.core.exceptions import APIException
+from app.db.repositories.generation_job import GenerationJobRepository
+from app.models.generation_job import MAX_SAMPLES_PER_ITEM, GenerationJobCreate, GenerationJobStatus
+from app.services.generation_jobs import TokenBucket
+
+
+def test_token_bucket_allows_burst_then_limits_rate():
+    async def run():
+        bucket = TokenBucket(rate=20, capacity=2)
+        started = time.monotonic()
+        await asyncio.gather(*[bucket.acquire() for _ in range(4)])
+        return time.monotonic() - started
+
+    # 突发 2 个，其余 2 个按 20 个/秒补充
+    elapsed = asyncio.run(run())
+    assert 0.08 <= elapsed < 0.5
+
+
+def test_token_bucket_does_not_hold_lock_while_waiting():
+    async def run():
+        bucket = TokenBucket(rate=1, capacity=1)
+        await bucket.acquire()
+        waiter = asyncio.create_task(bucket.acquire())
+        await asyncio.sleep(0.01)
+        assert not bucket._lock.locked()
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        return bucket._tokens
+
+    # 取消的等待者归还预订的令牌
+    assert asyncio.run(run()) > -0.5
+
+
+def test_finish_keeps_cancelled_status(db):
+    job = GenerationJobRepository.create({"prompt_template": "x"}, [{}])
+    assert GenerationJobRepository.mark_running(job.id)
+    assert GenerationJobRepository.cancel(job.id)
+
+    assert not GenerationJobRepository.finish(job.id, GenerationJobStatus.COMPLETED)
+    assert not GenerationJobRepository.mark_running(job.id)
+    assert GenerationJobRepository.get(job.id).status == GenerationJobStatus.CANCELLED
+
+
+def test_samples_per_item_is_bounded():
+    with pytest.raises(ValidationError):
+        GenerationJobCreate(prompt_template="x", samples_per_item=MAX_SAMPLES_PER_ITEM + 1)
+
+
+def test_submit_checks_item_count_before_expanding(db, monkeypatch):
+    monkeypatch.setattr(settings, "GENERATION_MAX_ITEMS", 10)
+    request = GenerationJobCreate(prompt_template="{seed}", seeds=["a", "b", "c"], samples_per_item=4)
+    with pytest.raises(APIException):
+        asyncio.run(submit_generation_job(request))
+    assert GenerationJobRepository.list() == []
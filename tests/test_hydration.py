@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from app.core.config import settings
+from app.db.repositories import index as index_repository
+from app.db.repositories.index import DocumentRepository, IndexRepository
+from app.models.index import DocumentCreate, IndexCreate
+
+
+@pytest.fixture
+def documents(vector_store):
+    index = IndexRepository.create(IndexCreate(name="docs"))
+    doc_ids = DocumentRepository.batch_create(
+        index.id,
+        [DocumentCreate(content=f"doc {i}", metadata={"n": i}) for i in range(4)],
+        np.eye(4, settings.VECTOR_DIM, dtype=np.float32)
+    )
+    return index.id, doc_ids
+
+
+def test_hydrate_keeps_rank_order_in_one_query(documents, monkeypatch):
+    index_id, doc_ids = documents
+    checkouts = []
+    original_cursor = index_repository.get_db_cursor
+    monkeypatch.setattr(index_repository, "get_db_cursor", lambda: checkouts.append(1) or original_cursor())
+
+    ranked = [(doc_ids[2], 0.9), (doc_ids[0], 0.5), (doc_ids[3], 0.1)]
+    docs = DocumentRepository.hydrate(index_id, ranked)
+
+    assert len(checkouts) == 1
+    assert [(doc.id, doc.similarity) for doc in docs] == ranked
+    assert [doc.content for doc in docs] == ["doc 2", "doc 0", "doc 3"]
+    assert [doc.metadata for doc in docs] == [{"n": 2}, {"n": 0}, {"n": 3}]
+
+
+def test_hydrate_skips_unneeded_fields(documents):
+    index_id, doc_ids = documents
+
+    docs = DocumentRepository.hydrate(index_id, [(doc_ids[1], 1.0)], include_content=False, include_metadata=False)
+    assert (docs[0].content, docs[0].metadata) == (None, None)
+    docs = DocumentRepository.hydrate(index_id, [(doc_ids[1], 1.0)], include_content=False)
+    assert (docs[0].content, docs[0].metadata) == (None, {"n": 1})
+
+
+def test_hydrate_skips_missing_and_other_index_documents(documents):
+    index_id, doc_ids = documents
+    other = IndexRepository.create(IndexCreate(name="other"))
+    DocumentRepository.delete(index_id, doc_ids[1])
+
+    ranked = [(doc_ids[0], 0.9), (doc_ids[1], 0.8), (doc_ids[2], 0.7)]
+    assert [doc.id for doc in DocumentRepository.hydrate(index_id, ranked)] == [doc_ids[0], doc_ids[2]]
+    assert DocumentRepository.hydrate(other.id, ranked) == []
+
+
+def test_hydrate_batch_keeps_each_ranking(documents):
+    index_id, doc_ids = documents
+
+    results = DocumentRepository.hydrate_batch(index_id, [[(doc_ids[3], 1.0), (doc_ids[0], 0.5)], [], [(doc_ids[3], 0.2)]])
+    assert [[doc.id for doc in docs] for docs in results] == [[doc_ids[3], doc_ids[0]], [], [doc_ids[3]]]
+    assert results[2][0].similarity == 0.2
@@ -0,0 +1,148 @@
+import threading
+
+import faiss
+import numpy as np
+import pytest
+
+from app.services.index_manager import IndexManager, estimate_index_bytes
+
+DIM = 32
+
+
+def _flat_index(count, seed=0):
+    faiss_index = faiss.IndexIDMap2(faiss.IndexFlatL2(DIM))
+    if count:
+        vectors = np.random.default_rng(seed).random((count, DIM), dtype=np.float32)
+        faiss_index.add_with_ids(vectors, np.arange(count, dtype=np.int64))
+    return faiss_index
+
+
+@pytest.fixture
+def manager(tmp_path):
+    return IndexManager(
+        max_indices=2,
+        max_memory_bytes=1 << 30,
+        flush_interval=60,
+        path_factory=lambda index_id: str(tmp_path / f"index_{index_id}.faiss"),
+    )
+
+
+def _cached_ids(manager):
+    with manager._lock:
+        return list(manager._cache)
+
+
+def test_lru_eviction_writes_dirty_victim(manager, tmp_path):
+    for index_id in (1, 2):
+        manager.put(index_id, _flat_index(10, seed=index_id))
+    with manager.acquire(1):
+        pass
+    manager.put(3, _flat_index(10, seed=3))
+
+    assert _cached_ids(manager) == [1, 3]
+    assert (tmp_path / "index_2.faiss").exists()
+    assert manager._evicting == {}
+
+    # 再次访问时从磁盘加载被淘汰的索引
+    with manager.acquire(2) as faiss_index:
+        assert faiss_index.ntotal == 10
+    assert 2 in _cached_ids(manager)
+
+
+def test_memory_budget_uses_estimated_size(manager):
+    manager.max_indices = 10
+    manager.max_memory_bytes = estimate_index_bytes(_flat_index(100)) * 2
+    for index_id in (1, 2):
+        manager.put(index_id, _flat_index(100, seed=index_id))
+    assert _cached_ids(manager) == [1, 2]
+
+    with manager.acquire(2) as faiss_index:
+        faiss_index.add_with_ids(
+            np.random.default_rng(9).random((50, DIM), dtype=np.float32),
+            np.arange(100, 150, dtype=np.int64)
+        )
+        manager.mark_dirty(2)
+    assert _cached_ids(manager) == [2]
+    assert manager.stats()["memory_bytes"] == estimate_index_bytes(_flat_index(150))
+
+
+def test_index_in_use_is_not_evicted(manager):
+    for index_id in (1, 2):
+        manager.put(index_id, _flat_index(1))
+
+    held = threading.Event()
+    release = threading.Event()
+
+    def hold():
+        with manager.acquire(1):
+            held.set()
+            release.wait(5)
+
+    thread = threading.Thread(target=hold)
+    thread.start()
+    held.wait(5)
+    try:
+        manager.put(3, _flat_index(1))
+        assert _cached_ids(manager) == [1, 3]
+    finally:
+        release.set()
+        thread.join()
+
+
+def test_victim_is_written_outside_global_lock(manager, monkeypatch):
+    for index_id in (1, 2):
+        manager.put(index_id, _flat_index(10, seed=index_id))
+
+    writing = threading.Event()
+    finish = threading.Event()
+    original_write = manager._write_entry
+
+    def slow_write(index_id, entry):
+        writing.set()
+        finish.wait(5)
+        original_write(index_id, entry)
+
+    monkeypatch.setattr(manager, "_write_entry", slow_write)
+    loads = []
+    manager.loader = lambda index_id: loads.append(index_id)
+
+    evictor = threading.Thread(target=manager.put, args=(3, _flat_index(1)))
+    evictor.start()
+    assert writing.wait(5)
+
+    # 落盘期间其他线程仍能访问缓存
+    stats = []
+    reader = threading.Thread(target=lambda: stats.append(manager.stats()))
+    reader.start()
+    reader.join(2)
+    assert stats and stats[0]["cached_indices"] == 2
+
+    # 正在落盘的索引被再次访问时放回缓存，不会从磁盘加载旧版本
+    accessed = []
+
+    def access():
+        with manager.acquire(1) as faiss_index:
+            accessed.append(faiss_index.ntotal)
+
+    accessor = threading.Thread(target=access)
+    accessor.start()
+    finish.set()
+    evictor.join(5)
+    accessor.join(5)
+    assert accessed == [10]
+    assert loads == []
+    assert 1 in _cached_ids(manager)
+
+
+@pytest.mark.parametrize("description", ["IDMap2,Flat", "IDMap2,HNSW16", "IVF16,Flat", "IVF16,PQ8x4"])
+def test_estimate_tracks_serialized_size(description):
+    rng = np.random.default_rng(0)
+    vectors = rng.random((2000, DIM), dtype=np.float32)
+    faiss_index = faiss.index_factory(DIM, description)
+    if not faiss_index.is_trained:
+        faiss_index.train(vectors)
+    faiss_index.add_with_ids(vectors, np.arange(len(vectors), dtype=np.int64))
+
+    serialized = len(faiss.serialize_index(faiss_index))
+    # 内存中的哈希表没有序列化，估算值应不小于序列化大小且在同一量级
+    assert serialized * 0.9 <= estimate_index_bytes(faiss_index) <= serialized * 2
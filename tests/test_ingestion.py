@@ -0,0 +1,61 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("sentence_transformers")
+
+from app.core.config import settings
+from app.db.repositories.index import IndexRepository
+from app.models.index import ChunkingConfig, IndexCreate
+from app.services.ingestion import IngestionPipeline, SourceFile
+
+
+class _FakeEmbeddingService:
+    async def aget_embeddings(self, texts):
+        if any("bad" in text for text in texts):
+            raise RuntimeError("embedding failed")
+        return np.ones((len(texts), settings.VECTOR_DIM), dtype=np.float32)
+
+
+def test_embed_failure_only_skips_its_batch(vector_store, tmp_path):
+    index = IndexRepository.create(IndexCreate(name="ingest"))
+    sources = []
+    for name in ("good.txt", "bad.txt"):
+        path = tmp_path / name
+        path.write_text(name.split(".")[0] + " content", encoding="utf-8")
+        sources.append(SourceFile(str(path), name))
+
+    failures = []
+    pipeline = IngestionPipeline(
+        index.id,
+        ChunkingConfig(),
+        _FakeEmbeddingService(),
+        on_failure=lambda source, error: failures.append(source.relative_path),
+    )
+    pipeline.embed_batch_size = 1
+    result = asyncio.run(pipeline.run(sources))
+
+    assert result.failed_files == ["bad.txt"]
+    assert failures == ["bad.txt"]
+    assert [f.filename for f in result.processed_files] == ["good.txt"]
+    assert pipeline.stats["embed"].errors == 1
+
+
+def test_empty_files_are_reported(vector_store, tmp_path):
+    index = IndexRepository.create(IndexCreate(name="ingest"))
+    path = tmp_path / "empty.txt"
+    path.write_text("", encoding="utf-8")
+
+    empty = []
+    pipeline = IngestionPipeline(
+        index.id,
+        ChunkingConfig(),
+        _FakeEmbeddingService(),
+        on_empty=lambda source: empty.append(source.relative_path),
+    )
+    result = asyncio.run(pipeline.run([SourceFile(str(path), "empty.txt")]))
+
+    assert empty == ["empty.txt"]
+    assert result.failed_files == []
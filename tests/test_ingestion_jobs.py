@@ -0,0 +1,80 @@
+import json
+from datetime import datetime
+
+from app.db.migrations import init_db
+from app.db.repositories.index import IndexRepository
+from app.db.repositories.ingestion_job import IngestionJobRepository
+from app.db.session import get_db_cursor
+from app.models.index import IndexCreate
+from app.models.ingestion_job import IngestionJobStatus, IngestionJobType
+
+
+def _create_job():
+    index = IndexRepository.create(IndexCreate(name="jobs"))
+    return IngestionJobRepository.create(index.id, IngestionJobType.FILES, {})
+
+
+def test_failed_files_are_checkpointed(vector_store):
+    job = _create_job()
+    with get_db_cursor() as cursor:
+        IngestionJobRepository.checkpoint(cursor, job.id, [{"path": "a.py", "chunk_count": 2, "total_characters": 10}])
+    IngestionJobRepository.record_failure(job.id, "b.py", "无法解码")
+    # 恢复后重复失败不重复计数
+    IngestionJobRepository.record_failure(job.id, "b.py", "无法解码")
+
+    assert IngestionJobRepository.completed_paths(job.id) == {"a.py", "b.py"}
+    job = IngestionJobRepository.get(job.id)
+    assert job.processed_files == 1
+    assert job.failed_files == 1
+
+    with get_db_cursor() as cursor:
+        cursor.execute("SELECT path, status, error FROM ingestion_job_files WHERE job_id = ? ORDER BY path", (job.id,))
+        assert [tuple(row) for row in cursor.fetchall()] == [("a.py", "completed", None), ("b.py", "failed", "无法解码")]
+
+
+def test_finish_keeps_cancelled_status(vector_store):
+    job = _create_job()
+    assert IngestionJobRepository.mark_running(job.id)
+    assert IngestionJobRepository.cancel(job.id)
+
+    assert not IngestionJobRepository.finish(job.id, IngestionJobStatus.COMPLETED)
+    assert not IngestionJobRepository.mark_running(job.id)
+    assert IngestionJobRepository.get(job.id).status == IngestionJobStatus.CANCELLED
+
+
+def test_work_dir_is_not_returned_in_params(vector_store):
+    index = IndexRepository.create(IndexCreate(name="jobs"))
+    job = IngestionJobRepository.create(index.id, IngestionJobType.GIT, {"git_url": "https://example.com/repo.git"}, work_dir="/srv/ingestion/1")
+
+    assert "work_dir" not in job.params
+    assert "/srv/ingestion/1" not in job.model_dump_json()
+    assert IngestionJobRepository.get_work_dir(job.id) == "/srv/ingestion/1"
+
+
+def test_empty_files_are_checkpointed(vector_store):
+    job = _create_job()
+    IngestionJobRepository.record_empty(job.id, "empty.txt")
+
+    assert IngestionJobRepository.completed_paths(job.id) == {"empty.txt"}
+    job = IngestionJobRepository.get(job.id)
+    assert job.processed_files == 1
+    assert job.total_chunks == 0
+
+
+def test_work_dir_is_moved_out_of_params(vector_store):
+    index = IndexRepository.create(IndexCreate(name="jobs"))
+    now = datetime.now().isoformat()
+    # 模拟旧版：工作目录保存在 params 中
+    with get_db_cursor() as cursor:
+        cursor.execute("ALTER TABLE ingestion_jobs DROP COLUMN work_dir")
+        cursor.execute(
+            "INSERT INTO ingestion_jobs (index_id, job_type, status, params, created_at, updated_at) "
+            "VALUES (?, 'files', 'pending', ?, ?, ?)",
+            (index.id, json.dumps({"metadata": None, "work_dir": "/srv/ingestion/1"}), now, now)
+        )
+        job_id = cursor.lastrowid
+
+    init_db()
+
+    assert IngestionJobRepository.get(job_id).params == {"metadata": None}
+    assert IngestionJobRepository.get_work_dir(job_id) == "/srv/ingestion/1"
@@ -0,0 +1,86 @@
+import json
+
+import pytest
+
+from app.db.repositories.index import DocumentRepository
+from app.db.session import get_db_cursor
+from app.models.index import FilterOperator, MetadataFilter
+
+
+def _add_document(index_id, metadata):
+    with get_db_cursor() as cursor:
+        cursor.execute(
+            "INSERT INTO documents (index_id, content, metadata, embedding) VALUES (?, '', ?, x'')",
+            (index_id, json.dumps(metadata))
+        )
+        return cursor.lastrowid
+
+
+@pytest.fixture
+def documents(db):
+    with get_db_cursor() as cursor:
+        cursor.execute("INSERT INTO indices (name) VALUES ('a')")
+        index_id = cursor.lastrowid
+        cursor.execute("INSERT INTO indices (name) VALUES ('b')")
+        other_index_id = cursor.lastrowid
+    ids = {
+        "readme": _add_document(index_id, {"file_extension": ".md", "file_path": "docs/readme.md", "lines": 10}),
+        "main": _add_document(index_id, {"file_extension": ".py", "file_path": "src/main.py", "lines": 200}),
+        "util": _add_document(index_id, {"file_extension": ".py", "file_path": "src/util/io.py", "tags": ["x"]}),
+        "other": _add_document(other_index_id, {"file_extension": ".py", "file_path": "src/main.py"}),
+    }
+    return index_id, ids
+
+
+def _resolve(index_id, *filters):
+    return set(DocumentRepository.resolve_filters(index_id, [MetadataFilter(**f) for f in filters]))
+
+
+def test_eq_and_in(documents):
+    index_id, ids = documents
+    assert _resolve(index_id, {"key": "file_extension", "value": ".py"}) == {ids["main"], ids["util"]}
+    assert _resolve(index_id, {"key": "file_extension", "op": "in", "value": [".md", ".txt"]}) == {ids["readme"]}
+    assert _resolve(index_id, {"key": "lines", "value": 200}) == {ids["main"]}
+
+
+def test_prefix(documents):
+    index_id, ids = documents
+    assert _resolve(index_id, {"key": "file_path", "op": "prefix", "value": "src/"}) == {ids["main"], ids["util"]}
+    assert _resolve(index_id, {"key": "file_path", "op": "prefix", "value": "src/util"}) == {ids["util"]}
+    assert _resolve(index_id, {"key": "file_path", "op": "prefix", "value": "lib/"}) == set()
+
+
+def test_filters_are_intersected(documents):
+    index_id, ids = documents
+    assert _resolve(
+        index_id,
+        {"key": "file_extension", "value": ".py"},
+        {"key": "file_path", "op": "prefix", "value": "src/util"},
+    ) == {ids["util"]}
+    assert _resolve(
+        index_id,
+        {"key": "file_extension", "value": ".md"},
+        {"key": "file_path", "op": "prefix", "value": "src/"},
+    ) == set()
+
+
+def test_non_scalar_values_are_not_indexed(documents):
+    index_id, _ = documents
+    with get_db_cursor() as cursor:
+        cursor.execute("SELECT COUNT(*) FROM document_metadata WHERE key = 'tags'")
+        assert cursor.fetchone()[0] == 0
+
+
+def test_side_table_follows_updates_and_deletes(documents):
+    index_id, ids = documents
+    with get_db_cursor() as cursor:
+        cursor.execute("UPDATE documents SET metadata = ? WHERE id = ?", (json.dumps({"file_extension": ".md"}), ids["main"]))
+        cursor.execute("DELETE FROM documents WHERE id = ?", (ids["readme"],))
+    assert _resolve(index_id, {"key": "file_extension", "value": ".md"}) == {ids["main"]}
+
+
+def test_operator_value_validation():
+    with pytest.raises(ValueError):
+        MetadataFilter(key="k", op=FilterOperator.IN, value="x")
+    with pytest.raises(ValueError):
+        MetadataFilter(key="k", op=FilterOperator.PREFIX, value=1)
@@ -0,0 +1,40 @@
+import faiss
+
+from app.db import migrations
+from app.db.repositories.index import IndexRepository, get_index_file_path
+from app.db.session import get_db_cursor
+from app.models.index import IndexCreate
+from app.services.vector_index import is_id_mapped
+
+
+def _id_mapped_flags():
+    with get_db_cursor() as cursor:
+        cursor.execute("SELECT index_id, id_mapped FROM vector_indices ORDER BY index_id")
+        return [tuple(row) for row in cursor.fetchall()]
+
+
+def test_legacy_index_is_converted_once(vector_store, monkeypatch):
+    index = IndexRepository.create(IndexCreate(name="legacy"))
+    vector_store.drop(index.id)
+    # 模拟旧版：按位置序号存储、未记录转换标记的索引
+    faiss.write_index(faiss.IndexFlatL2(8), get_index_file_path(index.id))
+    with get_db_cursor() as cursor:
+        cursor.execute("UPDATE vector_indices SET id_mapped = 0")
+
+    reads = []
+    original_read = faiss.read_index
+    monkeypatch.setattr(migrations.faiss, "read_index", lambda path: reads.append(path) or original_read(path))
+
+    migrations.migrate_vector_indices()
+    assert reads == [get_index_file_path(index.id)]
+    assert is_id_mapped(original_read(get_index_file_path(index.id)))
+    assert _id_mapped_flags() == [(index.id, 1)]
+
+    # 之后启动时不再读取已转换的索引
+    migrations.migrate_vector_indices()
+    assert len(reads) == 1
+
+
+def test_new_indices_are_marked_as_converted(vector_store):
+    index = IndexRepository.create(IndexCreate(name="new"))
+    assert _id_mapped_flags() == [(index.id, 1)]
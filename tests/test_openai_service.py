@@ -0,0 +1,90 @@
+import asyncio
+from types import SimpleNamespace
+
+from app.core.config import settings
+from app.services import openai as openai_module
+from app.services.openai import OpenAIService, get_openai_service
+
+
+class _FakeStream:
+    def __init__(self, contents):
+        self.contents = contents
+        self.closed = False
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for content in self.contents:
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content))])
+
+    async def close(self):
+        self.closed = True
+
+
+class _FakeCompletions:
+    def __init__(self, stream):
+        self.stream = stream
+        self.calls = []
+
+    async def create(self, **kwargs):
+        self.calls.append(kwargs)
+        return self.stream
+
+
+def _service(monkeypatch, contents):
+    monkeypatch.setattr(settings, "OPENAI_MODEL", "test-model")
+    service = OpenAIService()
+    completions = _FakeCompletions(_FakeStream(contents))
+    service.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    return service, completions
+
+
+def test_service_is_shared():
+    assert get_openai_service() is get_openai_service()
+
+
+def test_stream_uses_configured_model_and_skips_empty_deltas(monkeypatch):
+    service, completions = _service(monkeypatch, ["", "你", None, "好"])
+
+    async def run():
+        return [content async for content in service.stream_chat_completion([{"role": "user", "content": "问题"}])]
+
+    assert asyncio.run(run()) == ["你", "好"]
+    assert completions.calls[0]["model"] == "test-model"
+    assert completions.calls[0]["stream"] is True
+    assert completions.stream.closed
+
+    asyncio.run(service.stream_chat_completion([], model="other-model").__anext__())
+    assert completions.calls[1]["model"] == "other-model"
+
+
+def test_closing_stream_early_releases_upstream(monkeypatch):
+    service, completions = _service(monkeypatch, ["你", "好", "呀"])
+
+    async def run():
+        completion = service.stream_chat_completion([])
+        first = await completion.__anext__()
+        await completion.aclose()
+        return first
+
+    assert asyncio.run(run()) == "你"
+    assert completions.stream.closed
+
+
+def test_shared_client_uses_configured_pool_limits(monkeypatch):
+    clients = []
+
+    class _RecordingHttpxClient:
+        def __init__(self, **kwargs):
+            clients.append(kwargs)
+
+    monkeypatch.setattr(openai_module, "DefaultAsyncHttpxClient", _RecordingHttpxClient)
+    monkeypatch.setattr(openai_module, "AsyncOpenAI", lambda **kwargs: kwargs)
+    service = OpenAIService()
+
+    limits = clients[0]["limits"]
+    assert limits.max_connections == settings.OPENAI_MAX_CONNECTIONS
+    assert limits.max_keepalive_connections == settings.OPENAI_MAX_KEEPALIVE_CONNECTIONS
+    assert clients[0]["timeout"].read == settings.OPENAI_READ_TIMEOUT
+    assert service.client["max_retries"] == settings.OPENAI_MAX_RETRIES
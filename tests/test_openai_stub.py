@@ -0,0 +1,91 @@
+import argparse
+import asyncio
+import importlib.util
+import os
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from openai import AsyncOpenAI
+
+pytest.importorskip("uvicorn")
+
+from app.services.openai import OpenAIService
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "scripts")
+
+
+def _load_script(name):
+    spec = importlib.util.spec_from_file_location(name, os.path.join(SCRIPTS_DIR, f"{name}.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+openai_stub = _load_script("openai_stub")
+load_test = _load_script("load_test")
+
+
+def _stub_app(**overrides):
+    options = dict(
+        tokens_per_second=0, completion_tokens=5, latency_ms=0, latency_sigma=0, error_rate=0.0, error_status=500
+    )
+    options.update(overrides)
+    return openai_stub.create_app(openai_stub.StubConfig(argparse.Namespace(**options)))
+
+
+def _asgi_client(app):
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://stub")
+
+
+def test_non_streaming_reply_respects_max_tokens():
+    client = TestClient(_stub_app())
+    response = client.post("/v1/chat/completions", json={"messages": [{"role": "user", "content": "你好"}], "max_tokens": 3})
+
+    body = response.json()
+    assert body["object"] == "chat.completion"
+    assert len(body["choices"][0]["message"]["content"].split()) == 3
+    assert body["usage"]["completion_tokens"] == 3
+
+
+def test_injected_errors_use_configured_status():
+    client = TestClient(_stub_app(error_rate=1.0, error_status=429))
+    response = client.post("/chat/completions", json={"messages": []})
+
+    assert response.status_code == 429
+    assert client.get("/stats").json()["errors"] == 1
+
+
+def test_load_test_request_counts_streamed_chunks():
+    async def run(app):
+        async with _asgi_client(app) as client:
+            return await load_test.run_request(client, "/v1/chat/completions", load_test.DEFAULT_BODY)
+
+    result = asyncio.run(run(_stub_app()))
+    assert result.error is None
+    assert result.chunks == 5
+    assert result.ttft is not None and result.ttft <= result.duration
+
+    result = asyncio.run(run(_stub_app(error_rate=1.0, error_status=503)))
+    assert result.error == "HTTP 503"
+
+
+def test_openai_service_talks_to_stub():
+    service = OpenAIService.__new__(OpenAIService)
+    service.model = "stub"
+
+    async def run():
+        async with _asgi_client(_stub_app()) as http_client:
+            service.client = AsyncOpenAI(api_key="stub", base_url="http://stub/v1", http_client=http_client)
+            streamed = [content async for content in service.stream_chat_completion([{"role": "user", "content": "你好"}])]
+            reply = await service.create_chat_completion([{"role": "user", "content": "你好"}], max_tokens=2)
+            return streamed, reply
+
+    streamed, reply = asyncio.run(run())
+    assert len(streamed) == 5
+    assert len(reply.split()) == 2
+
+
+@pytest.mark.parametrize("p, expected", [(50, 5), (95, 10), (99, 10), (0, 1)])
+def test_percentile(p, expected):
+    assert load_test.percentile([float(v) for v in range(10, 0, -1)], p) == expected
@@ -0,0 +1,78 @@
+from app.models.conversation import ChatMessage
+from app.models.index import Document
+from app.services.rag import CONTEXT_HEADER, build_messages, document_source, pack_context, trim_history
+
+# 按字符计数：标题 7 个 token；"来源: a.py\n" 9 个 token，每块另加 4 个 token 的编号开销
+HEADER_TOKENS = 7
+
+
+def _doc(doc_id, path, content):
+    return Document(id=doc_id, index_id=1, content=content, metadata={"file_path": path})
+
+
+def _block_tokens(content):
+    return 9 + len(content) + 4
+
+
+def test_document_source_falls_back_to_id():
+    assert document_source(_doc(1, "a.py", "x")) == "a.py"
+    assert document_source(Document(id=3, index_id=1, metadata={"file_name": "b.md"})) == "b.md"
+    assert document_source(Document(id=3, index_id=1)) == "document:3"
+
+
+def test_pack_context_dedupes_and_limits_chunks_per_source(char_tokenizer):
+    documents = [
+        _doc(1, "a.py", "x" * 10),
+        _doc(2, "a.py", "x" * 10),  # 内容重复
+        _doc(3, "a.py", "y" * 10),  # 超过同一来源的块数
+        _doc(4, "b.py", "z" * 10),
+        _doc(5, "c.py", "   "),  # 空内容
+    ]
+
+    selected, text, tokens = pack_context(documents, 1000, max_chunks_per_source=1)
+
+    assert [doc.id for doc in selected] == [1, 4]
+    assert tokens == HEADER_TOKENS + 2 * _block_tokens("x" * 10)
+    assert text == f"{CONTEXT_HEADER}\n\n[1] 来源: a.py\n{'x' * 10}\n\n[2] 来源: b.py\n{'z' * 10}"
+
+
+def test_pack_context_skips_blocks_over_budget(char_tokenizer):
+    documents = [_doc(1, "a.py", "x" * 50), _doc(2, "b.py", "y" * 10)]
+    budget = HEADER_TOKENS + _block_tokens("y" * 10)
+
+    # 放不下的长块跳过，后面的短块仍可装入
+    selected, _, tokens = pack_context(documents, budget, max_chunks_per_source=3)
+    assert [doc.id for doc in selected] == [2]
+    assert tokens == budget
+
+    assert pack_context(documents, budget - 1, max_chunks_per_source=3) == ([], "", 0)
+    assert pack_context(documents, 0, max_chunks_per_source=3) == ([], "", 0)
+
+
+def _message(role, content):
+    return ChatMessage(conversation_id=1, role=role, content=content)
+
+
+def test_trim_history_keeps_newest_messages_within_budget(char_tokenizer):
+    # token 数：内容 + 角色 + 4，分别为 12、15、9
+    messages = [_message("user", "aaaa"), _message("assistant", "bb"), _message("user", "c")]
+
+    assert trim_history(messages, 100) == [
+        {"role": "user", "content": "aaaa"}, {"role": "assistant", "content": "bb"}, {"role": "user", "content": "c"}
+    ]
+    assert trim_history(messages, 24) == [{"role": "assistant", "content": "bb"}, {"role": "user", "content": "c"}]
+    # 放不下的消息之前的更早消息也不再保留
+    assert trim_history(messages, 23) == [{"role": "user", "content": "c"}]
+    assert trim_history(messages, 0) == []
+
+
+def test_build_messages_appends_context_to_system_prompt():
+    history = [{"role": "user", "content": "之前的问题"}]
+
+    messages = build_messages("系统提示", "上下文", history, "问题")
+    assert messages == [
+        {"role": "system", "content": "系统提示\n\n上下文"},
+        {"role": "user", "content": "之前的问题"},
+        {"role": "user", "content": "问题"},
+    ]
+    assert build_messages("系统提示", "", [], "问题")[0] == {"role": "system", "content": "系统提示"}
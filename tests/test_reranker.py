@@ -0,0 +1,92 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("sentence_transformers")
+
+from app.core.config import settings
+from app.models.index import Document, DocumentRecallRequest
+from app.services import reranker, retrieval
+from app.services.reranker import RerankerService, RerankScoreCache, rerank_documents
+
+
+class _FakeCrossEncoder:
+    """分数为文本长度，并记录每次 predict 的输入"""
+
+    def __init__(self):
+        self.calls = []
+
+    def predict(self, pairs, **kwargs):
+        self.calls.append(list(pairs))
+        return [float(len(content)) for _, content in pairs]
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setattr(reranker, "_score_cache", RerankScoreCache(100))
+    service = RerankerService.__new__(RerankerService)
+    service.model_name = "model"
+    service.model = _FakeCrossEncoder()
+    return service
+
+
+def test_cache_evicts_least_recently_used():
+    cache = RerankScoreCache(2)
+    cache.put_many(["a", "b"], [1.0, 2.0])
+    # 读取 a 后 b 成为最久未使用的条目
+    assert cache.get_many(["a"]) == [1.0]
+    cache.put_many(["c"], [3.0])
+    assert cache.get_many(["a", "b", "c"]) == [1.0, None, 3.0]
+
+
+def test_cache_key_depends_on_model_query_and_content():
+    key = RerankScoreCache.make_key("model", "query", "content")
+    assert key == RerankScoreCache.make_key("model", "query", "content")
+    assert key != RerankScoreCache.make_key("other", "query", "content")
+    assert key != RerankScoreCache.make_key("model", "other", "content")
+
+
+def test_score_predicts_distinct_misses_in_one_batch(service):
+    assert service.score("q", ["aa", "b", "aa"]) == [2.0, 1.0, 2.0]
+    assert service.model.calls == [[("q", "aa"), ("q", "b")]]
+
+    assert service.score("q", ["b", "ccc"]) == [1.0, 3.0]
+    assert service.model.calls[1] == [("q", "ccc")]
+    # 换一个查询不能命中缓存
+    service.score("other", ["b"])
+    assert service.model.calls[2] == [("other", "b")]
+
+
+def test_rerank_documents_sorts_and_truncates(service, monkeypatch):
+    monkeypatch.setattr(reranker, "get_reranker", lambda model_name: service)
+    documents = [Document(id=i, index_id=1, content="x" * length) for i, length in enumerate([2, 5, 1, 3])]
+
+    ranked = asyncio.run(rerank_documents("q", documents, 2))
+    assert [(doc.id, doc.rerank_score) for doc in ranked] == [(1, 5.0), (3, 3.0)]
+
+    with pytest.raises(ValueError):
+        asyncio.run(rerank_documents("q", documents, 2, "unknown-model"))
+
+
+def test_recall_over_fetches_rerank_depth(monkeypatch):
+    calls = []
+
+    async def fake_recall(request, embedding_service, top_k, include_content):
+        calls.append((top_k, include_content))
+        return [Document(id=i, index_id=1, content=f"doc {i}") for i in range(top_k)]
+
+    async def fake_rerank(query, documents, top_k, model_name):
+        return documents[::-1][:top_k]
+
+    monkeypatch.setattr(retrieval, "_recall", fake_recall)
+    monkeypatch.setattr(retrieval, "rerank_documents", fake_rerank)
+    monkeypatch.setattr(settings, "RERANK_MAX_DEPTH", 8)
+
+    request = DocumentRecallRequest(index_id=1, query="q", top_k=2, rerank=True, rerank_depth=20, include_content=False)
+    documents = asyncio.run(retrieval.recall_documents(request, None))
+
+    # 深度受 RERANK_MAX_DEPTH 限制，打分需要内容，返回前按请求去掉
+    assert calls == [(8, True)]
+    assert [doc.id for doc in documents] == [7, 6]
+    assert all(doc.content is None for doc in documents)
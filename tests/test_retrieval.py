@@ -0,0 +1,71 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("sentence_transformers")
+
+from app.core.config import settings
+from app.db.repositories.index import DocumentRepository, IndexRepository
+from app.models.index import DocumentCreate, DocumentRecallRequest, FusionMethod, IndexCreate, RecallMode
+from app.services.retrieval import reciprocal_rank_fusion, recall_documents, weighted_score_fusion
+
+
+def _ids(ranked):
+    return [doc_id for doc_id, _ in ranked]
+
+
+def test_rrf_ranks_by_position_across_rankings():
+    vector = [(1, 0.9), (2, 0.8), (3, 0.7)]
+    keyword = [(3, 12.0), (4, 5.0)]
+
+    # 3 在两路中都出现，分数量纲不同不影响结果
+    assert _ids(reciprocal_rank_fusion([vector, keyword], [1.0, 1.0], k=60))[:2] == [3, 1]
+    assert _ids(reciprocal_rank_fusion([vector, keyword], [1.0, 0.0], k=60))[:3] == [1, 2, 3]
+
+
+def test_weighted_fusion_normalizes_each_ranking():
+    vector = [(1, 0.9), (2, 0.8), (3, 0.7)]
+    keyword = [(3, 12.0), (4, 5.0)]
+
+    fused = weighted_score_fusion([vector, keyword], [0.4, 0.6])
+    assert _ids(fused) == [3, 1, 2, 4]
+    assert fused[0][1] == pytest.approx(0.6)
+    # 只有一个结果时归一化为 1
+    assert weighted_score_fusion([[(7, 3.0)], []], [1.0, 1.0]) == [(7, 1.0)]
+
+
+class _FakeEmbeddingService:
+    def __init__(self, embedding):
+        self.embedding = embedding
+
+    async def aget_embedding(self, text):
+        return self.embedding
+
+
+@pytest.fixture
+def code_index(vector_store):
+    index = IndexRepository.create(IndexCreate(name="code"))
+    vectors = np.eye(3, settings.VECTOR_DIM, dtype=np.float32)
+    contents = ["alpha beta gamma", "load the configuration file", "def parse_config_v2(path):"]
+    doc_ids = DocumentRepository.batch_create(index.id, [DocumentCreate(content=c) for c in contents], vectors)
+    # 查询向量最接近第二个文档，关键词只匹配第三个文档
+    return index.id, doc_ids, _FakeEmbeddingService(vectors[1])
+
+
+def _recall(code_index, **options):
+    index_id, _, service = code_index
+    request = DocumentRecallRequest(index_id=index_id, query="parse_config_v2", top_k=2, **options)
+    return [doc.id for doc in asyncio.run(recall_documents(request, service))]
+
+
+def test_recall_modes(code_index):
+    _, doc_ids, _ = code_index
+
+    assert _recall(code_index, mode=RecallMode.VECTOR)[0] == doc_ids[1]
+    assert _recall(code_index, mode=RecallMode.KEYWORD) == [doc_ids[2]]
+    assert _recall(code_index, mode=RecallMode.HYBRID, keyword_weight=0.7, vector_weight=0.3) == [doc_ids[2], doc_ids[1]]
+    assert _recall(
+        code_index, mode=RecallMode.HYBRID, fusion=FusionMethod.WEIGHTED, keyword_weight=0.3, vector_weight=0.7
+    )[0] == doc_ids[1]
@@ -0,0 +1,59 @@
+import pytest
+
+from app.utils import token
+from app.utils.token import count_text_tokens, count_tokens, count_tokens_batch, resolve_encoding_name
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("cl100k_base", "cl100k_base"),
+    ("o200k_base", "o200k_base"),
+    ("gpt-4o", "o200k_base"),
+    ("gpt-3.5-turbo", "cl100k_base"),
+])
+def test_resolve_encoding_name(name, expected):
+    assert resolve_encoding_name(name) == expected
+
+
+def test_unknown_encoding_is_rejected():
+    with pytest.raises(ValueError):
+        resolve_encoding_name("no-such-model")
+
+
+def test_each_encoding_is_loaded_once(monkeypatch):
+    loads = []
+    monkeypatch.setattr(token.tiktoken, "get_encoding", lambda name: loads.append(name) or object())
+    token._load_encoding.cache_clear()
+    try:
+        first = token.get_encoding("gpt-4o")
+        assert token.get_encoding("o200k_base") is first
+        token.get_encoding("cl100k_base")
+        assert loads == ["o200k_base", "cl100k_base"]
+    finally:
+        token._load_encoding.cache_clear()
+
+
+def test_count_tokens_batch_adds_role_overhead(char_tokenizer):
+    conversations = [
+        [{"role": "user", "content": "hello"}],
+        [{"role": "user", "content": "hi"}, {"role": "assistant", "content": "abc"}],
+        [],
+    ]
+    # 按字符计数：role 的 token 数加每条消息 4 个 token 的格式开销
+    assert count_tokens_batch(conversations) == [5 + 8, 2 + 8 + 3 + 13, 0]
+    assert [count_tokens(messages) for messages in conversations] == count_tokens_batch(conversations)
+
+
+def test_batched_counts_match_single_counts(char_tokenizer, monkeypatch):
+    texts = [f"text {i}" * (i % 5) for i in range(10)]
+    expected = count_text_tokens(texts)
+
+    calls = []
+    encoding = token.get_encoding()
+    original_batch = encoding.encode_ordinary_batch
+    monkeypatch.setattr(encoding, "encode_ordinary_batch", lambda texts, num_threads: calls.append(len(texts)) or original_batch(texts))
+    monkeypatch.setattr(token, "_load_encoding", lambda encoding_name: encoding)
+    monkeypatch.setattr(token, "BATCH_THRESHOLD", 1)
+    monkeypatch.setattr(token, "ENCODE_CHUNK_SIZE", 4)
+
+    assert count_text_tokens(texts) == expected
+    assert calls == [4, 4, 2]